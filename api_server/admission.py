@@ -0,0 +1,218 @@
+# File: admission.py
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+
+from config import (
+    ADMISSION_MAX_CONCURRENT,
+    ADMISSION_PER_CLIENT,
+    ADMISSION_MAX_QUEUE,
+)
+
+logger = logging.getLogger("admission")
+
+# Lower runs first
+PRIORITY_CHAT = 0
+PRIORITY_SUMMARIZE = 10
+PRIORITY_BACKGROUND = 20   # work no client is waiting for, e.g. conversation summaries
+
+
+class QueueFull(Exception):
+    """Raised when a request is shed; retry_after is a hint in whole seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Server busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """One request's place in the admission queue (or its running slot)."""
+
+    def __init__(self, controller, client_id: str, priority: int, seq: int):
+        self._controller = controller
+        self.client_id = client_id
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.perf_counter()
+        self.granted_at = None
+        self.released = False
+        self.displaced = None       # QueueFull, once a better-ranked request took its place
+
+    @property
+    def granted(self) -> bool:
+        return self.granted_at is not None
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    async def wait(self):
+        """Wait for admission, yielding the 1-based queue position whenever it changes.
+
+        Yields nothing if the request was admitted straight away. Raises
+        QueueFull if a better-ranked request displaces it from a full queue.
+        """
+        last = None
+        while not self.granted:
+            if self.displaced is not None:
+                raise self.displaced
+            position = self._controller.position(self)
+            if position != last:
+                last = position
+                yield position
+            await self._controller.changed()
+
+    def release(self) -> None:
+        """Give the slot (or queue place) back. Safe to call more than once."""
+        if not self.released:
+            self.released = True
+            self._controller._release(self)
+
+
+class AdmissionController:
+    """Bounded priority queue in front of the LLM.
+
+    At most max_concurrent requests run at once and at most per_client of
+    them belong to one client; the rest wait in priority order (then
+    arrival order). When max_queue requests are already waiting, the
+    worst-ranked one (lowest priority, latest arrival) is shed with a
+    Retry-After estimate instead of piling onto the LLM server's own queue:
+    the new request itself if it ranks no better, else the waiter it displaces.
+    """
+
+    def __init__(self, max_concurrent: int, per_client: int, max_queue: int):
+        self.max_concurrent = max_concurrent
+        self.per_client = per_client
+        self.max_queue = max_queue
+
+        self._waiting = []          # heap of Tickets
+        self._running = 0
+        self._per_client = {}       # client_id -> running count
+        self._seq = itertools.count()
+        self._changed_event = None  # asyncio.Event, replaced on every change
+        self._avg_service = 5.0     # EWMA of seconds a request holds its slot
+
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self.abandoned = 0
+        self.wait_seconds = 0.0
+        self.peak_queue = 0
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog is likely to have drained."""
+        backlog = len(self._waiting) + 1
+        return max(1, math.ceil(backlog * self._avg_service / max(self.max_concurrent, 1)))
+
+    def enqueue(self, client_id: str, priority: int = PRIORITY_CHAT) -> Ticket:
+        """Reserve a place for a request; raises QueueFull when shedding load."""
+        ticket = Ticket(self, client_id, priority, next(self._seq))
+        heapq.heappush(self._waiting, ticket)
+        self._dispatch()
+
+        if not ticket.granted:
+            if len(self._waiting) > self.max_queue:
+                worst = max(self._waiting)
+                self._waiting.remove(worst)
+                heapq.heapify(self._waiting)
+                self.shed += 1
+                retry_after = self.retry_after()
+                logger.warning(f"Shedding request from {worst.client_id}: queue full, retry after {retry_after}s")
+                if worst is ticket:
+                    raise QueueFull(retry_after)
+                worst.displaced = QueueFull(retry_after)
+                worst.released = True  # it holds nothing any more
+            self.queued += 1
+            self.peak_queue = max(self.peak_queue, len(self._waiting))
+            self._notify()
+        return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        return 1 + sum(1 for other in self._waiting if other < ticket)
+
+    async def changed(self) -> None:
+        """Wait until a request is admitted, finishes, or leaves the queue."""
+        if self._changed_event is None:
+            self._changed_event = asyncio.Event()
+        await self._changed_event.wait()
+
+    def _notify(self) -> None:
+        if self._changed_event is not None:
+            self._changed_event.set()
+            self._changed_event = None
+
+    def _dispatch(self) -> None:
+        """Admit waiting requests, best priority first, skipping clients at their cap."""
+        skipped = []
+        while self._waiting and self._running < self.max_concurrent:
+            ticket = heapq.heappop(self._waiting)
+            if self._per_client.get(ticket.client_id, 0) >= self.per_client:
+                skipped.append(ticket)
+                continue
+            self._grant(ticket)
+        for ticket in skipped:
+            heapq.heappush(self._waiting, ticket)
+
+    def _grant(self, ticket: Ticket) -> None:
+        ticket.granted_at = time.perf_counter()
+        self._running += 1
+        self._per_client[ticket.client_id] = self._per_client.get(ticket.client_id, 0) + 1
+        self.admitted += 1
+        self.wait_seconds += ticket.granted_at - ticket.enqueued_at
+
+    def _release(self, ticket: Ticket) -> None:
+        if ticket.granted:
+            self._running -= 1
+            remaining = self._per_client[ticket.client_id] - 1
+            if remaining:
+                self._per_client[ticket.client_id] = remaining
+            else:
+                del self._per_client[ticket.client_id]
+            held = time.perf_counter() - ticket.granted_at
+            self._avg_service = 0.8 * self._avg_service + 0.2 * held
+        else:
+            # Client went away while queued
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+            self.abandoned += 1
+
+        self._dispatch()
+        self._notify()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "per_client": self.per_client,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "waiting": len(self._waiting),
+            "peak_queue": self.peak_queue,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": self.shed,
+            "abandoned": self.abandoned,
+            "wait_ms_total": round(self.wait_seconds * 1000, 1),
+            "avg_service_s": round(self._avg_service, 2),
+        }
+
+
+_cached_controller = None
+
+def get_admission_controller() -> AdmissionController:
+    """Get the process-wide admission controller, creating it if needed."""
+    global _cached_controller
+
+    if _cached_controller is None:
+        _cached_controller = AdmissionController(
+            max_concurrent=ADMISSION_MAX_CONCURRENT,
+            per_client=ADMISSION_PER_CLIENT,
+            max_queue=ADMISSION_MAX_QUEUE,
+        )
+
+    return _cached_controller
+
+__all__ = ['PRIORITY_CHAT', 'PRIORITY_SUMMARIZE', 'PRIORITY_BACKGROUND', 'QueueFull', 'Ticket',
+           'AdmissionController', 'get_admission_controller']
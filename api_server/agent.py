@@ -1,43 +1,53 @@
 # --- Agent Executor (agent.py) ---
 # File: agent.py
 
-from langchain.agents import create_tool_calling_agent
 from langchain.agents import AgentExecutor
+from langchain.agents.output_parsers.tools import ToolsAgentOutputParser
+from langchain_core.messages import AIMessageChunk
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnablePassthrough
 from langchain_openai import ChatOpenAI
-from config import MODEL_NAME
-from tools import ALL_TOOLS
+from config import MODEL_NAME, LLM_POOL_HOST, FAST_ROUTE_ENABLED, SPECULATIVE_TOOLS_ENABLED, LOG_LEVEL
+from tools import ALL_TOOLS, route_to_tool_directly, search_tool, weather_tool, dad_joke_tool
+from http_client import get_async_client, get_sync_client, add_request_hook, add_sse_hook
+from http_client import register_virtual_host
+from llm_pool import get_llm_pool
+from prompt_cache import pin_slot, record_timings
+from compaction import compact_tool_output, format_compacted_tool_messages
+from metrics import ROUTER_DECISIONS
+import prefetch
 from datetime import datetime
+import logging
+import re
+
+logger = logging.getLogger("agent")
 
 # Caching to prevent repeated agent creation
 _cached_llm = None
 _cached_agent = None
 _cached_executor = None
 
-def never_early_stop(intermediate_steps):
-    return False
-
-def create_agent_executor():
-    """Create agent that uses fast tool routing."""
-    global _cached_llm, _cached_agent, _cached_executor
-
-    if _cached_executor is not None:
-        return _cached_executor
-
-    if _cached_llm is None:
-        _cached_llm = ChatOpenAI(
-            base_url="http://localhost:8080/v1",#llama for docker
-            api_key="sk-no-key-required",
-            model=MODEL_NAME,
-            streaming=True,
-            temperature=0,
-        )
+def _build_llm():
+    """Build the llama.cpp chat client on top of the shared keep-alive pool."""
+    # Slot pinning and prefill accounting ride on the shared transport
+    add_request_hook(pin_slot)
+    add_sse_hook(record_timings, marker=b'"timings"')
+    # Requests to the pool host are balanced across LLM_BACKENDS
+    register_virtual_host(LLM_POOL_HOST, get_llm_pool())
 
-    # Import the fast routing function
-    from tools import route_to_tool_directly
+    return ChatOpenAI(
+        base_url=f"http://{LLM_POOL_HOST}/v1",
+        api_key="sk-no-key-required",
+        model=MODEL_NAME,
+        streaming=True,
+        temperature=0,
+        http_client=get_sync_client(),
+        http_async_client=get_async_client(),
+        # Reuse the KV cache for the unchanged prompt prefix between requests
+        model_kwargs={"extra_body": {"cache_prompt": True}},
+    )
 
-    # SIMPLE system prompt that forces tool usage
-    system_prompt = f"""You are a helpful assistant. Current date: {datetime.now().strftime("%A, %B %d, %Y")}.
+SYSTEM_PROMPT = """You are a helpful assistant.
 
 **RULES:**
 1. ALWAYS use tools for information requests
@@ -60,55 +70,231 @@ def create_agent_executor():
 
 Just use the appropriate tool immediately and then provide the answer."""
 
+def current_date() -> str:
+    """Evaluated per request, so the date is never stale after midnight."""
+    return datetime.now().strftime("%A, %B %d, %Y")
+
+# One generation that turns a directly-routed tool result into the answer
+ANSWER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a helpful assistant. Answer the user's request using ONLY the tool result below.
+- For search results: SUMMARIZE the key information that answers the question
+- For weather: report the conditions clearly
+- Be concise. If the result does not answer the question, say so."""),
+    ("placeholder", "{chat_history}"),
+    ("human", "{input}\n\nTool used: {tool_name}\nTool result:\n{tool_output}\n\n(Current date: {current_date})"),
+]).partial(current_date=current_date)
+
+# Tools whose output is already the final answer - no generation needed
+PASSTHROUGH_TOOLS = {"dad_joke_tool"}
+
+def extract_weather_location(query: str) -> str | None:
+    """Pull the place out of queries like "weather in London tomorrow?"."""
+    match = re.search(r"\b(?:in|for|at)\s+([^\W\d][\w\s,.'-]*)", query, re.IGNORECASE)
+    if not match:
+        return None
+    location = re.sub(r"\b(today|tomorrow|tonight|now|right now|this week)\b.*$", "",
+                      match.group(1), flags=re.IGNORECASE)
+    location = location.strip(" ?!.,")
+    return location or None
+
+def fast_tool_call(query: str):
+    """Return (tool, tool_input) when routing alone decides the tool, else None."""
+    tool_name = route_to_tool_directly(query)
+    ROUTER_DECISIONS.labels(tool_name or "none").inc()
+    if tool_name == "search_tool":
+        return search_tool, {"query": query}
+    if tool_name == "weather_tool":
+        location = extract_weather_location(query)
+        return (weather_tool, {"location": location}) if location else None
+    if tool_name == "dad_joke_tool":
+        return dad_joke_tool, {"query": ""}
+    return None
+
+def event_included(name: str, run_type: str, tags=(), *, include_names=None, include_types=None,
+                   include_tags=None, exclude_names=None, exclude_types=None, exclude_tags=None,
+                   **_) -> bool:
+    """Apply astream_events' include_*/exclude_* filters to an event we synthesize ourselves."""
+    include = include_names is None and include_types is None and include_tags is None
+    if include_names is not None:
+        include = include or name in include_names
+    if include_types is not None:
+        include = include or run_type in include_types
+    if include_tags is not None:
+        include = include or any(tag in include_tags for tag in tags)
+    if exclude_names is not None:
+        include = include and name not in exclude_names
+    if exclude_types is not None:
+        include = include and run_type not in exclude_types
+    if exclude_tags is not None:
+        include = include and all(tag not in exclude_tags for tag in tags)
+    return include
+
+
+class FastAgentExecutor(AgentExecutor):
+    """AgentExecutor that skips the tool-selection generation when routing already knows the tool.
+
+    Both ainvoke and astream_events run the routed tool directly and then make
+    a single answer generation over its output; anything the router cannot
+    decide, and any message with chat history, falls back to the normal
+    agent loop. When a fallback still has a routed call (a follow-up, or
+    every routed message with FAST_ROUTE_ENABLED off), that call is
+    prefetched while the agent loop runs and served to the model if it
+    makes the same call (see prefetch.py). Events
+    the executor synthesizes honour the same include_*/exclude_* filters as
+    real ones.
+    """
+
+    def _route(self, input: dict):
+        """The routed call when the fast path takes it; otherwise start it speculatively and return None."""
+        if not (FAST_ROUTE_ENABLED or SPECULATIVE_TOOLS_ENABLED):
+            return None
+        routed = fast_tool_call(input.get('input', ''))
+        # The router only sees this message; a follow-up ("and tomorrow?")
+        # needs the model to resolve it against the history first
+        if routed and FAST_ROUTE_ENABLED and not input.get("chat_history"):
+            return routed
+
+        prefetch.start_request()
+        if routed and SPECULATIVE_TOOLS_ENABLED:
+            tool, tool_input = routed
+            if prefetch.speculate(tool.name, tool_input):
+                logger.debug(f"🔮 Speculative {tool.name} while the model chooses: {tool_input}")
+        return None
+
+    async def ainvoke(self, input, *args, **kwargs):
+        # Fast pre-routing before agent reasoning
+        routed = self._route(input)
+        if routed:
+            tool, tool_input = routed
+            logger.debug(f"🚀 Fast routing to {tool.name} for: {input['input']}")
+            output = await tool.ainvoke(tool_input)
+            if tool.name not in PASSTHROUGH_TOOLS:
+                message = await (ANSWER_PROMPT | get_llm()).ainvoke({
+                    "input": input['input'], "tool_name": tool.name,
+                    "tool_output": compact_tool_output(tool.name, output),
+                    "chat_history": input.get("chat_history", []),
+                })
+                output = message.content
+            return {"input": input['input'], "output": output, "intermediate_steps": []}
+
+        # Fall back to normal agent for other cases
+        try:
+            return await super().ainvoke(input, *args, **kwargs)
+        finally:
+            prefetch.finish_request()
+
+    async def astream_events(self, input, config=None, *, version, **kwargs):
+        routed = self._route(input)
+        if not routed:
+            try:
+                async for event in super().astream_events(input, config, version=version, **kwargs):
+                    yield event
+            finally:
+                prefetch.finish_request()
+            return
+
+        tool, tool_input = routed
+        logger.debug(f"🚀 Fast routing to {tool.name} for: {input['input']}")
+
+        # Real tool run -> the usual on_tool_start / on_tool_end events
+        output = ""
+        async for event in tool.astream_events(tool_input, config, version=version, **kwargs):
+            if event["event"] == "on_tool_end":
+                output = event["data"].get("output", "")
+            yield event
 
+        if tool.name in PASSTHROUGH_TOOLS:
+            # The tool output is the answer - stream it as a single chunk
+            answer = output
+            if event_included(tool.name, "chat_model", **kwargs):
+                yield {
+                    "event": "on_chat_model_stream",
+                    "name": tool.name,
+                    "run_id": "",
+                    "tags": [],
+                    "metadata": {},
+                    "data": {"chunk": AIMessageChunk(content=answer)},
+                }
+        else:
+            # Single answer generation -> the usual on_chat_model_stream events
+            answer = ""
+            chain = ANSWER_PROMPT | get_llm()
+            async for event in chain.astream_events(
+                {
+                    "input": input['input'], "tool_name": tool.name,
+                    "tool_output": compact_tool_output(tool.name, output),
+                    "chat_history": input.get("chat_history", []),
+                },
+                config, version=version, **kwargs,
+            ):
+                if event["event"] == "on_chat_model_stream":
+                    answer += event["data"]["chunk"].content or ""
+                yield event
+
+        if not event_included("AgentExecutor", "chain", **kwargs):
+            return
+        yield {
+            "event": "on_chain_end",
+            "name": "AgentExecutor",
+            "run_id": "",
+            "tags": [],
+            "metadata": {},
+            "data": {"output": {"input": input['input'], "output": answer}},
+        }
+
+
+def create_compacting_agent(llm, tools, prompt):
+    """create_tool_calling_agent, but tool outputs are compacted before they reach the scratchpad."""
+    missing_vars = {"agent_scratchpad"}.difference(
+        prompt.input_variables + list(prompt.partial_variables)
+    )
+    if missing_vars:
+        raise ValueError(f"Prompt missing required variables: {missing_vars}")
+
+    return (
+        RunnablePassthrough.assign(
+            agent_scratchpad=lambda x: format_compacted_tool_messages(x["intermediate_steps"])
+        )
+        | prompt
+        | llm.bind_tools(tools)
+        | ToolsAgentOutputParser()
+    )
+
+
+def create_agent_executor():
+    """Create agent that uses fast tool routing."""
+    global _cached_llm, _cached_agent, _cached_executor
+
+    if _cached_executor is not None:
+        return _cached_executor
+
+    if _cached_llm is None:
+        _cached_llm = _build_llm()
+
+    # SIMPLE system prompt that forces tool usage.
+    # Keep it byte-identical across requests so llama.cpp can reuse the
+    # prefilled KV cache; volatile parts (the date) go after the user input.
     prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
+        ("system", SYSTEM_PROMPT),
         ("placeholder", "{chat_history}"),
-        ("human", "{input}"),
+        ("human", "{input}\n\n(Current date: {current_date})"),
         ("placeholder", "{agent_scratchpad}"),
-    ])
+    ]).partial(current_date=current_date)
 
-    _cached_agent = create_tool_calling_agent(
+    _cached_agent = create_compacting_agent(
         llm=_cached_llm,
         tools=ALL_TOOLS,
         prompt=prompt
     )
 
-    # Create a custom executor that uses fast routing
-    class FastAgentExecutor(AgentExecutor):
-        async def ainvoke(self, input, *args, **kwargs):
-            # Fast pre-routing before agent reasoning
-            from tools import route_to_tool_directly
-            fast_tool = route_to_tool_directly(input.get('input', ''))
-            
-            if fast_tool and fast_tool == 'search_tool':
-                print(f"🚀 FAST ROUTING to search_tool for: {input['input']}")
-                # Force search tool usage
-                from tools import search_tool
-                result = search_tool.invoke({"query": input['input']})
-                return {"output": result, "intermediate_steps": []}
-            
-            # Fall back to normal agent for other cases
-            return await super().ainvoke(input, *args, **kwargs)
-
     _cached_executor = FastAgentExecutor(
         agent=_cached_agent,
         tools=ALL_TOOLS,
-        verbose=True,  # Keep verbose to see what's happening
+        verbose=LOG_LEVEL == "DEBUG",  # echo the agent's reasoning only when debugging
         handle_parsing_errors=True,
-        max_iterations=5,
+        max_iterations=10,
         early_stopping_method="None",
     )
-    
-
-    # _cached_executor._should_early_stop = never_early_stop
-    _cached_executor.max_iterations = 10  # Increase further
-
-    return _cached_executor
-
-
-    # Create a custom executor that disables stop conditions
-
 
     return _cached_executor
 
@@ -119,13 +305,7 @@ def get_llm():
     global _cached_llm
     
     if _cached_llm is None:
-        _cached_llm = ChatOpenAI(
-            base_url="http://localhost:8080/v1",
-            api_key="sk-no-key-required",
-            model=MODEL_NAME,
-            streaming=True,
-            temperature=0,
-        )
+        _cached_llm = _build_llm()
     
     return _cached_llm
 
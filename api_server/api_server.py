@@ -1,19 +1,46 @@
 # File: api_server.py
 
 import asyncio
-import json
+import re
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
 from sse_starlette.sse import EventSourceResponse
 import logging
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+# Set up logging (LOG_LEVEL; records are written by a background thread)
+from logging_setup import setup_logging, stop_logging
+setup_logging()
 logger = logging.getLogger("api_server")
 
 # Import your existing agent creator
 from agent import create_agent_executor
+from http_client import aclose_clients, get_pool_stats, get_async_client
+from llm_pool import get_llm_pool
+from loop_monitor import get_loop_monitor
+import metrics
+from admission import PRIORITY_CHAT, PRIORITY_SUMMARIZE, QueueFull, get_admission_controller
+from singleflight import SingleFlight
+from semantic_cache import get_semantic_cache
+from memory import get_conversation_store
+from summary_cache import get_summary_cache, page_key
+import prompt_cache
+import compaction
+import prefetch
+from sse import message, StreamStats, coalesce_tokens
+from config import (
+    TOKEN_LOG_EVERY,
+    SSE_COALESCE_MS,
+    SSE_COALESCE_BYTES,
+    SEMANTIC_CACHE_ENABLED,
+    LLM_HEALTH_INTERVAL,
+    SUMMARY_BATCH_CONCURRENCY,
+    SUMMARY_BATCH_MAX_PAGES,
+)
 
 def ultra_fast_response(query: str) -> str | None:
     """Ultra-fast responses for common queries without any agent overhead."""
@@ -35,13 +62,109 @@ def ultra_fast_response(query: str) -> str | None:
     # This prevents bypassing the search tool
     return None
 
+# Answers to these depend on randomness, side effects or the moment they
+# were asked - never reuse them
+UNCACHEABLE_TOOLS = {"dad_joke_tool", "terminal_tool", "weather_tool"}
+# Questions whose answer changes within SEMANTIC_CACHE_TTL. A bare "current"
+# is left out: "the current president" stays the same for far longer
+TIME_SENSITIVE_QUERY = re.compile(
+    r"\b(news|current (events|news|weather|time|price|score)|latest|recent|update|happened|"
+    r"today|tonight|tomorrow|yesterday|now|this (week|month|year)|price|score|weather|forecast)\b",
+    re.IGNORECASE,
+)
+
+def semantic_cache_tag(query: str):
+    """Exact-match part of the semantic cache key, or None when the answer must not be reused.
+
+    Similar embeddings are not enough on their own: "population in 2010"
+    and "population in 2020" are near neighbours, so entries are only
+    shared between queries routed to the same tool with the same numbers.
+    """
+    if not SEMANTIC_CACHE_ENABLED or TIME_SENSITIVE_QUERY.search(query):
+        return None
+    from tools import route_to_tool_directly
+    tool_name = route_to_tool_directly(query)
+    if tool_name in UNCACHEABLE_TOOLS:
+        return None
+    return tool_name, tuple(re.findall(r"\d+(?:[.,]\d+)*", query))
+
+def client_id_for(request: Request) -> str:
+    """Who a request counts against for per-client admission limits."""
+    return request.headers.get("x-client-id") or (request.client.host if request.client else "unknown")
+
+def admission_rejected(e: QueueFull) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"type": "error", "content": str(e)},
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+async def wait_for_admission(ticket):
+    """Yield "queued" payloads until the ticket is admitted.
+
+    A ticket displaced from a full queue ends with an "error" payload
+    carrying retry_after; callers stop when ticket.granted is still False.
+    """
+    try:
+        async for position in ticket.wait():
+            logger.debug(f"⏳ Queued at position {position}")
+            yield {"type": "queued", "position": position}
+    except QueueFull as e:
+        yield {"type": "error", "content": str(e), "retry_after": e.retry_after}
+
+# Identical concurrent /summarize requests share one LLM generation
+_summarize_flight = SingleFlight("summarize")
+
+def summary_payloads(key: str, content: str, url: str, title: str, ticket=None):
+    """Summary SSE payloads for one page, shared with identical in-flight requests.
+
+    Long pages are chunked and map-reduced, with unchanged chunks served
+    from the summary cache. The shared generation waits for and holds the
+    admission ticket of the request that started it, until it finishes or
+    every subscriber has left; a request that joins a running generation
+    adds no LLM work, so its ticket (if any) is released at once.
+    Callers should leave() the returned subscription when their client goes.
+    """
+    summary_cache = get_summary_cache()
+
+    async def generate():
+        if ticket is not None:
+            async for payload in wait_for_admission(ticket):
+                yield payload
+            if not ticket.granted:
+                return
+        async for payload in summary_cache.summarize(key, content, url, title):
+            yield payload
+
+    subscription = _summarize_flight.stream(key, generate)
+    if ticket is not None:
+        if subscription.leader:
+            subscription.task.add_done_callback(lambda task: ticket.release())
+        else:
+            ticket.release()
+    return subscription
+
 # Initialize the agent executor once on startup
 logger.debug("🔄 Initializing agent executor...")
 agent_executor = create_agent_executor()
 logger.debug("✅ Agent executor initialized")
 
 # --- FastAPI App Setup ---
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Track backend health and slot occupancy for load balancing
+    pool = get_llm_pool()
+    pool.start_health_checks(get_async_client(), LLM_HEALTH_INTERVAL)
+    get_loop_monitor().start()
+    yield
+    await get_loop_monitor().stop()
+    await pool.stop_health_checks()
+    # Release pooled connections held by the shared tool clients
+    await aclose_clients()
+    get_conversation_store().close()
+    stop_logging()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS to allow your Blazor app to connect
 # IMPORTANT: In production, you should restrict the origins.
@@ -75,11 +198,42 @@ app.add_middleware(
 # Define the request model to match what Blazor will send
 class ChatRequest(BaseModel):
     input: str
+    session_id: str | None = None  # conversation memory + pins it to one llama.cpp slot
+    coalesce_ms: int | None = None  # token batching window; 0 = one frame per token
 
 # --- Streaming Event Generator ---
-async def stream_agent_response(chat_request: ChatRequest):
+# Only the runs that produce client-visible events: model tokens and tool
+# calls. Chains, prompts and parsers are never turned into events at all.
+AGENT_STREAM_FILTER = {"include_types": ["chat_model", "tool"]}
+
+_stream_stats = StreamStats()
+
+async def measured(endpoint: str, items, started: float):
+    """Pass items through, recording time to the first token, stream duration and in-flight streams."""
+    in_flight = metrics.STREAMS_IN_FLIGHT.labels(endpoint)
+    ttft = metrics.TIME_TO_FIRST_TOKEN.labels(endpoint)
+    first_token = True
+    in_flight.inc()
+    try:
+        async for item in items:
+            if first_token and item.get("type") == "token":
+                first_token = False
+                ttft.observe(time.perf_counter() - started)
+            yield item
+    finally:
+        in_flight.dec()
+        metrics.REQUEST_DURATION.labels(endpoint).observe(time.perf_counter() - started)
+
+async def framed(payloads):
+    """One SSE "message" event per payload."""
+    async for payload in payloads:
+        yield message(payload)
+
+async def stream_agent_response(chat_request: ChatRequest, ticket=None):
     """
-    Calls the agent's astream_events and yields formatted Server-Sent Events.
+    Calls the agent's astream_events and yields the payloads of the
+    Server-Sent Events (see agent_event_stream for the framing).
+    The agent only starts once the admission ticket (if any) is granted.
     """
     logger.debug(f"🎯 Starting stream for query: '{chat_request.input}'")
     
@@ -88,153 +242,204 @@ async def stream_agent_response(chat_request: ChatRequest):
     if fast_response:
         logger.debug(f"🚀 ULTRA-FAST response for: '{chat_request.input}'")
         # Yield the fast response immediately
-        yield {
-            "event": "message",
-            "data": json.dumps({"type": "token", "content": fast_response})
-        }
+        yield {"type": "token", "content": fast_response}
         return
 
+    # Earlier turns of this session (recent ones verbatim, older ones summarized)
+    memory = get_conversation_store()
+    history = await memory.history(chat_request.session_id)
+
+    # SEMANTIC CACHE - paraphrases of a recently answered question. Follow-ups
+    # depend on the conversation, so only context-free questions use it.
+    semantic_cache = get_semantic_cache()
+    query_vector = None
+    cache_tag = semantic_cache_tag(chat_request.input) if not history else None
+    if cache_tag is not None:
+        query_vector = await semantic_cache.embed(chat_request.input)
+        hit = semantic_cache.lookup(query_vector, cache_tag) if query_vector is not None else None
+        if hit:
+            answer, similarity, cached_query = hit
+            logger.debug(f"🧠 Semantic cache HIT ({similarity:.3f}) via '{cached_query}'")
+            if ticket is not None:
+                ticket.release()  # no LLM work needed
+            memory.add_turn(chat_request.session_id, chat_request.input, answer)
+            yield {"type": "token", "content": answer, "cached": True}
+            return
+
+    if ticket is not None:
+        async for payload in wait_for_admission(ticket):
+            yield payload
+        if not ticket.granted:
+            return
+
+    prompt_cache.set_session(chat_request.session_id)
+    prefill = prompt_cache.start_request()
+    compacted = compaction.start_request()
 
     event_count = 0
+    token_count = 0
+    answer_parts = []  # tokens of the final generation (reset at each tool call)
+    generations = 0
+    tool_calls = 0
+    failed = False
+    debug = logger.isEnabledFor(logging.DEBUG)
+    _stream_stats.streams += 1
     try:
         async for event in agent_executor.astream_events(
-            {"input": chat_request.input},
+            {"input": chat_request.input, "chat_history": history},
             version="v1",
+            **AGENT_STREAM_FILTER,
         ):
+            started = time.perf_counter()
             event_count += 1
             kind = event["event"]
-            data_payload = {}
-            
-            logger.debug(f"🔄 Event {event_count}: {kind}")
 
             if kind == "on_chat_model_stream":
                 content = event["data"]["chunk"].content
-                if content:
-                    data_payload = {"type": "token", "content": content}
-                    logger.debug(f"💬 Token: {content[:50]}...")
-            
+                if not content:
+                    _stream_stats.record(started)
+                    continue
+                token_count += 1
+                answer_parts.append(content)
+                if debug and TOKEN_LOG_EVERY and token_count % TOKEN_LOG_EVERY == 1:
+                    logger.debug(f"💬 Token {token_count}: {content[:50]}...")
+                _stream_stats.record(started, tokens=1)
+                yield {"type": "token", "content": content}
+
+            elif kind == "on_chat_model_start":
+                generations += 1
+                _stream_stats.record(started)
+
             elif kind == "on_tool_start":
+                tool_calls += 1
                 tool_name = event['name']
                 tool_input = event['data'].get('input')
-                data_payload = {
-                    "type": "tool_start", 
-                    "name": tool_name,
-                    "input": tool_input
-                }
-                logger.debug(f"🛠️ Tool START: {tool_name} with input: {str(tool_input)[:100]}...")
-        
+                answer_parts.clear()
+                if tool_name in UNCACHEABLE_TOOLS:
+                    query_vector = None  # the agent chose a tool we never cache
+                if debug:
+                    logger.debug(f"🛠️ Tool START: {tool_name} with input: {str(tool_input)[:100]}...")
+                _stream_stats.record(started)
+                yield {"type": "tool_start", "name": tool_name, "input": tool_input}
+
             elif kind == "on_tool_end":
                 tool_name = event['name']
                 tool_output = event['data'].get('output', '')
-                data_payload = {
-                    "type": "tool_end",
-                    "name": tool_name,
-                    "output": tool_output
-                }
-                logger.debug(f"🛠️ Tool END: {tool_name} with output length: {len(str(tool_output))}")
-                logger.debug(f"🛠️ Tool output sample: {str(tool_output)[:200]}...")
-
-            elif kind == "on_chain_start":
-                chain_name = event["name"]
-                # logger.debug(f"⛓️ Chain START: {chain_name}")
-
-            elif kind == "on_chain_end":
-                chain_name = event["name"]
-                # logger.debug(f"⛓️ Chain END: {chain_name}")
-                if chain_name == "AgentExecutor":
-                    output_data = event['data'].get('output', {})
-                    # logger.debug(f"🏁 AgentExecutor finished with output: {str(output_data)[:200]}...")
-            
-            # Yield the event if it has content
-            if data_payload:
-                yield {
-                    "event": "message",
-                    "data": json.dumps(data_payload)
-                }
-                
-        logger.debug(f"✅ Stream completed. Total events: {event_count}")
+                if debug:
+                    logger.debug(f"🛠️ Tool END: {tool_name} with output length: {len(str(tool_output))}")
+                _stream_stats.record(started)
+                yield {"type": "tool_end", "name": tool_name, "output": tool_output}
+
+            else:
+                _stream_stats.record(started)
+
+        metrics.AGENT_ITERATIONS.observe(generations)
+        metrics.AGENT_TOOL_CALLS.observe(tool_calls)
+        if debug:
+            logger.debug(f"✅ Stream completed. {event_count} events, {token_count} tokens")
+        if prefill.calls:
+            logger.info(
+                f"🧮 Prefill: {prefill.prompt_tokens} tokens computed, "
+                f"{prefill.cached_tokens} reused from KV cache over {prefill.calls} LLM call(s)"
+            )
+        if compacted.tokens_saved:
+            logger.info(
+                f"🗜️ Compaction: {compacted.tokens_saved} tokens saved "
+                f"({compacted.tokens_in} -> {compacted.tokens_out}) over {compacted.outputs} tool output(s)"
+            )
 
     except Exception as e:
+        failed = True
         logger.error(f"❌ Error in stream_agent_response: {e}")
         import traceback
         logger.error(f"❌ Traceback: {traceback.format_exc()}")
         
         # Yield an error event to the client
-        error_payload = {
-            "type": "error",
-            "content": f"An error occurred: {str(e)}"
-        }
-        yield {
-            "event": "message",
-            "data": json.dumps(error_payload)
-        }
+        yield {"type": "error", "content": f"An error occurred: {str(e)}"}
+
+    if answer_parts and not failed:
+        answer = "".join(answer_parts)
+        memory.add_turn(chat_request.session_id, chat_request.input, answer)
+        if query_vector is not None:
+            semantic_cache.store(query_vector, chat_request.input, answer, cache_tag)
+
+async def agent_event_stream(chat_request: ChatRequest, ticket=None, started: float | None = None):
+    """SSE frames for /agent-chat, with token runs coalesced unless the client opts out."""
+    payloads = measured("agent-chat", stream_agent_response(chat_request, ticket), started or time.perf_counter())
+    window_ms = SSE_COALESCE_MS if chat_request.coalesce_ms is None else chat_request.coalesce_ms
+    if window_ms > 0:
+        payloads = coalesce_tokens(payloads, window_ms / 1000, SSE_COALESCE_BYTES, _stream_stats)
+
+    async for payload in payloads:
+        _stream_stats.frames += 1
+        yield message(payload)
 
 # --- API Endpoint ---
+_ultra_fast_hits = metrics.ULTRA_FAST_RESPONSES.labels("hit")
+_ultra_fast_misses = metrics.ULTRA_FAST_RESPONSES.labels("miss")
+
 @app.post("/agent-chat")
-async def chat_endpoint(chat_request: ChatRequest):
+async def chat_endpoint(chat_request: ChatRequest, request: Request):
     """
     The main chat endpoint that Blazor will call.
     """
+    started = time.perf_counter()
     logger.debug(f"📥 Received chat request: '{chat_request.input}'")
-    return EventSourceResponse(stream_agent_response(chat_request))
+    if ultra_fast_response(chat_request.input):
+        _ultra_fast_hits.inc()
+        return EventSourceResponse(agent_event_stream(chat_request, started=started))
+    _ultra_fast_misses.inc()
+
+    try:
+        ticket = get_admission_controller().enqueue(client_id_for(request), PRIORITY_CHAT)
+    except QueueFull as e:
+        return admission_rejected(e)
+    # The background task also runs when the client disconnects mid-stream
+    return EventSourceResponse(
+        agent_event_stream(chat_request, ticket, started),
+        background=BackgroundTask(ticket.release),
+    )
 
 
 @app.post("/summarize")
-async def summarize_page(request: dict):
+async def summarize_page(request: dict, http_request: Request):
     """
     Directly summarize webpage content.
     """
+    started = time.perf_counter()
     content = request.get("content", "")
     url = request.get("url", "")
     title = request.get("title", "")
     
     logger.info(f"📄 Summarize request for: {title}")
-    
-    async def summarize_generator():
-        try:
-            # Import and get the LLM
-            from agent import get_llm
-            
-            llm = get_llm()  # This will create it if needed
-            logger.info(f"✓ Got LLM: {llm}")
-            
-            # Create prompt
-            prompt = f"""Summarize the following webpage in a clear, structured format.
 
-Title: {title}
-URL: {url}
+    # Reloads of an unchanged page replay the stored summary without queueing
+    key = page_key(content, url, title)
+    cached_summary = await get_summary_cache().get_summary(key)
+    if cached_summary is not None:
+        logger.info("⚡ Summary cache HIT")
 
-Content:
-{content[:8000]}
+        async def cached_payloads():
+            yield {"type": "token", "content": cached_summary, "cached": True}
 
-Format your summary like this:
+        return EventSourceResponse(framed(measured("summarize", cached_payloads(), started)))
 
-📌 Overview:
-[One sentence description]
-
-🔑 Key Points:
-• [Main point 1]
-• [Main point 2]
-• [Main point 3]
+    # Only a request that starts a generation queues for admission
+    ticket = None
+    if not _summarize_flight.in_flight(key):
+        try:
+            ticket = get_admission_controller().enqueue(client_id_for(http_request), PRIORITY_SUMMARIZE)
+        except QueueFull as e:
+            return admission_rejected(e)
+    subscription = summary_payloads(key, content, url, title, ticket)
 
-💡 Takeaway:
-[Brief conclusion]
+    async def summarize_payloads():
+        try:
+            logger.info("🔄 Starting LLM stream...")
 
-Keep it concise and scannable and in ENGLISH"""
+            async for payload in subscription:
+                yield payload
 
-            logger.info("🔄 Starting LLM stream...")
-            
-            # Stream the response
-            async for chunk in llm.astream(prompt):
-                if hasattr(chunk, 'content') and chunk.content:
-                    yield {
-                        "event": "message",
-                        "data": json.dumps({
-                            "type": "token",
-                            "content": chunk.content
-                        })
-                    }
-                    
             logger.info("✅ Summary completed")
                     
         except Exception as e:
@@ -242,21 +447,215 @@ Keep it concise and scannable and in ENGLISH"""
             import traceback
             logger.error(f"Traceback:\n{traceback.format_exc()}")
             
-            yield {
-                "event": "message",
-                "data": json.dumps({
-                    "type": "error",
-                    "content": f"Summarization failed: {str(e)}"
-                })
-            }
+            yield {"type": "error", "content": f"Summarization failed: {str(e)}"}
     
-    return EventSourceResponse(summarize_generator())
+    # The background task also runs when the client disconnects before streaming
+    return EventSourceResponse(
+        framed(measured("summarize", summarize_payloads(), started)),
+        background=BackgroundTask(subscription.leave),
+    )
+
+class BatchPage(BaseModel):
+    id: str | None = None  # defaults to the page's position in the batch
+    content: str = ""
+    url: str = ""
+    title: str = ""
+
+class SummarizeBatchRequest(BaseModel):
+    pages: list[BatchPage]
+
+@app.post("/summarize-batch")
+async def summarize_batch(batch: SummarizeBatchRequest, http_request: Request):
+    """
+    Summarize many pages over one SSE connection.
+
+    Every event carries the "page_id" it belongs to. Pages with identical
+    content are summarized once, cached pages are answered immediately,
+    and at most SUMMARY_BATCH_CONCURRENCY pages are generated at a time.
+    """
+    started = time.perf_counter()
+    if len(batch.pages) > SUMMARY_BATCH_MAX_PAGES:
+        return JSONResponse(
+            status_code=413,
+            content={"type": "error", "content": f"At most {SUMMARY_BATCH_MAX_PAGES} pages per batch"},
+        )
+
+    # Group page ids by content address so duplicates share one summary
+    groups = {}
+    for index, page in enumerate(batch.pages):
+        key = page_key(page.content, page.url, page.title)
+        groups.setdefault(key, (page, []))[1].append(page.id or str(index))
+    logger.info(f"📚 Batch summarize: {len(batch.pages)} pages, {len(groups)} unique")
+
+    summary_cache = get_summary_cache()
+    cached = await summary_cache.get_summaries(list(groups))
+    pending = [key for key, summary in cached.items() if summary is None]
+
+    # Each generation this batch starts holds its own admission ticket (see
+    # summary_payloads). The first is taken now so a full queue is a 429.
+    client_id = client_id_for(http_request)
+    spare_tickets = []
+    if any(not _summarize_flight.in_flight(key) for key in pending):
+        try:
+            spare_tickets.append(get_admission_controller().enqueue(client_id, PRIORITY_SUMMARIZE))
+        except QueueFull as e:
+            return admission_rejected(e)
+
+    def release_spare_tickets():
+        while spare_tickets:
+            spare_tickets.pop().release()
+
+    def tagged(page_ids, payload):
+        for page_id in page_ids:
+            yield {**payload, "page_id": page_id}
+
+    async def batch_payloads():
+        for key, summary in cached.items():
+            if summary is not None:
+                page_ids = groups[key][1]
+                for payload in ({"type": "token", "content": summary, "cached": True}, {"type": "page_done"}):
+                    for tagged_payload in tagged(page_ids, payload):
+                        yield tagged_payload
+
+        # Workers push (page ids, payload) pairs; None marks a finished worker
+        events = asyncio.Queue()
+        semaphore = asyncio.Semaphore(SUMMARY_BATCH_CONCURRENCY)
+
+        async def worker(key):
+            page, page_ids = groups[key]
+            try:
+                async with semaphore:
+                    ticket = None
+                    if not _summarize_flight.in_flight(key):
+                        ticket = (spare_tickets.pop() if spare_tickets
+                                  else get_admission_controller().enqueue(client_id, PRIORITY_SUMMARIZE))
+                    subscription = summary_payloads(key, page.content, page.url, page.title, ticket)
+                    try:
+                        async for payload in subscription:
+                            await events.put((page_ids, payload))
+                    finally:
+                        subscription.leave()
+                await events.put((page_ids, {"type": "page_done"}))
+            except QueueFull as e:
+                await events.put((page_ids, {"type": "error", "content": str(e), "retry_after": e.retry_after}))
+            except Exception as e:
+                logger.error(f"❌ Batch summarization error for {page.url}: {e}")
+                await events.put((page_ids, {"type": "error", "content": f"Summarization failed: {str(e)}"}))
+            finally:
+                await events.put(None)
+
+        workers = [asyncio.ensure_future(worker(key)) for key in pending]
+        try:
+            remaining = len(workers)
+            while remaining:
+                item = await events.get()
+                if item is None:
+                    remaining -= 1
+                    continue
+                for payload in tagged(*item):
+                    yield payload
+        finally:
+            for task in workers:
+                task.cancel()
+
+        yield {"type": "batch_done", "pages": len(batch.pages), "unique": len(groups)}
+
+    return EventSourceResponse(
+        framed(measured("summarize-batch", batch_payloads(), started)),
+        background=BackgroundTask(release_spare_tickets),
+    )
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint to verify the API is running."""
     return {"status": "healthy", "service": "cluj-ai-api"}
 
+@app.get("/stats")
+async def stats():
+    """Debug endpoint with internal performance counters."""
+    from tools import get_search_cache_stats, get_router_stats
+    return {
+        "http_pool": get_pool_stats(),
+        "router": get_router_stats(),
+        "search_cache": get_search_cache_stats(),
+        "summarize_singleflight": _summarize_flight.stats(),
+        "summary_cache": get_summary_cache().stats(),
+        "semantic_cache": get_semantic_cache().stats(),
+        "prompt_cache": prompt_cache.get_prompt_cache_stats(),
+        "compaction": compaction.get_compaction_stats(),
+        "tool_prefetch": prefetch.get_prefetch_stats(),
+        "memory": get_conversation_store().stats(),
+        "agent_stream": _stream_stats.as_dict(),
+        "llm_pool": get_llm_pool().stats(),
+        "admission": get_admission_controller().stats(),
+        "event_loop": get_loop_monitor().stats(),
+    }
+
+def subsystem_metrics():
+    """/metrics collector: the counters /stats already reports, in Prometheus form."""
+    from tools import get_search_cache_stats, get_router_stats
+    search = get_search_cache_stats()
+    router = get_router_stats()
+    summaries = get_summary_cache().stats()
+    semantic = get_semantic_cache().stats()
+    admission = get_admission_controller().stats()
+    loop = get_loop_monitor().stats()
+    speculative = prefetch.get_prefetch_stats()
+
+    cache_results = {
+        "search_memory": (search["memory"]["hits"], search["memory"]["misses"]),
+        "search_disk": (search["disk"]["hits"], search["disk"]["misses"]),
+        "router": (router["cache_hits"], router["cache_misses"]),
+        "summary_page": (summaries["page_hits"], summaries["page_misses"]),
+        "summary_chunk": (summaries["chunk_hits"], summaries["chunk_misses"]),
+        "semantic": (semantic["hits"], semantic["misses"]),
+    }
+    backends = get_llm_pool().stats()["backends"]
+    return [
+        ("cache_requests_total", "counter", "Cache lookups by tier and result", [
+            ({"cache": cache, "result": result}, count)
+            for cache, (hits, misses) in cache_results.items()
+            for result, count in (("hit", hits), ("miss", misses))
+        ]),
+        ("search_stale_served_total", "counter", "Expired search results served while refreshing",
+         [({}, search["stale_served"])]),
+        ("admission_running", "gauge", "Requests holding an LLM admission slot", [({}, admission["running"])]),
+        ("admission_queue_depth", "gauge", "Requests waiting for admission", [({}, admission["waiting"])]),
+        ("admission_shed_total", "counter", "Requests rejected with 429", [({}, admission["shed"])]),
+        ("admission_abandoned_total", "counter", "Queued requests whose client went away",
+         [({}, admission["abandoned"])]),
+        ("llm_backend_outstanding", "gauge", "In-flight requests per llama-server",
+         [({"backend": b["url"]}, b["outstanding"]) for b in backends]),
+        ("llm_backend_available", "gauge", "1 when the backend is healthy and not cooling down",
+         [({"backend": b["url"]}, int(b["available"])) for b in backends]),
+        ("llm_backend_failures_total", "counter", "Connection failures per llama-server",
+         [({"backend": b["url"]}, b["failures"]) for b in backends]),
+        ("sse_frames_saved_total", "counter", "Token frames merged away by coalescing",
+         [({}, _stream_stats.frames_saved)]),
+        ("compaction_tokens_saved_total", "counter", "Tool-output tokens kept out of agent prompts",
+         [({}, compaction.get_compaction_stats()["tokens_saved"])]),
+        ("tool_prefetch_total", "counter", "Speculative tool calls by outcome", [
+            ({"result": result}, speculative[key])
+            for result, key in (("hit", "hits"), ("miss", "misses"), ("unused", "unused"), ("error", "errors"))
+        ]),
+        ("tool_prefetch_hidden_seconds_total", "counter", "Tool time overlapped with the model's generation",
+         [({}, speculative["hidden_ms"] / 1000)]),
+        ("memory_sessions", "gauge", "Conversation sessions held in memory",
+         [({}, get_conversation_store().stats()["sessions"])]),
+        ("event_loop_lag_seconds_total", "counter", "Summed event-loop lag over all probes",
+         [({}, loop["total_lag_ms"] / 1000)]),
+        ("event_loop_lag_probes_total", "counter", "Event-loop lag probes taken", [({}, loop["samples"])]),
+        ("event_loop_lag_recent_max_seconds", "gauge", "Worst event-loop lag over the recent window",
+         [({}, loop["recent_max_ms"] / 1000)]),
+    ]
+
+metrics.REGISTRY.add_collector(subsystem_metrics)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text exposition of request, tool, LLM and cache metrics."""
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/tools")
 async def list_tools():
     """Debug endpoint to list available tools."""
@@ -278,7 +677,7 @@ async def test_search():
     """Test the search tool directly"""
     try:
         from tools import search_tool
-        result = search_tool("current president of the United States")
+        result = await search_tool.ainvoke({"query": "current president of the United States"})
         return {
             "status": "search_tool test completed",
             "result_length": len(result),
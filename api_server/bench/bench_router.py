@@ -0,0 +1,102 @@
+# File: bench/bench_router.py
+"""Micro-benchmark: per-query routing cost as the rule set grows.
+
+Compares the legacy "re.search every rule in order" loop with ToolRouter
+(uncached, so the LRU does not hide the matching cost). Exits non-zero if
+ToolRouter's cost at the largest rule count exceeds --max-growth times its
+cost at the smallest.
+
+    python bench/bench_router.py [--sizes 8,64,512,2048] [--max-growth 3]
+"""
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from router import RoutingRule, ToolRouter
+
+QUERIES = [
+    "what is the weather in cluj tomorrow?",
+    "tell me a dad joke",
+    "latest news about the election",
+    "who is the current ceo of nvidia?",
+    "capital of australia",
+    "run ls -la in my home folder",
+    "hello there, how was your day",
+    "explain how transformers work in machine learning",
+]
+
+
+def synthetic_rules(count: int, rng: random.Random) -> list:
+    """count rules with random keywords that (almost) never hit the sample queries."""
+    rules = []
+    for i in range(count):
+        words = tuple(
+            "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(6, 10)))
+            for _ in range(4)
+        )
+        pattern = "|".join(re.escape(w) for w in words)
+        rules.append(RoutingRule(f"r{i}", pattern, f"tool_{i % 7}", rng.randint(0, 30), words))
+    return rules
+
+
+def legacy_route(rules: list, query: str):
+    query_lower = query.lower().strip()
+    for rule in rules:
+        if re.search(rule.pattern, query_lower):
+            return rule.tool
+    return None
+
+
+def per_query_us(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for query in QUERIES:
+            fn(query)
+    return (time.perf_counter() - started) / (repeat * len(QUERIES)) * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="8,64,512,2048")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--max-growth", type=float, default=3.0)
+    args = parser.parse_args()
+
+    from tools import TOOL_ROUTING_RULES
+
+    rng = random.Random(1234)
+    sizes = [int(n) for n in args.sizes.split(",")]
+    print(f"{'rules':>7} {'legacy µs/query':>16} {'router µs/query':>16}")
+
+    router_costs = []
+    for size in sizes:
+        rules = list(TOOL_ROUTING_RULES) + synthetic_rules(size, rng)
+        router = ToolRouter(rules, cache_size=1)
+        # Bypass the decision LRU: measure the single-pass match itself
+        uncached = lambda q: router._match(q.lower().strip())
+
+        legacy = per_query_us(lambda q: legacy_route(rules, q), max(1, args.repeat // 10))
+        fast = per_query_us(uncached, args.repeat)
+        router_costs.append(fast)
+        print(f"{len(rules):>7} {legacy:>16.2f} {fast:>16.2f}")
+
+    cached_router = ToolRouter(TOOL_ROUTING_RULES)
+    cached = per_query_us(cached_router.route, args.repeat)
+    print(f"\ncached decision (LRU hit): {cached:.2f} µs/query")
+
+    growth = router_costs[-1] / router_costs[0]
+    print(f"router cost growth {sizes[0]} -> {sizes[-1]} rules: x{growth:.2f}")
+    if growth > args.max_growth:
+        print(f"FAIL: growth exceeds x{args.max_growth}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+# File: bench/load_test.py
+"""Load test for /agent-chat and /summarize at a fixed concurrency.
+
+Reports, per endpoint:
+- time to first token (TTFT)
+- tokens/s per stream
+- p50/p95/p99 end-to-end latency
+- 429 and error counts
+- event-loop lag, from the server's /stats during the run
+
+Results can be saved as JSON and compared with an earlier run. With
+--compare, the exit status is non-zero when a latency percentile or
+the token rate regresses by more than --max-regression.
+
+    # against a running server
+    python bench/load_test.py --url http://localhost:8000 --concurrency 8 --requests 200
+
+    # self-contained: spawn the mocks (bench/mock_servers.py) and an API server
+    python bench/load_test.py --spawn --ttft-ms 150 --token-rate 40 --out run.json
+    python bench/load_test.py --spawn --out new.json --compare run.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(BENCH_DIR)
+
+# Search-routed questions take the fast path (tool + one generation); the
+# rest go through the agent loop. No weather/joke queries: those tools call
+# public APIs the mocks do not replace.
+AGENT_QUERIES = [
+    "latest news about the mars rover",
+    "what happened in the election today",
+    "who is the ceo of nvidia",
+    "explain how transformers work in machine learning",
+    "write a haiku about autumn in cluj",
+    "compare python and rust for command line tools",
+    "what is the capital of australia",
+    "summarize the plot of hamlet in three sentences",
+]
+
+WORDS = "page text about systems latency caching streaming queues models tokens users requests".split()
+
+
+def percentile(values: list, p: float) -> float | None:
+    """Nearest-rank percentile (p in 0..100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(p / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def page_content(rng: random.Random, chars: int) -> str:
+    words, size = [], 0
+    while size < chars:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    # Paragraph breaks give the chunker natural cut points
+    return "\n\n".join(" ".join(words[i:i + 80]) for i in range(0, len(words), 80))
+
+
+async def run_one(client: httpx.AsyncClient, url: str, body: dict, headers: dict) -> dict:
+    """POST one streaming request and time it from the client's side."""
+    started = time.perf_counter()
+    result = {"status": None, "ttft": None, "latency": None, "tokens": 0, "error": None, "cached": False}
+    first_token = None
+    try:
+        async with client.stream("POST", url, json=body, headers=headers) as response:
+            result["status"] = response.status_code
+            if response.status_code != 200:
+                await response.aread()
+                result["latency"] = time.perf_counter() - started
+                return result
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                try:
+                    payload = json.loads(line[5:].strip())
+                except ValueError:
+                    continue
+                kind = payload.get("type")
+                if kind == "token":
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    # Coalesced frames carry several tokens; count words as a proxy
+                    result["tokens"] += max(1, len(payload.get("content", "").split()))
+                    result["cached"] = result["cached"] or bool(payload.get("cached"))
+                elif kind == "error":
+                    result["error"] = payload.get("content", "error")
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    finished = time.perf_counter()
+    result["latency"] = finished - started
+    if first_token is not None:
+        result["ttft"] = first_token - started
+        streaming = finished - first_token
+        if result["tokens"] > 1 and streaming > 0:
+            result["tokens_per_s"] = (result["tokens"] - 1) / streaming
+    return result
+
+
+def summarize_results(results: list, wall: float) -> dict:
+    ok = [r for r in results if r["status"] == 200 and r["error"] is None and r["ttft"] is not None]
+    latencies = [r["latency"] for r in ok]
+    ttfts = [r["ttft"] for r in ok]
+    # Cache replays arrive in one frame; they would swamp the generation rate
+    rates = [r["tokens_per_s"] for r in ok if "tokens_per_s" in r and not r["cached"]]
+    ms = lambda v: round(v * 1000, 1) if v is not None else None
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "rejected_429": sum(1 for r in results if r["status"] == 429),
+        "errors": sum(1 for r in results if r["error"] is not None or r["status"] not in (200, 429)),
+        "cached": sum(1 for r in ok if r["cached"]),
+        "throughput_rps": round(len(ok) / wall, 2) if wall else 0.0,
+        "ttft_ms": {f"p{p}": ms(percentile(ttfts, p)) for p in (50, 95, 99)},
+        "latency_ms": {f"p{p}": ms(percentile(latencies, p)) for p in (50, 95, 99)},
+        "tokens_per_s": {
+            "p50": round(percentile(rates, 50), 1) if rates else None,
+            "mean": round(sum(rates) / len(rates), 1) if rates else None,
+        },
+    }
+
+
+async def fetch_loop_stats(client: httpx.AsyncClient, base_url: str) -> dict | None:
+    try:
+        response = await client.get(f"{base_url}/stats", timeout=10)
+        return response.json().get("event_loop")
+    except Exception:
+        return None
+
+
+def loop_lag_between(before: dict | None, after: dict | None) -> dict | None:
+    """Mean lag over the run from the cumulative counters, plus the recent window."""
+    if not before or not after:
+        return None
+    samples = after["samples"] - before["samples"]
+    return {
+        "samples": samples,
+        "mean_ms": round((after["total_lag_ms"] - before["total_lag_ms"]) / samples, 2) if samples else 0.0,
+        "recent_p99_ms": after["recent_p99_ms"],
+        "recent_max_ms": after["recent_max_ms"],
+    }
+
+
+async def run_scenario(args, endpoint: str) -> dict:
+    rng = random.Random(args.seed)
+    url = f"{args.url}{endpoint}"
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+
+    def request_body(i: int) -> dict:
+        if endpoint == "/summarize":
+            # --repeat-pages N cycles through N pages, so later requests hit the summary cache
+            page = i % args.repeat_pages if args.repeat_pages else i
+            page_rng = random.Random(args.seed * 100003 + page)
+            return {"content": page_content(page_rng, args.page_chars),
+                    "url": f"https://bench.test/page/{page}", "title": f"Bench page {page}"}
+        body = {"input": f"{rng.choice(AGENT_QUERIES)} ({i})" if args.unique else rng.choice(AGENT_QUERIES),
+                "coalesce_ms": args.coalesce_ms}
+        if args.sessions:
+            body["session_id"] = f"bench-{i % args.sessions}"
+        return body
+
+    bodies = [request_body(i) for i in range(args.requests)]
+    results = []
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        before = await fetch_loop_stats(client, args.url)
+        queue = asyncio.Queue()
+        for body in bodies:
+            queue.put_nowait(body)
+
+        async def worker(worker_id: int):
+            # Distinct client ids so per-client admission caps do not serialize the run
+            headers = {"X-Client-Id": f"bench-{worker_id}"}
+            while not queue.empty():
+                body = queue.get_nowait()
+                results.append(await run_one(client, url, body, headers))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(w) for w in range(args.concurrency)))
+        wall = time.perf_counter() - started
+        after = await fetch_loop_stats(client, args.url)
+
+    summary = summarize_results(results, wall)
+    summary["wall_s"] = round(wall, 2)
+    summary["event_loop_lag"] = loop_lag_between(before, after)
+    return summary
+
+
+# Metrics checked by --compare: (path, True when higher is worse)
+COMPARED_METRICS = [
+    (("ttft_ms", "p50"), True),
+    (("ttft_ms", "p95"), True),
+    (("latency_ms", "p50"), True),
+    (("latency_ms", "p95"), True),
+    (("latency_ms", "p99"), True),
+    (("tokens_per_s", "p50"), False),
+    (("throughput_rps",), False),
+]
+
+
+def lookup(summary: dict, path: tuple):
+    for key in path:
+        summary = summary.get(key) if isinstance(summary, dict) else None
+    return summary
+
+
+def compare_runs(baseline: dict, current: dict, max_regression: float) -> list:
+    """Print a per-metric comparison; return the regressions beyond max_regression."""
+    regressions = []
+    print(f"\n{'scenario':<14} {'metric':<20} {'baseline':>10} {'current':>10} {'change':>8}")
+    for scenario, summary in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(scenario)
+        if base is None:
+            continue
+        for path, higher_is_worse in COMPARED_METRICS:
+            old, new = lookup(base, path), lookup(summary, path)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change if higher_is_worse else -change
+            flag = "  <- regression" if worse > max_regression else ""
+            print(f"{scenario:<14} {'.'.join(path):<20} {old:>10} {new:>10} {change:>+8.1%}{flag}")
+            if flag:
+                regressions.append((scenario, ".".join(path), old, new))
+    return regressions
+
+
+def wait_until_up(url: str, timeout: float) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def spawn_stack(args) -> list:
+    """Start the mocks and an API server wired to them, with a throwaway cache dir."""
+    mock_args = [
+        "--llm-port", str(args.llm_port), "--searx-port", str(args.searx_port),
+        "--ttft-ms", str(args.ttft_ms), "--token-rate", str(args.token_rate), "--tokens", str(args.tokens),
+        "--fail-rate", str(args.fail_rate), "--tool-call-rate", str(args.tool_call_rate),
+        "--search-latency-ms", str(args.search_latency_ms), "--search-fail-rate", str(args.search_fail_rate),
+    ]
+    home = tempfile.mkdtemp(prefix="cluj-bench-")
+    env = dict(
+        os.environ,
+        HOME=home,
+        LLM_BACKENDS=f"http://127.0.0.1:{args.llm_port}",
+        EMBEDDING_BASE_URL=f"http://127.0.0.1:{args.llm_port}",
+        SEARXNG_URL=f"http://127.0.0.1:{args.searx_port}/search",
+        LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"),
+        PYTHONUNBUFFERED="1",
+    )
+    port = args.url.rsplit(":", 1)[-1].strip("/")
+    processes = [
+        subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "mock_servers.py"), *mock_args], env=env),
+    ]
+    wait_until_up(f"http://127.0.0.1:{args.llm_port}/health", 30)
+    processes.append(subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api_server:app", "--port", port, "--log-level", "warning"],
+        cwd=SERVER_DIR, env=env,
+    ))
+    wait_until_up(f"{args.url}/health", 120)
+    return processes
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:18000", help="API server base URL")
+    parser.add_argument("--scenarios", default="agent-chat,summarize", help="comma list: agent-chat, summarize")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=64, help="requests per scenario")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--coalesce-ms", type=int, default=None, help="agent-chat coalescing window (server default)")
+    parser.add_argument("--sessions", type=int, default=0, help="spread agent-chat over N session ids (0 = none)")
+    parser.add_argument("--unique", action="store_true", help="make every agent-chat input distinct")
+    parser.add_argument("--page-chars", type=int, default=12000, help="size of each /summarize page")
+    parser.add_argument("--repeat-pages", type=int, default=0, help="cycle through N distinct pages (0 = all distinct)")
+    parser.add_argument("--out", help="write the results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed relative regression")
+
+    spawn = parser.add_argument_group("--spawn: run against local mocks")
+    spawn.add_argument("--spawn", action="store_true", help="start bench/mock_servers.py and an API server")
+    spawn.add_argument("--llm-port", type=int, default=18080)
+    spawn.add_argument("--searx-port", type=int, default=13000)
+    spawn.add_argument("--ttft-ms", type=float, default=150)
+    spawn.add_argument("--token-rate", type=float, default=40)
+    spawn.add_argument("--tokens", type=int, default=60)
+    spawn.add_argument("--fail-rate", type=float, default=0.0)
+    spawn.add_argument("--tool-call-rate", type=float, default=0.3)
+    spawn.add_argument("--search-latency-ms", type=float, default=120)
+    spawn.add_argument("--search-fail-rate", type=float, default=0.0)
+    return parser.parse_args(argv)
+
+
+def print_summary(scenario: str, summary: dict) -> None:
+    lag = summary["event_loop_lag"] or {}
+    print(f"\n== {scenario}: {summary['ok']}/{summary['requests']} ok, "
+          f"{summary['rejected_429']} rejected, {summary['errors']} errors, "
+          f"{summary['cached']} cached, {summary['throughput_rps']} req/s over {summary['wall_s']}s")
+    for name in ("ttft_ms", "latency_ms"):
+        values = summary[name]
+        print(f"   {name:<12} p50 {values['p50']}  p95 {values['p95']}  p99 {values['p99']}")
+    print(f"   tokens/s     p50 {summary['tokens_per_s']['p50']}  mean {summary['tokens_per_s']['mean']}")
+    if lag:
+        print(f"   loop lag     mean {lag['mean_ms']} ms  recent p99 {lag['recent_p99_ms']} ms  "
+              f"recent max {lag['recent_max_ms']} ms")
+
+
+def main() -> int:
+    args = parse_args()
+    processes = spawn_stack(args) if args.spawn else []
+    try:
+        run = {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+            "scenarios": {},
+        }
+        for scenario in args.scenarios.split(","):
+            scenario = scenario.strip()
+            summary = asyncio.run(run_scenario(args, f"/{scenario}"))
+            run["scenarios"][scenario] = summary
+            print_summary(scenario, summary)
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"\nresults written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_runs(baseline, run, args.max_regression)
+        if regressions:
+            print(f"\nFAIL: {len(regressions)} metric(s) regressed by more than {args.max_regression:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+# File: bench/mock_servers.py
+"""Local stand-ins for llama-server and SearXNG, for load tests without a GPU.
+
+The LLM mock speaks the parts of llama.cpp's API the server uses:
+- streaming and non-streaming /v1/chat/completions, with "timings"
+- /v1/embeddings, /tokenize, /health and /slots
+
+The SearXNG mock answers /search?format=json. Both mocks can inject
+latency and failures.
+
+    python bench/mock_servers.py [--llm-port 18080] [--searx-port 13000]
+        [--ttft-ms 150] [--token-rate 40] [--tokens 60] [--fail-rate 0]
+        [--tool-call-rate 0.3] [--search-latency-ms 120] [--search-fail-rate 0]
+
+Point the API server at them with LLM_BACKENDS=http://127.0.0.1:18080 and
+SEARXNG_URL=http://127.0.0.1:13000/search (bench/load_test.py --spawn
+does this for you).
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "the model streams a plausible answer made of ordinary words so that "
+    "tokenization chunking and rendering costs look like real traffic"
+).split()
+
+
+def build_llm_app(args) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(args.seed)
+
+    def delay(mean_ms: float) -> float:
+        """Latency with +-25% jitter, in seconds."""
+        return max(mean_ms * rng.uniform(0.75, 1.25), 0) / 1000
+
+    def wants_tool_call(body: dict) -> dict | None:
+        """A search_tool call for agent requests that have not used a tool yet."""
+        messages = body.get("messages", [])
+        tools = {t.get("function", {}).get("name") for t in body.get("tools", [])}
+        if "search_tool" not in tools or any(m.get("role") == "tool" for m in messages):
+            return None
+        if rng.random() >= args.tool_call_rate:
+            return None
+        user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        user = str(user).split("\n\n")[0]  # the question, without the "(Current date: ...)" line
+        return {
+            "index": 0,
+            "id": f"call_{rng.getrandbits(32):08x}",
+            "type": "function",
+            "function": {"name": "search_tool", "arguments": json.dumps({"query": str(user)[:80]})},
+        }
+
+    def chunk(delta: dict, finish_reason=None, **extra) -> str:
+        payload = {
+            "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": "mock", "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            **extra,
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        if rng.random() < args.fail_rate:
+            await asyncio.sleep(delay(args.ttft_ms))
+            return JSONResponse({"error": {"message": "injected failure"}}, status_code=503)
+
+        prompt_chars = sum(len(str(m.get("content") or "")) for m in body.get("messages", []))
+        timings = {"prompt_n": prompt_chars // 4, "cache_n": 0, "prompt_ms": args.ttft_ms,
+                   "predicted_n": args.tokens, "predicted_ms": args.tokens * 1000 / args.token_rate}
+        tool_call = wants_tool_call(body)
+        words = [rng.choice(WORDS) for _ in range(args.tokens)]
+
+        if not body.get("stream"):
+            await asyncio.sleep(delay(args.ttft_ms) + args.tokens / args.token_rate)
+            message = {"role": "assistant", "content": "" if tool_call else " ".join(words)}
+            if tool_call:
+                message["tool_calls"] = [{k: v for k, v in tool_call.items() if k != "index"}]
+            return {
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()),
+                "model": "mock", "timings": timings,
+                "choices": [{"index": 0, "message": message,
+                             "finish_reason": "tool_calls" if tool_call else "stop"}],
+                "usage": {"prompt_tokens": timings["prompt_n"], "completion_tokens": args.tokens,
+                          "total_tokens": timings["prompt_n"] + args.tokens},
+            }
+
+        async def stream():
+            await asyncio.sleep(delay(args.ttft_ms))
+            if tool_call:
+                yield chunk({"role": "assistant", "content": None, "tool_calls": [tool_call]})
+                yield chunk({}, "tool_calls", timings=timings)
+            else:
+                yield chunk({"role": "assistant", "content": ""})
+                interval = 1 / args.token_rate
+                for i, word in enumerate(words):
+                    yield chunk({"content": word if i == 0 else " " + word})
+                    await asyncio.sleep(interval)
+                yield chunk({}, "stop", timings=timings)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        data = []
+        for i, text in enumerate(inputs):
+            digest = hashlib.sha256(str(text).encode()).digest()
+            data.append({"object": "embedding", "index": i, "embedding": [b / 255 - 0.5 for b in digest]})
+        return {"object": "list", "data": data, "model": "mock"}
+
+    @app.post("/tokenize")
+    async def tokenize(request: Request):
+        body = await request.json()
+        return {"tokens": list(range(len(body.get("content", "")) // 4))}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/slots")
+    async def slots():
+        return [{"id": i, "is_processing": False} for i in range(args.slots)]
+
+    return app
+
+
+def build_searx_app(args) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(args.seed + 1)
+
+    @app.get("/search")
+    async def search(q: str = "", format: str = "json"):
+        await asyncio.sleep(max(args.search_latency_ms * rng.uniform(0.75, 1.25), 0) / 1000)
+        if rng.random() < args.search_fail_rate:
+            return JSONResponse({"error": "injected failure"}, status_code=500)
+        words = q.split() or ["empty"]
+        results = [
+            {
+                "title": f"{' '.join(words[:4]).title()} - result {i + 1}",
+                "url": f"https://example{(i + len(words)) % 7}.test/{'-'.join(words[:3])}/{i}",
+                "content": " ".join(rng.choice(WORDS) for _ in range(40)),
+            }
+            for i in range(args.search_results)
+        ]
+        return {"query": q, "results": results}
+
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--llm-port", type=int, default=18080)
+    parser.add_argument("--searx-port", type=int, default=13000)
+    parser.add_argument("--ttft-ms", type=float, default=150, help="delay before the first token")
+    parser.add_argument("--token-rate", type=float, default=40, help="tokens per second per stream")
+    parser.add_argument("--tokens", type=int, default=60, help="tokens per completion")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of completions answered 503")
+    parser.add_argument("--tool-call-rate", type=float, default=0.3,
+                        help="fraction of agent turns that call search_tool first")
+    parser.add_argument("--slots", type=int, default=4, help="slots reported by /slots")
+    parser.add_argument("--search-latency-ms", type=float, default=120)
+    parser.add_argument("--search-fail-rate", type=float, default=0.0)
+    parser.add_argument("--search-results", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1234)
+    return parser.parse_args(argv)
+
+
+async def serve(args) -> None:
+    servers = [
+        uvicorn.Server(uvicorn.Config(build_llm_app(args), host=args.host, port=args.llm_port, log_level="warning")),
+        uvicorn.Server(uvicorn.Config(build_searx_app(args), host=args.host, port=args.searx_port, log_level="warning")),
+    ]
+    print(f"mock llama-server on http://{args.host}:{args.llm_port}, "
+          f"mock SearXNG on http://{args.host}:{args.searx_port}/search", flush=True)
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+if __name__ == "__main__":
+    asyncio.run(serve(parse_args()))
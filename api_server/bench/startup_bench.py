@@ -0,0 +1,115 @@
+# File: bench/startup_bench.py
+"""Startup benchmark for the CLI, from `python -X importtime`.
+
+Runs each scenario in a fresh interpreter several times and reports:
+- median wall time
+- median import time
+- the slowest top-level imports
+
+Exits non-zero when a guard fails:
+- the usage path imports any --forbid module (LangChain, numpy, httpx by
+  default)
+- a scenario's median wall time exceeds its --max-*-ms budget
+
+    python bench/startup_bench.py [--repeat 5] [--top 8] [--max-usage-ms 150]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(BENCH_DIR)
+
+# name -> python arguments; the agent scenario is what `main.py run` pays before the first request
+SCENARIOS = {
+    "usage": ["main.py"],
+    "import-tools": ["-c", "import tools"],
+    "build-agent": ["-c", "import main; main.get_agent_executor()"],
+}
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(stderr: str) -> list:
+    """(cumulative_us, module) for each top-level import, slowest first."""
+    top = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match and len(match.group(3)) == 1:
+            top.append((int(match.group(2)), match.group(4)))
+    return sorted(top, reverse=True)
+
+
+def imported_modules(stderr: str) -> set:
+    return {match.group(4) for match in map(IMPORT_LINE.match, stderr.splitlines()) if match}
+
+
+def run_scenario(args: list, home: str) -> tuple[float, str]:
+    env = dict(os.environ, HOME=home, PYTHONDONTWRITEBYTECODE="1")
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=SERVER_DIR, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{completed.stderr[-2000:]}")
+    return wall, completed.stderr
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="slowest top-level imports to list")
+    parser.add_argument("--forbid", default="langchain,langchain_core,langchain_openai,numpy,httpx",
+                        help="modules the usage path must not import")
+    parser.add_argument("--max-usage-ms", type=float, default=None, help="budget for `python main.py`")
+    parser.add_argument("--max-tools-ms", type=float, default=None, help="budget for `import tools`")
+    parser.add_argument("--max-agent-ms", type=float, default=None, help="budget for building the agent")
+    args = parser.parse_args()
+
+    budgets = {"usage": args.max_usage_ms, "import-tools": args.max_tools_ms, "build-agent": args.max_agent_ms}
+    failures = []
+    home = tempfile.mkdtemp(prefix="cluj-startup-")
+
+    for name in args.scenarios.split(","):
+        walls, import_totals, stderr = [], [], ""
+        # One untimed run first, so every timed run sees a warm OS file cache
+        run_scenario(SCENARIOS[name], home)
+        for _ in range(args.repeat):
+            wall, stderr = run_scenario(SCENARIOS[name], home)
+            walls.append(wall)
+            import_totals.append(sum(us for us, _ in parse_importtime(stderr)))
+
+        wall_ms = statistics.median(walls) * 1000
+        import_ms = statistics.median(import_totals) / 1000
+        print(f"\n== {name}: wall {wall_ms:.0f} ms (median of {args.repeat}), imports {import_ms:.0f} ms")
+        for us, module in parse_importtime(stderr)[:args.top]:
+            print(f"   {us / 1000:>8.1f} ms  {module}")
+
+        if name == "usage":
+            forbidden = {m.strip() for m in args.forbid.split(",") if m.strip()}
+            leaked = sorted(
+                module for module in imported_modules(stderr)
+                if module in forbidden or module.split(".")[0] in forbidden
+            )
+            roots = sorted({module.split(".")[0] for module in leaked})
+            if roots:
+                failures.append(f"usage path imports {', '.join(roots)}")
+        budget = budgets.get(name)
+        if budget is not None and wall_ms > budget:
+            failures.append(f"{name}: {wall_ms:.0f} ms exceeds {budget:.0f} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+# File: cache.py
+
+import json
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+
+class MemoryCache:
+    """Bounded in-process LRU cache sized by entry count and bytes.
+
+    Every entry carries its own expiry. Expired entries are still returned
+    for stale_grace seconds so callers can serve them while revalidating.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, stale_grace: float = 0.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_grace = stale_grace
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> tuple[str, float] | None:
+        """Return (value, expires_at) and mark the entry most recently used, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at, size = entry
+            now = time.time()
+            if now >= expires_at + self.stale_grace:
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            if now >= expires_at:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            return value, expires_at
+
+    def put(self, key: str, value: str, expires_at: float) -> None:
+        """Insert a value that is fresh until expires_at."""
+        size = sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class CacheBackend(ABC):
+    """Persistent key/value store behind the in-memory tier.
+
+    Entries carry their own expiry so sweep() can drop them in bulk; like
+    MemoryCache, rows stay readable for stale_grace seconds past it.
+    """
+
+    stale_grace = 0.0
+
+    @abstractmethod
+    def get(self, key: str) -> tuple[str, float, float] | None:
+        """Return (value, stored_at, expires_at) for a readable entry, or None."""
+
+    @abstractmethod
+    def put(self, key: str, value: str, stored_at: float, expires_at: float, query: str = "") -> None:
+        """Store an entry, replacing any previous one for key."""
+
+    @abstractmethod
+    def sweep(self, now: float | None = None) -> int:
+        """Delete expired entries and enforce the size cap. Returns rows removed."""
+
+    def stats(self) -> dict:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+class JsonFileBackend(CacheBackend):
+    """Legacy layout: one <key>.json file per entry."""
+
+    def __init__(self, directory: Path, default_ttl: float, max_entries: int, stale_grace: float = 0.0):
+        self.directory = directory
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.stale_grace = stale_grace
+
+    def _expires_at(self, cache_data: dict) -> tuple[float, float]:
+        stored_at = datetime.fromisoformat(cache_data['timestamp']).timestamp()
+        return stored_at, cache_data.get('expires', stored_at + self.default_ttl)
+
+    def get(self, key):
+        cache_file = self.directory / f"{key}.json"
+        try:
+            cache_data = json.loads(cache_file.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        stored_at, expires_at = self._expires_at(cache_data)
+        if time.time() >= expires_at + self.stale_grace:
+            return None
+        return cache_data['result'], stored_at, expires_at
+
+    def put(self, key, value, stored_at, expires_at, query=""):
+        cache_file = self.directory / f"{key}.json"
+        cache_data = {
+            'timestamp': datetime.fromtimestamp(stored_at).isoformat(),
+            'expires': expires_at,
+            'query': query,
+            'result': value,
+        }
+        # Write-then-rename so readers never see a half-written file
+        tmp_file = cache_file.with_suffix(".tmp")
+        tmp_file.write_text(json.dumps(cache_data))  # No indent for speed
+        tmp_file.replace(cache_file)
+
+    def sweep(self, now=None):
+        now = now or time.time()
+        removed = 0
+        live = []
+        for cache_file in self.directory.glob("*.json"):
+            try:
+                _, expires_at = self._expires_at(json.loads(cache_file.read_text()))
+            except (OSError, ValueError, KeyError):
+                expires_at = 0
+            if expires_at + self.stale_grace <= now:
+                cache_file.unlink(missing_ok=True)
+                removed += 1
+            else:
+                live.append((expires_at, cache_file))
+
+        # Over the cap: drop the entries closest to expiry first
+        live.sort()
+        for _, cache_file in live[:max(0, len(live) - self.max_entries)]:
+            cache_file.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+
+class SQLiteBackend(CacheBackend):
+    """Single-file store in WAL mode with an expiry index."""
+
+    def __init__(self, path: Path, max_entries: int, max_bytes: int, stale_grace: float = 0.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_grace = stale_grace
+        self.swept = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " query TEXT,"
+            " value TEXT NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " size INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_expires ON entries(expires_at)")
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at, expires_at FROM entries WHERE key = ? AND expires_at > ?",
+                (key, time.time() - self.stale_grace),
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def get_many(self, keys: list[str]) -> dict[str, tuple[str, float, float]]:
+        """get() for many keys in one query per 500; keys with no readable entry are left out."""
+        found = {}
+        cutoff = time.time() - self.stale_grace
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for key, *row in self._conn.execute(
+                    f"SELECT key, value, stored_at, expires_at FROM entries"
+                    f" WHERE key IN ({placeholders}) AND expires_at > ?",
+                    (*batch, cutoff),
+                ):
+                    found[key] = tuple(row)
+        return found
+
+    def put(self, key, value, stored_at, expires_at, query=""):
+        with self._lock:
+            # A single statement is atomic; WAL keeps readers unblocked
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, query, value, stored_at, expires_at, size)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, query, value, stored_at, expires_at, len(value)),
+            )
+
+    def put_many(self, rows: list[tuple]) -> None:
+        """Insert (key, query, value, stored_at, expires_at) rows in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO entries (key, query, value, stored_at, expires_at, size)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    [(k, q, v, s, e, len(v)) for k, q, v, s, e in rows],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def sweep(self, now=None):
+        now = now or time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                removed = self._conn.execute(
+                    "DELETE FROM entries WHERE expires_at <= ?", (now - self.stale_grace,)
+                ).rowcount
+
+                count, total = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+                if count > self.max_entries or total > self.max_bytes:
+                    # Evict the entries closest to expiry until under both caps
+                    excess_rows = max(0, count - self.max_entries)
+                    excess_bytes = max(0, total - self.max_bytes)
+                    victims = []
+                    freed = 0
+                    for key, size in self._conn.execute(
+                        "SELECT key, size FROM entries ORDER BY expires_at"
+                    ):
+                        if len(victims) >= excess_rows and freed >= excess_bytes:
+                            break
+                        victims.append((key,))
+                        freed += size
+                    self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+                    removed += len(victims)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.swept += removed
+        return removed
+
+    def stats(self):
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {"entries": count, "bytes": total, "swept": self.swept}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_json_cache(directory: Path, backend: SQLiteBackend, default_ttl: float) -> int:
+    """One-shot import of legacy <key>.json files; each file is removed once copied.
+
+    Files that cannot be read or lack a field are skipped and left in place.
+    Well-formed but expired entries are dropped, as a sweep would drop them.
+    """
+    legacy = JsonFileBackend(directory, default_ttl, max_entries=0)
+    rows = []
+    done = []
+    for cache_file in directory.glob("*.json"):
+        try:
+            cache_data = json.loads(cache_file.read_text())
+            stored_at, expires_at = legacy._expires_at(cache_data)
+            result = cache_data['result']
+        except (OSError, ValueError, KeyError, TypeError):
+            continue
+        if expires_at + backend.stale_grace > time.time():
+            rows.append((cache_file.stem, cache_data.get('query', ''), result, stored_at, expires_at))
+        done.append(cache_file)
+
+    if rows:
+        backend.put_many(rows)
+    for cache_file in done:
+        cache_file.unlink(missing_ok=True)
+    return len(rows)
+
+
+class CacheSweeper:
+    """Daemon thread that periodically calls backend.sweep()."""
+
+    def __init__(self, backend: CacheBackend, interval: float):
+        self.backend = backend
+        self.interval = interval
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.backend.sweep()
+            except Exception as e:
+                print(f"🔍 Cache sweep error: {e}")
+
+__all__ = ['MemoryCache', 'CacheBackend', 'JsonFileBackend', 'SQLiteBackend',
+           'migrate_json_cache', 'CacheSweeper']
@@ -0,0 +1,151 @@
+# File: compaction.py
+
+import contextvars
+import re
+
+from langchain.agents.format_scratchpad.tools import format_to_tool_messages
+
+from config import TOOL_OUTPUT_BUDGETS, TOOL_OUTPUT_DEFAULT_BUDGET
+from summarizer import CHARS_PER_TOKEN, estimate_tokens
+
+# Compaction accounting for the current request
+_current_stats = contextvars.ContextVar("compaction_stats", default=None)
+
+# One "N. title / URL: ... / Snippet: ..." block of tools.format_search_results
+SEARCH_RESULT_BLOCK = re.compile(r"^\d+\. .*?(?=^\d+\. |^--- END ---|\Z)", re.MULTILINE | re.DOTALL)
+SEARCH_RESULT_URL = re.compile(r"^\s*URL: (\S+)", re.MULTILINE)
+
+
+class CompactionStats:
+    """Tokens of tool output before and after compaction (estimated)."""
+
+    def __init__(self):
+        self.outputs = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.steps = 0  # agent steps already counted (the scratchpad is re-rendered each iteration)
+
+    def add(self, before: str, after: str) -> None:
+        self.outputs += 1
+        self.tokens_in += estimate_tokens(before)
+        self.tokens_out += estimate_tokens(after)
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+    def as_dict(self) -> dict:
+        return {
+            "outputs": self.outputs,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+_totals = CompactionStats()
+
+
+def start_request() -> CompactionStats:
+    """Begin compaction accounting for the current request and return its totals."""
+    stats = CompactionStats()
+    _current_stats.set(stats)
+    return stats
+
+def _record(before: str, after: str) -> None:
+    _totals.add(before, after)
+    current = _current_stats.get()
+    if current is not None:
+        current.add(before, after)
+
+def head_tail(text: str, max_tokens: int, head_share: float = 0.3) -> str:
+    """Keep the start and (mostly) the end of text, cut on line boundaries.
+
+    Command output tends to put the verdict - errors, totals, the last
+    lines of a log - at the end, so the tail gets the larger share.
+    """
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+
+    head_limit = int(limit * head_share)
+    tail_limit = limit - head_limit
+    head = text[:head_limit]
+    tail = text[-tail_limit:]
+    # Snap to whole lines when a line break is reasonably close
+    if "\n" in head[head_limit // 2:]:
+        head = head[:head.rindex("\n")]
+    if "\n" in tail[:tail_limit // 2]:
+        tail = tail[tail.index("\n") + 1:]
+    omitted = text[len(head):len(text) - len(tail)]
+    return f"{head}\n[... {omitted.count(chr(10)) + 1} lines / {len(omitted)} chars omitted ...]\n{tail}"
+
+def compact_search_output(text: str, seen_urls: set) -> str:
+    """Drop results whose URL an earlier search in this request already returned."""
+    blocks = SEARCH_RESULT_BLOCK.findall(text)
+    if not blocks:
+        return text
+
+    kept, repeated = [], 0
+    for block in blocks:
+        url = SEARCH_RESULT_URL.search(block)
+        if url and url.group(1) in seen_urls:
+            repeated += 1
+            continue
+        if url:
+            seen_urls.add(url.group(1))
+        kept.append(block.rstrip())
+
+    if not repeated:
+        return text
+    if not kept:
+        return "(Same results as an earlier search - nothing new.)"
+    note = f"({repeated} result(s) already shown above omitted)"
+    return "--- SEARCH RESULTS ---\n" + "\n".join(kept) + f"\n{note}\n--- END ---"
+
+def compact_terminal_output(text: str) -> str:
+    """Drop the empty stderr section that every successful command carries."""
+    return re.sub(r"\n❌ Errors:\n\s*$", "", text)
+
+def compact_tool_output(tool_name: str, output, seen_urls: set | None = None,
+                        record: bool = True) -> str:
+    """Bounded form of a tool's output for the model's context."""
+    text = output if isinstance(output, str) else str(output)
+    compacted = text
+    if tool_name == "search_tool":
+        compacted = compact_search_output(compacted, seen_urls if seen_urls is not None else set())
+    elif tool_name == "terminal_tool":
+        compacted = compact_terminal_output(compacted)
+
+    budget = TOOL_OUTPUT_BUDGETS.get(tool_name, TOOL_OUTPUT_DEFAULT_BUDGET)
+    compacted = head_tail(compacted, budget)
+    if record:
+        _record(text, compacted)
+    return compacted
+
+def format_compacted_tool_messages(intermediate_steps) -> list:
+    """format_to_tool_messages over compacted observations.
+
+    Runs on every agent iteration over all steps so far; compaction is
+    deterministic, so earlier steps render identically each time and the
+    prompt prefix stays cacheable.
+    """
+    current = _current_stats.get()
+    counted = current.steps if current is not None else 0
+    seen_urls = set()
+    steps = [
+        (action, compact_tool_output(action.tool, observation, seen_urls, record=i >= counted))
+        for i, (action, observation) in enumerate(intermediate_steps)
+    ]
+    if current is not None:
+        current.steps = len(steps)
+    return format_to_tool_messages(steps)
+
+def get_compaction_stats() -> dict:
+    return {
+        "budgets": {**TOOL_OUTPUT_BUDGETS, "default": TOOL_OUTPUT_DEFAULT_BUDGET},
+        **_totals.as_dict(),
+    }
+
+__all__ = ['CompactionStats', 'start_request', 'head_tail', 'compact_tool_output',
+           'format_compacted_tool_messages', 'get_compaction_stats']
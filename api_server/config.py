@@ -1,4 +1,6 @@
 # config.py
+import os
+from urllib.parse import urlsplit
 
 # This is now just a label for the model being used by the server.
 # The actual model is determined by the command used to start the llama.cpp server.
@@ -7,3 +9,159 @@ MODEL_NAME = "Qwen3-4B-Instruct-2507-Q4_K_S"
 
 YT_DLP_PATH = "/usr/bin/yt-dlp"
 MPV_PATH = "/usr/bin/mpv"    
+
+# llama.cpp server (OpenAI-compatible API is served under /v1)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://localhost:8080")
+# All llama-server instances to balance across (comma separated base URLs).
+# Defaults to the single LLM_BASE_URL server.
+LLM_BACKENDS = [url.strip() for url in os.getenv("LLM_BACKENDS", LLM_BASE_URL).split(",") if url.strip()]
+# Max in-flight requests per backend (also capped by its slot count from /slots)
+LLM_BACKEND_MAX_CONCURRENCY = int(os.getenv("LLM_BACKEND_MAX_CONCURRENCY", "4"))
+LLM_HEALTH_INTERVAL = float(os.getenv("LLM_HEALTH_INTERVAL", "5"))
+# Virtual hostname the LLM client talks to; the shared transport maps it to a backend
+LLM_POOL_HOST = "llm-pool"
+# Parallel slots the server was started with (llama-server -np N). With more
+# than one, each conversation is pinned to a slot so its KV cache is reused.
+LLM_SLOTS = int(os.getenv("LLM_SLOTS", "1"))
+
+# --- Admission control for /agent-chat and /summarize ---
+# Requests allowed to use the LLM at once (default: what the backends can
+# take), per client, and how many may wait before new ones get a 429
+ADMISSION_MAX_CONCURRENT = int(os.getenv(
+    "ADMISSION_MAX_CONCURRENT", str(len(LLM_BACKENDS) * LLM_BACKEND_MAX_CONCURRENCY)
+))
+ADMISSION_PER_CLIENT = int(os.getenv("ADMISSION_PER_CLIENT", "2"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+
+# --- /summarize ---
+# Pages longer than this many tokens are summarized chunk by chunk (map-reduce)
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "1500"))
+# Chunk summaries generated in parallel for one page (default: backend capacity)
+SUMMARY_MAP_CONCURRENCY = int(os.getenv(
+    "SUMMARY_MAP_CONCURRENCY", str(len(LLM_BACKENDS) * LLM_BACKEND_MAX_CONCURRENCY)
+))
+# Finished summaries and per-chunk notes are cached on disk, keyed by content
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", str(7 * 24 * 3600)))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "20000"))
+SUMMARY_CACHE_MAX_BYTES = int(os.getenv("SUMMARY_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Summaries live for days, so expired rows can be swept far less often than searches
+SUMMARY_CACHE_SWEEP_INTERVAL = float(os.getenv("SUMMARY_CACHE_SWEEP_INTERVAL", "3600"))
+# /summarize-batch: pages generated at once, and the largest batch accepted
+SUMMARY_BATCH_CONCURRENCY = int(os.getenv("SUMMARY_BATCH_CONCURRENCY", "2"))
+SUMMARY_BATCH_MAX_PAGES = int(os.getenv("SUMMARY_BATCH_MAX_PAGES", "100"))
+
+# --- Shared HTTP connection pool (tools + LLM client) ---
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+# Concurrent requests allowed per host:port; HTTP_HOST_LIMITS overrides it per
+# host ("searxng:8080=8,api.example.com:443=4"). SearXNG's limit is added below
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "10"))
+HTTP_HOST_LIMITS = {
+    host.strip(): int(limit)
+    for host, _, limit in (
+        item.rpartition("=") for item in os.getenv("HTTP_HOST_LIMITS", "").split(",") if item.strip()
+    )
+}
+# HTTP/2 multiplexing needs the optional 'h2' package (pip install httpx[http2])
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "0") == "1"
+
+# --- Search cache ---
+# In-process LRU tier in front of the on-disk cache
+SEARCH_MEMORY_CACHE_ENTRIES = int(os.getenv("SEARCH_MEMORY_CACHE_ENTRIES", "1024"))
+SEARCH_MEMORY_CACHE_BYTES = int(os.getenv("SEARCH_MEMORY_CACHE_BYTES", str(8 * 1024 * 1024)))
+# Persistent tier: "sqlite" (single WAL-mode file) or "json" (legacy one file per query)
+SEARCH_CACHE_BACKEND = os.getenv("SEARCH_CACHE_BACKEND", "sqlite")
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "50000"))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SEARCH_CACHE_SWEEP_INTERVAL = float(os.getenv("SEARCH_CACHE_SWEEP_INTERVAL", "300"))
+# Expired entries are still served (and refreshed in the background) for this long
+SEARCH_STALE_GRACE = float(os.getenv("SEARCH_STALE_GRACE", str(24 * 3600)))
+# Per-class TTLs in seconds (everything else uses tools.CACHE_DURATION)
+SEARCH_NEWS_TTL = float(os.getenv("SEARCH_NEWS_TTL", "600"))
+SEARCH_NEGATIVE_TTL = float(os.getenv("SEARCH_NEGATIVE_TTL", "60"))
+
+# SearXNG JSON search endpoint
+SEARXNG_URL = os.getenv("SEARXNG_URL", "http://localhost:3000/search")
+# SearXNG's per-host HTTP limit, keyed by wherever SEARXNG_URL points
+SEARXNG_MAX_CONCURRENCY = int(os.getenv("SEARXNG_MAX_CONCURRENCY", "8"))
+_searxng = urlsplit(SEARXNG_URL)
+HTTP_HOST_LIMITS.setdefault(
+    f"{_searxng.hostname}:{_searxng.port or (443 if _searxng.scheme == 'https' else 80)}",
+    SEARXNG_MAX_CONCURRENCY,
+)
+
+# --- Search fan-out ---
+# Query variants (original, cleaned, keyword-only) are sent to SearXNG
+# concurrently and merged; variants still running at the deadline are dropped.
+# Opt-in: it multiplies the load on SearXNG and its upstream engines
+SEARCH_FANOUT = os.getenv("SEARCH_FANOUT", "0") == "1"
+SEARCH_FANOUT_DEADLINE = float(os.getenv("SEARCH_FANOUT_DEADLINE", "4"))
+# Size of the merged block the agent reads
+SEARCH_FANOUT_RESULTS = int(os.getenv("SEARCH_FANOUT_RESULTS", "5"))
+SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "200"))
+
+# --- Semantic answer cache for /agent-chat ---
+# Embeddings come from /v1/embeddings on a separate llama-server running a
+# small embedding model. Do not add --embeddings to the chat server: that
+# makes it embeddings-only. The cache stays off until EMBEDDING_BASE_URL is set.
+EMBEDDING_BASE_URL = os.getenv("EMBEDDING_BASE_URL", "").rstrip("/")
+SEMANTIC_CACHE_ENABLED = bool(EMBEDDING_BASE_URL) and os.getenv("SEMANTIC_CACHE_ENABLED", "1") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "1800"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+
+# Run the routed tool directly and make one answer generation, skipping the
+# agent's tool-selection round trip, when the router is certain of the tool
+FAST_ROUTE_ENABLED = os.getenv("FAST_ROUTE_ENABLED", "1") == "1"
+# When the full agent loop runs anyway, start the router's predicted
+# search/weather call while the model is still choosing its tool. With fast
+# routing on this covers follow-ups (messages with chat history, which skip
+# the fast path); with it off, every routed message
+SPECULATIVE_TOOLS_ENABLED = os.getenv("SPECULATIVE_TOOLS_ENABLED", "1") == "1"
+
+# --- Conversation memory (per session_id) ---
+# Turns replayed verbatim; older turns are folded into a rolling summary
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "4"))
+# Token budget for the whole history sent with a request, and for the summary
+MEMORY_MAX_TOKENS = int(os.getenv("MEMORY_MAX_TOKENS", "1200"))
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "300"))
+# Sessions kept in RAM; with MEMORY_SPILL, sessions are also written to SQLite
+# so evicted ones (and ones from before a restart) can be restored
+MEMORY_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "500"))
+MEMORY_SPILL = os.getenv("MEMORY_SPILL", "1") == "1"
+MEMORY_SESSION_TTL = float(os.getenv("MEMORY_SESSION_TTL", str(7 * 24 * 3600)))
+
+# --- Tool output compaction (before outputs re-enter the agent scratchpad) ---
+# Token budget per tool; TOOL_OUTPUT_BUDGETS overrides per tool name
+TOOL_OUTPUT_DEFAULT_BUDGET = int(os.getenv("TOOL_OUTPUT_DEFAULT_BUDGET", "400"))
+TOOL_OUTPUT_BUDGETS = {
+    "search_tool": 600,
+    "terminal_tool": 500,
+    "weather_tool": 150,
+    "dad_joke_tool": 100,
+}
+
+# --- Streaming ---
+# /agent-chat merges tokens arriving within this window (ms) or up to this
+# many bytes into one SSE frame; the first token is always sent at once.
+# Clients can override the window per request with "coalesce_ms" (0 = off).
+SSE_COALESCE_MS = int(os.getenv("SSE_COALESCE_MS", "30"))
+SSE_COALESCE_BYTES = int(os.getenv("SSE_COALESCE_BYTES", "512"))
+
+# --- Logging ---
+# Root log level for the API server (DEBUG also echoes the agent's reasoning)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# At DEBUG, log every Nth streamed token instead of all of them (0 = none)
+TOKEN_LOG_EVERY = int(os.getenv("TOKEN_LOG_EVERY", "50"))
+# Event-loop lag is sampled this often (seconds) and reported under /stats
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+
+# --- CLI daemon (main.py run/chat talk to a warm background process) ---
+# Set DAEMON_ENABLED=0 to run every CLI query in-process instead
+DAEMON_ENABLED = os.getenv("DAEMON_ENABLED", "1") == "1"
+DAEMON_SOCKET = os.getenv("DAEMON_SOCKET", os.path.expanduser("~/.cache/cluj-ai/daemon.sock"))
+# The daemon exits after this many seconds without a client
+DAEMON_IDLE_TIMEOUT = float(os.getenv("DAEMON_IDLE_TIMEOUT", "1800"))
+# How long a client waits for a freshly spawned daemon to accept connections
+DAEMON_START_TIMEOUT = float(os.getenv("DAEMON_START_TIMEOUT", "60"))
@@ -0,0 +1,294 @@
+# File: daemon.py
+"""Warm background process for the terminal assistant.
+
+One long-lived process keeps the agent executor, HTTP connection pools
+and tool caches, and serves CLI queries over a Unix domain socket. It
+speaks JSON lines. A client sends one request per connection:
+
+    {"op": "run", "input": "...", "session_id": "cli-123" | null, "cwd": "/path"}
+    {"op": "ping"} / {"op": "stop"}
+
+and reads payloads until {"type": "done"} or {"type": "error"}:
+
+    {"type": "token", "content": "..."}
+    {"type": "tool_start", "name": "...", "input": {...}}
+    {"type": "tool_end", "name": "...", "output": "..."}
+    {"type": "confirm", "command": "..."}   -> client answers {"type": "confirm", "ok": true}
+
+The client half (ensure_daemon, request) imports nothing heavy, so a CLI
+call costs a socket round trip plus inference. The daemon is spawned on
+first use and exits after DAEMON_IDLE_TIMEOUT seconds without clients.
+
+    python daemon.py            # serve in the foreground
+"""
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from config import DAEMON_SOCKET, DAEMON_IDLE_TIMEOUT, DAEMON_START_TIMEOUT
+
+# Unix sockets and flock: not on Windows, where the CLI stays in-process
+DAEMON_SUPPORTED = hasattr(socket, "AF_UNIX") and sys.platform != "win32"
+
+# Events the CLI renders; the AgentExecutor chain end carries the answer
+# when nothing was streamed
+AGENT_EVENT_FILTER = {"include_types": ["chat_model", "tool"], "include_names": ["AgentExecutor"]}
+
+
+# --- Shared by the daemon and the in-process CLI ---
+
+def private_dir(directory: str) -> None:
+    """Create directory owner-only, and tighten it if we own it but others can enter it.
+
+    makedirs(mode=...) leaves an existing directory alone, and ~/.cache/cluj-ai
+    may already exist with 0755 from the search cache.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if info.st_uid == os.getuid() and info.st_mode & 0o077:
+        os.chmod(directory, 0o700)
+
+# LangChain, the tools and the agent are imported and built on first use, so
+# the client half of this module stays light
+_agent_executor = None
+_agent_lock = threading.Lock()
+
+def get_agent_executor():
+    """Get the agent executor, building it on first use (safe from a warm-up thread)."""
+    global _agent_executor
+
+    with _agent_lock:
+        if _agent_executor is None:
+            from agent import create_agent_executor
+            _agent_executor = create_agent_executor()
+
+    return _agent_executor
+
+async def agent_payloads(prompt: str, session_id: str | None = None):
+    """Run the agent on prompt and yield the payloads a CLI renders."""
+    from memory import get_conversation_store
+    from prompt_cache import set_session
+
+    set_session(session_id)
+    memory = get_conversation_store()
+    answer = ""
+    # Built in a thread: the first build imports LangChain and would stall the loop
+    executor = await asyncio.to_thread(get_agent_executor)
+    async for event in executor.astream_events(
+        {"input": prompt, "chat_history": await memory.history(session_id)},
+        version="v1",
+        **AGENT_EVENT_FILTER,
+    ):
+        kind = event["event"]
+        if kind == "on_chat_model_stream":
+            content = event["data"]["chunk"].content
+            if content:
+                answer += content
+                yield {"type": "token", "content": content}
+        elif kind == "on_tool_start":
+            yield {"type": "tool_start", "name": event["name"], "input": event["data"].get("input", "")}
+        elif kind == "on_tool_end":
+            yield {"type": "tool_end", "name": event["name"], "output": str(event["data"].get("output", ""))}
+        elif kind == "on_chain_end" and event["name"] == "AgentExecutor" and not answer:
+            answer = (event["data"].get("output") or {}).get("output", "")
+            if answer:
+                yield {"type": "token", "content": answer}
+
+    memory.add_turn(session_id, prompt, answer)
+
+
+# --- Server ---
+
+class Daemon:
+    """Accepts CLI connections and shuts down after idle_timeout seconds without any."""
+
+    def __init__(self, path: str, idle_timeout: float):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.started_at = time.time()
+        self.requests = 0
+        self._active = 0
+        self._idle_timer = None
+        self._stopping = None
+
+    def _touch(self) -> None:
+        """(Re)arm the idle timer when the last client leaves."""
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        if self._active == 0 and self.idle_timeout > 0:
+            self._idle_timer = asyncio.get_running_loop().call_later(self.idle_timeout, self._stopping.set)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        from sse import dumps
+        from tools import confirm_command_callback, command_cwd
+
+        async def send(payload: dict) -> None:
+            writer.write((dumps(payload) + "\n").encode())
+            await writer.drain()
+
+        async def confirm(command: str) -> bool:
+            await send({"type": "confirm", "command": command})
+            reply = await reader.readline()
+            return bool(reply) and bool(json.loads(reply).get("ok"))
+
+        self._active += 1
+        self._touch()
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            request = json.loads(line)
+            op = request.get("op")
+            if op == "ping":
+                await send({"type": "pong", "pid": os.getpid(), "requests": self.requests,
+                            "uptime_s": round(time.time() - self.started_at)})
+                await send({"type": "done"})
+            elif op == "stop":
+                await send({"type": "done"})
+                self._stopping.set()
+            elif op == "run":
+                self.requests += 1
+                # Context variables are per connection task, so concurrent
+                # clients each get their own session, cwd and confirmation channel
+                confirm_command_callback.set(confirm)
+                command_cwd.set(request.get("cwd"))
+                async for payload in agent_payloads(request.get("input", ""), request.get("session_id")):
+                    await send(payload)
+                await send({"type": "done"})
+            else:
+                await send({"type": "error", "content": f"Unknown op {op!r}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # client went away (Ctrl+C); the turn is abandoned
+        except Exception as e:
+            try:
+                await send({"type": "error", "content": f"{type(e).__name__}: {e}"})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+            self._active -= 1
+            self._touch()
+
+    async def serve(self) -> None:
+        from http_client import aclose_clients
+        from memory import get_conversation_store
+
+        # Built before listening, so the first request finds a warm agent
+        get_agent_executor()
+
+        self._stopping = asyncio.Event()
+        # The daemon runs shell commands: the socket is owner-only from the
+        # moment it is bound, not after a chmod another user could race
+        umask = os.umask(0o077)
+        try:
+            server = await asyncio.start_unix_server(self.handle, path=self.path)
+        finally:
+            os.umask(umask)
+        print(f"cluj-ai daemon {os.getpid()} listening on {self.path}", flush=True)
+        self._touch()
+        try:
+            await self._stopping.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            get_conversation_store().close()
+            await aclose_clients()
+            print(f"cluj-ai daemon {os.getpid()} stopped after {self.requests} request(s)", flush=True)
+
+
+def run_daemon(path: str = DAEMON_SOCKET, idle_timeout: float = DAEMON_IDLE_TIMEOUT) -> int:
+    """Serve until stopped or idle; exits at once if another daemon holds the lock."""
+    import fcntl
+
+    private_dir(os.path.dirname(path))
+    lock = open(path + ".lock", "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        print(f"cluj-ai daemon already running on {path}", flush=True)
+        return 0
+    # Holding the lock means any socket file left behind is stale
+    if os.path.exists(path):
+        os.unlink(path)
+    try:
+        asyncio.run(Daemon(path, idle_timeout).serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        lock.close()
+    return 0
+
+
+# --- Client ---
+
+def connect(path: str = DAEMON_SOCKET) -> socket.socket | None:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        return sock
+    except OSError:
+        sock.close()
+        return None
+
+def spawn_daemon(path: str = DAEMON_SOCKET) -> None:
+    """Start a detached daemon; its output goes to daemon.log next to the socket."""
+    directory = os.path.dirname(path)
+    private_dir(directory)
+    with open(os.path.join(directory, "daemon.log"), "ab") as log:
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+            start_new_session=True,  # survives the terminal that spawned it
+        )
+
+def ensure_daemon(path: str = DAEMON_SOCKET, timeout: float = DAEMON_START_TIMEOUT) -> socket.socket | None:
+    """Connect to the daemon, spawning it first if needed; None if it never comes up."""
+    sock = connect(path)
+    if sock is not None:
+        return sock
+    spawn_daemon(path)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.1)
+        sock = connect(path)
+        if sock is not None:
+            return sock
+    return None
+
+def request(sock: socket.socket, payload: dict, confirm=None):
+    """Send one request and yield the daemon's payloads until it is done.
+
+    `confirm(command) -> bool` answers terminal_tool confirmations; without
+    one, every command is declined.
+    """
+    with sock, sock.makefile("rb") as replies:
+        sock.sendall((json.dumps(payload) + "\n").encode())
+        for line in replies:
+            reply = json.loads(line)
+            kind = reply.get("type")
+            if kind == "confirm":
+                ok = bool(confirm and confirm(reply["command"]))
+                sock.sendall((json.dumps({"type": "confirm", "ok": ok}) + "\n").encode())
+                continue
+            if kind == "done":
+                return
+            yield reply
+            if kind == "error":
+                return
+    yield {"type": "error", "content": "The daemon closed the connection"}
+
+__all__ = ['DAEMON_SUPPORTED', 'private_dir', 'get_agent_executor', 'agent_payloads', 'Daemon',
+           'run_daemon', 'connect', 'spawn_daemon', 'ensure_daemon', 'request']
+
+
+if __name__ == "__main__":
+    sys.exit(run_daemon())
@@ -0,0 +1,371 @@
+# File: http_client.py
+
+import asyncio
+import importlib.util
+import json
+import threading
+import time
+import weakref
+
+import httpx
+
+from config import (
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_PER_HOST_LIMIT,
+    HTTP_HOST_LIMITS,
+    HTTP2_ENABLED,
+)
+
+# Shared clients - created on first use and reused by every tool call and the LLM
+_cached_async_client = None
+_cached_sync_client = None
+
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+
+class HostStats:
+    """Usage counters for one host:port."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.queued = 0          # requests that had to wait for a per-host slot
+        self.wait_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "limit": self.limit,
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "queued": self.queued,
+            "wait_ms_total": round(self.wait_seconds * 1000, 1),
+        }
+
+
+_host_stats: dict[str, HostStats] = {}
+_seen_connections = weakref.WeakSet()
+_connections_opened = 0
+_stats_lock = threading.Lock()
+
+
+# Hooks let other modules adjust or observe traffic without owning the client:
+#   request hooks: fn(request) -> request, run before every request is sent
+#   SSE hooks:     fn(request, event) for each `data:` JSON event containing marker
+_request_hooks = []
+_sse_hooks = []
+# Virtual hosts: requests to these hostnames are dispatched by a router object
+# (e.g. llm_pool.LLMPool) that picks the real server
+_virtual_hosts = {}
+
+def register_virtual_host(host: str, router) -> None:
+    _virtual_hosts[host] = router
+
+def add_request_hook(fn) -> None:
+    if fn not in _request_hooks:
+        _request_hooks.append(fn)
+
+def add_sse_hook(fn, marker: bytes) -> None:
+    if all(hook is not fn for hook, _ in _sse_hooks):
+        _sse_hooks.append((fn, marker))
+
+def _apply_request_hooks(request: httpx.Request) -> httpx.Request:
+    for hook in _request_hooks:
+        request = hook(request)
+    return request
+
+def _wants_sse_scan(response: httpx.Response) -> bool:
+    return bool(_sse_hooks) and "text/event-stream" in response.headers.get("content-type", "")
+
+
+class _SSEScanner:
+    """Splits a byte stream into lines and hands marked `data:` events to the SSE hooks."""
+
+    def __init__(self, request: httpx.Request):
+        self._request = request
+        self._partial = b""
+
+    def feed(self, chunk: bytes) -> None:
+        # Cheap pre-check: most chunks are plain tokens and carry no marker
+        data = self._partial + chunk
+        if not any(marker in data for _, marker in _sse_hooks):
+            self._partial = data[data.rfind(b"\n") + 1:]
+            return
+        *lines, self._partial = data.split(b"\n")
+        for line in lines:
+            if not line.startswith(b"data:"):
+                continue
+            for hook, marker in _sse_hooks:
+                if marker in line:
+                    try:
+                        hook(self._request, json.loads(line[5:]))
+                    except Exception as e:
+                        print(f"⚠️ SSE hook error: {e}")
+
+
+def _host_key(url: httpx.URL) -> str:
+    port = url.port or (443 if url.scheme == "https" else 80)
+    return f"{url.host}:{port}"
+
+def _host_limit(host: str) -> int:
+    return HTTP_HOST_LIMITS.get(host, HTTP_PER_HOST_LIMIT)
+
+def _stats_for(host: str) -> HostStats:
+    stats = _host_stats.get(host)
+    if stats is None:
+        with _stats_lock:
+            stats = _host_stats.setdefault(host, HostStats(_host_limit(host)))
+    return stats
+
+def _note_connections(pool) -> None:
+    """Count connections we have not seen before (i.e. new TCP connects)."""
+    global _connections_opened
+    for connection in list(pool.connections):
+        if connection not in _seen_connections:
+            _seen_connections.add(connection)
+            _connections_opened += 1
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    """Hold the per-host slot until the response body is fully consumed or closed."""
+
+    def __init__(self, stream, release, scanner=None):
+        self._stream = stream
+        self._release = release
+        self._scanner = scanner
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            if self._scanner is not None:
+                self._scanner.feed(chunk)
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class _SyncReleasingStream(httpx.SyncByteStream):
+    def __init__(self, stream, release, scanner=None):
+        self._stream = stream
+        self._release = release
+        self._scanner = scanner
+
+    def __iter__(self):
+        for chunk in self._stream:
+            if self._scanner is not None:
+                self._scanner.feed(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+class PooledAsyncTransport(httpx.AsyncBaseTransport):
+    """Keep-alive transport with per-host concurrency limits and usage metrics."""
+
+    def __init__(self, **transport_kwargs):
+        self._transport = httpx.AsyncHTTPTransport(**transport_kwargs)
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request = _apply_request_hooks(request)
+        router = _virtual_hosts.get(request.url.host)
+        if router is None:
+            return await self._send(request)
+
+        response, release = await router.handle(request, self._send)
+        response.stream = _AsyncReleasingStream(response.stream, release)
+        return response
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        host = _host_key(request.url)
+        stats = _stats_for(host)
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(stats.limit))
+
+        if semaphore.locked():
+            stats.queued += 1
+        started = time.perf_counter()
+        await semaphore.acquire()
+        stats.wait_seconds += time.perf_counter() - started
+
+        stats.requests += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+
+        released = False
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                stats.in_flight -= 1
+                semaphore.release()
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            stats.errors += 1
+            release()
+            raise
+
+        _note_connections(self._transport._pool)
+        scanner = _SSEScanner(request) if _wants_sse_scan(response) else None
+        response.stream = _AsyncReleasingStream(response.stream, release, scanner)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+    def pool_snapshot(self) -> dict:
+        connections = list(self._transport._pool.connections)
+        idle = sum(1 for c in connections if c.is_idle())
+        return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+
+class PooledSyncTransport(httpx.BaseTransport):
+    """Thread-safe counterpart of PooledAsyncTransport for sync callers."""
+
+    def __init__(self, **transport_kwargs):
+        self._transport = httpx.HTTPTransport(**transport_kwargs)
+        self._semaphores: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request = _apply_request_hooks(request)
+        router = _virtual_hosts.get(request.url.host)
+        if router is None:
+            return self._send(request)
+        return router.handle_sync(request, self._send)
+
+    def _send(self, request: httpx.Request) -> httpx.Response:
+        host = _host_key(request.url)
+        stats = _stats_for(host)
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.BoundedSemaphore(stats.limit))
+
+        started = time.perf_counter()
+        if not semaphore.acquire(blocking=False):
+            stats.queued += 1
+            semaphore.acquire()
+        with self._lock:
+            stats.wait_seconds += time.perf_counter() - started
+            stats.requests += 1
+            stats.in_flight += 1
+            stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+
+        released = False
+        def release():
+            nonlocal released
+            with self._lock:
+                if released:
+                    return
+                released = True
+                stats.in_flight -= 1
+            semaphore.release()
+
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            stats.errors += 1
+            release()
+            raise
+
+        with self._lock:
+            _note_connections(self._transport._pool)
+        scanner = _SSEScanner(request) if _wants_sse_scan(response) else None
+        response.stream = _SyncReleasingStream(response.stream, release, scanner)
+        return response
+
+    def close(self):
+        self._transport.close()
+
+    def pool_snapshot(self) -> dict:
+        connections = list(self._transport._pool.connections)
+        idle = sum(1 for c in connections if c.is_idle())
+        return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+
+def _http2_available() -> bool:
+    if not HTTP2_ENABLED:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        print("⚠️ HTTP2_ENABLED is set but the 'h2' package is missing - using HTTP/1.1 keep-alive")
+        return False
+    return True
+
+def _transport_kwargs() -> dict:
+    return {
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "http2": _http2_available(),
+        "retries": 1,  # retry once on connect errors (stale keep-alive sockets)
+    }
+
+def get_async_client() -> httpx.AsyncClient:
+    """Get the shared async HTTP client, creating it if needed."""
+    global _cached_async_client
+
+    if _cached_async_client is None or _cached_async_client.is_closed:
+        _cached_async_client = httpx.AsyncClient(
+            transport=PooledAsyncTransport(**_transport_kwargs()),
+            timeout=DEFAULT_TIMEOUT,
+            follow_redirects=True,
+        )
+
+    return _cached_async_client
+
+def get_sync_client() -> httpx.Client:
+    """Get the shared sync HTTP client for code paths that cannot await."""
+    global _cached_sync_client
+
+    if _cached_sync_client is None or _cached_sync_client.is_closed:
+        _cached_sync_client = httpx.Client(
+            transport=PooledSyncTransport(**_transport_kwargs()),
+            timeout=DEFAULT_TIMEOUT,
+            follow_redirects=True,
+        )
+
+    return _cached_sync_client
+
+def get_pool_stats() -> dict:
+    """Connection pool usage: per-host counters plus open/idle connection snapshots."""
+    pools = {}
+    for name, client in (("async", _cached_async_client), ("sync", _cached_sync_client)):
+        if client is not None and not client.is_closed:
+            pools[name] = client._transport.pool_snapshot()
+
+    return {
+        "connections_opened": _connections_opened,
+        "pools": pools,
+        "hosts": {host: stats.as_dict() for host, stats in list(_host_stats.items())},
+    }
+
+async def aclose_clients():
+    """Close the shared clients (call on application shutdown)."""
+    global _cached_async_client, _cached_sync_client
+
+    if _cached_async_client is not None:
+        await _cached_async_client.aclose()
+        _cached_async_client = None
+    if _cached_sync_client is not None:
+        _cached_sync_client.close()
+        _cached_sync_client = None
+
+__all__ = ['get_async_client', 'get_sync_client', 'get_pool_stats', 'aclose_clients',
+           'add_request_hook', 'add_sse_hook', 'register_virtual_host']
@@ -0,0 +1,311 @@
+# File: llm_pool.py
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+
+import httpx
+
+from prompt_cache import current_session
+from config import (
+    LLM_BACKENDS,
+    LLM_BACKEND_MAX_CONCURRENCY,
+    LLM_POOL_HOST,
+)
+
+logger = logging.getLogger("llm_pool")
+
+# A backend that failed is skipped for this long unless the health check clears it
+FAILURE_COOLDOWN = 10.0
+
+# blake2b personalization for session -> backend hashing
+BACKEND_HASH_SALT = b"llm-pool-backend"
+
+
+class Backend:
+    """One OpenAI-compatible llama-server instance."""
+
+    def __init__(self, url: str, max_concurrency: int):
+        self.url = httpx.URL(url.rstrip("/"))
+        self.max_concurrency = max_concurrency
+        self.outstanding = 0
+        self.healthy = True
+        self.down_until = 0.0
+        self.slots_total = None     # from /slots, when the server exposes it
+        self.slots_idle = None
+        self.requests = 0
+        self.failures = 0
+        self.last_error = None
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and time.time() >= self.down_until
+
+    @property
+    def limit(self) -> int:
+        # Never queue more requests on a server than it has slots to run them
+        if self.slots_total:
+            return min(self.max_concurrency, self.slots_total)
+        return self.max_concurrency
+
+    @property
+    def has_capacity(self) -> bool:
+        return self.available and self.outstanding < self.limit
+
+    def load(self) -> tuple:
+        """Sort key: fewest busy slots first, then fewest outstanding requests."""
+        busy = (self.slots_total - self.slots_idle) if self.slots_total else 0
+        return (max(busy, self.outstanding), self.outstanding)
+
+    def mark_failed(self, error: Exception) -> None:
+        self.failures += 1
+        self.last_error = str(error)
+        self.down_until = time.time() + FAILURE_COOLDOWN
+        logger.warning(f"LLM backend {self.url} failed ({error}); failing over")
+
+    def as_dict(self) -> dict:
+        return {
+            "url": str(self.url),
+            "available": self.available,
+            "outstanding": self.outstanding,
+            "limit": self.limit,
+            "slots_total": self.slots_total,
+            "slots_idle": self.slots_idle,
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+class LLMPool:
+    """Least-loaded, health-checked routing across several llama-server instances.
+
+    Requests addressed to http://<LLM_POOL_HOST>/... are rewritten to a real
+    backend by the shared HTTP transport. A conversation sticks to the same
+    backend (so its KV cache is reused) while that backend has capacity;
+    otherwise the least-loaded available backend is used. Connection failures
+    and 503s fail over to the next backend before any bytes reach the caller.
+    """
+
+    def __init__(self, urls: list, max_concurrency: int):
+        self.backends = [Backend(url, max_concurrency) for url in urls]
+        self._changed = None        # asyncio.Condition, created inside the loop
+        self._health_task = None
+        self._lock = threading.Lock()
+        self.waits = 0
+
+    def _condition(self) -> asyncio.Condition:
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    def choose(self, session_id: str | None = None, exclude=()) -> Backend | None:
+        """Pick a backend with spare capacity, or None if all are busy or down."""
+        candidates = [b for b in self.backends if b.has_capacity and b not in exclude]
+        if not candidates:
+            return None
+
+        preferred = self.preferred(session_id)
+        if preferred in candidates:
+            return preferred
+
+        return min(candidates, key=Backend.load)
+
+    def preferred(self, session_id: str | None) -> Backend | None:
+        """The backend a session sticks to while it has capacity."""
+        if session_id is None:
+            return None
+        # Salted so the backend is independent of prompt_cache.slot_for's
+        # unsalted hash; otherwise backend i would only ever see slot i
+        digest = hashlib.blake2b(session_id.encode(), digest_size=4, person=BACKEND_HASH_SALT).digest()
+        return self.backends[int.from_bytes(digest, "big") % len(self.backends)]
+
+    def pick(self, session_id: str | None = None, exclude=()) -> Backend:
+        """Any available backend, ignoring capacity - for requests that do not use a slot."""
+        candidates = [b for b in self.backends if b.available and b not in exclude]
+        if not candidates:
+            raise httpx.ConnectError("No healthy LLM backend available")
+        preferred = self.preferred(session_id)
+        if preferred in candidates:
+            return preferred
+        return min(candidates, key=Backend.load)
+
+    async def acquire(self, session_id: str | None = None, exclude=()) -> Backend:
+        """Wait for a backend with capacity and reserve one request on it."""
+        condition = self._condition()
+        async with condition:
+            counted = False
+            while True:
+                backend = self.choose(session_id, exclude)
+                if backend is not None:
+                    break
+                if not any(b.available for b in self.backends if b not in exclude):
+                    raise httpx.ConnectError("No healthy LLM backend available")
+                if not counted:
+                    self.waits += 1
+                    counted = True
+                await condition.wait()
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def release(self, backend: Backend) -> None:
+        backend.outstanding -= 1
+        if self._changed is not None:
+            asyncio.ensure_future(self._notify())
+
+    async def _notify(self) -> None:
+        async with self._condition():
+            self._condition().notify_all()
+
+    @staticmethod
+    def rewrite(request: httpx.Request, backend: Backend) -> httpx.Request:
+        """Re-address a pool request to a concrete backend."""
+        url = request.url.copy_with(
+            scheme=backend.url.scheme, host=backend.url.host, port=backend.url.port,
+            raw_path=backend.url.raw_path.rstrip(b"/") + request.url.raw_path,
+        )
+        headers = {k: v for k, v in request.headers.items() if k.lower() != "host"}
+        return httpx.Request(
+            request.method, url, headers=headers, content=request.content,
+            extensions=request.extensions,
+        )
+
+    async def handle(self, request: httpx.Request, send):
+        """Send a pool request via `send`, failing over between backends.
+
+        Returns (response, release) - release must be called once the
+        response body is finished.
+        """
+        session_id = current_session()
+        # Only generations occupy a slot; /tokenize and probes must not queue behind them
+        metered = is_generation_request(request)
+        tried = []
+        while True:
+            if metered:
+                backend = await self.acquire(session_id, exclude=tried)
+            else:
+                backend = self.pick(session_id, exclude=tried)
+            try:
+                response = await send(self.rewrite(request, backend))
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                if metered:
+                    self.release(backend)
+                backend.mark_failed(e)
+                tried.append(backend)
+                continue
+
+            if response.status_code == 503 and len(tried) + 1 < len(self.backends):
+                # Loading model or no free slot - try another instance
+                await response.aclose()
+                if metered:
+                    self.release(backend)
+                backend.mark_failed(httpx.HTTPStatusError("503", request=request, response=response))
+                tried.append(backend)
+                continue
+
+            released = not metered
+            def release():
+                nonlocal released
+                if not released:
+                    released = True
+                    self.release(backend)
+            return response, release
+
+    def handle_sync(self, request: httpx.Request, send):
+        """Blocking variant for the sync client: no queueing, just failover."""
+        session_id = current_session()
+        tried = []
+        while True:
+            with self._lock:
+                backend = self.choose(session_id, exclude=tried) or next(
+                    (b for b in self.backends if b.available and b not in tried), None
+                )
+            if backend is None:
+                raise httpx.ConnectError("No healthy LLM backend available")
+            try:
+                return send(self.rewrite(request, backend))
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                backend.mark_failed(e)
+                tried.append(backend)
+
+    async def check_health(self, client: httpx.AsyncClient) -> None:
+        """Refresh each backend's health and slot occupancy."""
+        for backend in self.backends:
+            try:
+                response = await client.get(str(backend.url.join("/health")), timeout=2)
+                # llama.cpp answers 503 while loading; servers without /health 404
+                backend.healthy = response.status_code < 500
+                if backend.healthy:
+                    backend.down_until = 0.0
+            except Exception as e:
+                backend.healthy = False
+                backend.last_error = str(e)
+                continue
+
+            try:
+                response = await client.get(str(backend.url.join("/slots")), timeout=2)
+                if response.status_code == 200:
+                    slots = response.json()
+                    backend.slots_total = len(slots)
+                    backend.slots_idle = sum(
+                        1 for slot in slots
+                        if not slot.get("is_processing", slot.get("state", 0) != 0)
+                    )
+            except Exception:
+                pass  # /slots disabled on this server - fall back to outstanding counts
+
+        if self._changed is not None:
+            await self._notify()
+
+    def start_health_checks(self, client: httpx.AsyncClient, interval: float) -> None:
+        if self._health_task is not None and not self._health_task.done():
+            return
+
+        async def loop():
+            while True:
+                try:
+                    await self.check_health(client)
+                except Exception as e:
+                    logger.warning(f"LLM health check error: {e}")
+                await asyncio.sleep(interval)
+
+        self._health_task = asyncio.ensure_future(loop())
+
+    async def stop_health_checks(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+
+    def stats(self) -> dict:
+        return {
+            "waits": self.waits,
+            "backends": [backend.as_dict() for backend in self.backends],
+        }
+
+
+_cached_pool = None
+
+def get_llm_pool() -> LLMPool:
+    """Get the process-wide backend pool, creating it if needed."""
+    global _cached_pool
+
+    if _cached_pool is None:
+        _cached_pool = LLMPool(LLM_BACKENDS, LLM_BACKEND_MAX_CONCURRENCY)
+
+    return _cached_pool
+
+def is_pool_request(request: httpx.Request) -> bool:
+    return request.url.host == LLM_POOL_HOST
+
+def is_generation_request(request: httpx.Request) -> bool:
+    """/v1/chat/completions and /completions: the requests that hold a server slot."""
+    return request.url.path.endswith("/completions")
+
+__all__ = ['Backend', 'LLMPool', 'get_llm_pool', 'is_pool_request', 'is_generation_request']
@@ -0,0 +1,48 @@
+# File: logging_setup.py
+
+import atexit
+import logging
+import logging.handlers
+import queue
+
+from config import LOG_LEVEL
+
+_listener = None
+
+
+def setup_logging(level: str = LOG_LEVEL) -> None:
+    """Log at `level` through a queue; a background thread does the formatting and I/O.
+
+    Request handlers only pay for enqueuing a record, never for a blocking
+    write to the terminal.
+    """
+    global _listener
+
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+    output = logging.StreamHandler()
+    output.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(level)
+    if level != "DEBUG":
+        # Per-request and connection-level chatter is only useful when debugging
+        for name in ("httpx", "httpcore"):
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+__all__ = ['setup_logging', 'stop_logging']
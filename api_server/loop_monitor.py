@@ -0,0 +1,80 @@
+# File: loop_monitor.py
+
+import asyncio
+import time
+from collections import deque
+
+from config import LOOP_LAG_INTERVAL
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a sleeping task.
+
+    Every `interval` seconds a probe task sleeps and records how much
+    longer than requested the sleep took. Anything that blocks the loop -
+    a sync call, a heavy handler - shows up as lag for every stream in
+    flight at that moment.
+    """
+
+    def __init__(self, interval: float, window: int = 600):
+        self.interval = interval
+        self._recent = deque(maxlen=window)  # last `window` samples, in seconds
+        self._task = None
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - started - self.interval, 0.0)
+            self._recent.append(lag)
+            self.samples += 1
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+
+    def stats(self) -> dict:
+        recent = sorted(self._recent)
+
+        def percentile(p: float) -> float:
+            if not recent:
+                return 0.0
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))] * 1000, 2)
+
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "total_lag_ms": round(self.total_lag * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "recent_p50_ms": percentile(0.50),
+            "recent_p99_ms": percentile(0.99),
+            "recent_max_ms": round(recent[-1] * 1000, 2) if recent else 0.0,
+        }
+
+
+_cached_monitor = None
+
+def get_loop_monitor() -> LoopLagMonitor:
+    """Get the process-wide event-loop lag monitor, creating it if needed."""
+    global _cached_monitor
+
+    if _cached_monitor is None:
+        _cached_monitor = LoopLagMonitor(LOOP_LAG_INTERVAL)
+
+    return _cached_monitor
+
+__all__ = ['LoopLagMonitor', 'get_loop_monitor']
@@ -8,6 +8,8 @@ from typing import Generator, List, AsyncGenerator
 import sys
 import asyncio
 import random
+import threading
+import time
 
 # --- Standard Library Replacements for Typer ---
 
@@ -30,15 +32,30 @@ def cprint(text: str, color: str = ""):
         print(text)
 
 # --- Original Application Logic ---
-from dotenv import load_dotenv
-load_dotenv()
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:  # optional: settings can come from the environment alone
+    pass
 
-from config import MODEL_NAME, MPV_PATH, YT_DLP_PATH
-from agent import create_agent_executor
-from tools import ALL_TOOLS
+from config import MODEL_NAME, MPV_PATH, YT_DLP_PATH, LOG_LEVEL, SSE_COALESCE_MS, DAEMON_ENABLED, DAEMON_SOCKET
 
-# Global agent executor (cached)
-agent_executor = create_agent_executor()
+# LangChain, the tools and the agent are imported and built on first use, so
+# printing usage or the play fast path never pays for them
+def get_agent_executor():
+    """Get the agent executor, building it on first use (safe from a warm-up thread)."""
+    from daemon import get_agent_executor
+    return get_agent_executor()
+
+def warm_daemon() -> None:
+    """Make sure a daemon is running, without keeping a connection to it."""
+    import daemon
+
+    sock = daemon.connect()
+    if sock is not None:
+        sock.close()
+    else:
+        daemon.spawn_daemon()
 
 # --- Fast-path: Play music / video via YouTube (Unchanged) ---
 def fast_play_music(full_query: str) -> None:
@@ -66,12 +83,80 @@ def fast_play_music(full_query: str) -> None:
 
 
 
+class TokenWriter:
+    """Writes streamed tokens to stdout, flushing at most once per window.
+
+    The first token is flushed at once; later ones collect in stdout's
+    buffer so a fast stream costs one write syscall per window, not per token.
+    A timer on the event loop flushes whatever is still buffered when the
+    window ends, so a trailing token never waits for the next write.
+    """
+
+    def __init__(self, window_ms: int = SSE_COALESCE_MS):
+        self.window = window_ms / 1000
+        self._last_flush = 0.0
+        self._timer = None
+
+    def write(self, text: str) -> None:
+        sys.stdout.write(text)
+        now = time.perf_counter()
+        if now - self._last_flush >= self.window:
+            self.flush(now)
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self._last_flush + self.window - now, self.flush
+            )
+
+    def flush(self, now: float | None = None) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        sys.stdout.flush()
+        self._last_flush = now or time.perf_counter()
+
+# Per-event trace lines (one per token) only when debugging
+DEBUG_EVENTS = LOG_LEVEL == "DEBUG"
+
 # main.py (updated function)
 
+# Chat mode: one session for the whole chat (conversation memory, and one
+# llama.cpp slot so its KV cache is reused)
+_session_id = None
+
+def use_daemon() -> bool:
+    from daemon import DAEMON_SUPPORTED
+    return DAEMON_ENABLED and DAEMON_SUPPORTED
+
+def confirm_in_terminal(command: str) -> bool:
+    """Answers the daemon's terminal_tool confirmations here, where the user is."""
+    print(f"\033[93mProposed command: `\033[1m{command}\033[0m\033[93m`\033[0m")
+    return input("Execute? [y/N]: ").strip().lower() in ("y", "yes")
+
+async def daemon_payloads(full_prompt: str):
+    """Payloads from the warm daemon, spawning it on first use; None if it cannot be reached."""
+    import daemon
+
+    # The socket client blocks, so it runs in a thread; prompts still reach the user through input()
+    sock = await asyncio.to_thread(daemon.ensure_daemon)
+    if sock is None:
+        return None
+    replies = daemon.request(
+        sock,
+        {"op": "run", "input": full_prompt, "session_id": _session_id, "cwd": os.getcwd()},
+        confirm=confirm_in_terminal,
+    )
+
+    async def stream():
+        done = object()
+        while (payload := await asyncio.to_thread(next, replies, done)) is not done:
+            yield payload
+    return stream()
+
 async def process_prompt_with_events(full_prompt: str) -> None:
     """
-    Handles routing and executes the agent using astream_events() 
-    for real-time streaming with a clean, colored interface.
+    Handles routing and streams the agent's tokens and tool events
+    with a clean, colored interface - from the daemon when it is enabled,
+    otherwise from an agent built in this process.
     """
     print(f"🤖 DEBUG: Processing prompt: '{full_prompt}'")
     
@@ -82,38 +167,38 @@ async def process_prompt_with_events(full_prompt: str) -> None:
         return
 
     try:
-        final_answer = ""
+        payloads = await daemon_payloads(full_prompt) if use_daemon() else None
+        if payloads is None:
+            if use_daemon():
+                cprint("⚠️ Daemon unavailable, running in-process", color="yellow")
+            from daemon import agent_payloads
+            payloads = agent_payloads(full_prompt, _session_id)
+
         cprint("\n🤖 AI Response:", color="cyan")
         
-        iteration_count = 0
-        async for event in agent_executor.astream_events(
-            {"input": full_prompt},
-            version="v1",
-        ):
-            iteration_count += 1
-            kind = event["event"]
+        payload_count = 0
+        out = TokenWriter()
+        async for payload in payloads:
+            payload_count += 1
+            kind = payload["type"]
             
-            print(f"🔄 DEBUG: Event {iteration_count} - {kind}")
+            if DEBUG_EVENTS:
+                print(f"🔄 DEBUG: Event {payload_count} - {kind}")
             
-            if kind == "on_chat_model_stream":
-                content = event["data"]["chunk"].content
-                if content:
-                    sys.stdout.write(content)
-                    sys.stdout.flush()
-                    final_answer += content
+            if kind == "token":
+                out.write(payload["content"])
             
-            elif kind == "on_tool_start":
-                tool_name = event['name']
-                tool_input = event['data'].get('input', '')
-                print(f"🛠️ DEBUG: Tool START - {tool_name} with input: {tool_input}")
+            elif kind == "tool_start":
+                tool_name = payload['name']
+                out.flush()
+                print(f"🛠️ DEBUG: Tool START - {tool_name} with input: {payload['input']}")
                 
-                sys.stdout.flush() 
                 if tool_name != 'dad_joke_tool':
                     cprint(f"\n\n🛠️ Calling Tool: {tool_name}", color="yellow")
             
-            elif kind == "on_tool_end":
-                tool_name = event['name']
-                output = event['data'].get('output', '')
+            elif kind == "tool_end":
+                tool_name = payload['name']
+                output = payload['output']
                 print(f"🛠️ DEBUG: Tool END - {tool_name} with output length: {len(output)}")
                 
                 if tool_name != 'dad_joke_tool':
@@ -122,21 +207,12 @@ async def process_prompt_with_events(full_prompt: str) -> None:
                     else:
                         cprint(f"🔍 Tool Result: [Output too long to display]", color="magenta")
 
-            elif kind == "on_chain_end":
-                chain_name = event["name"]
-                print(f"⛓️ DEBUG: Chain END - {chain_name}")
-                if chain_name == "AgentExecutor":
-                    if not final_answer:
-                        final_answer = event['data'].get('output')['output']
-                        sys.stdout.write(final_answer)
-                        sys.stdout.flush()
-                        print(f"📝 DEBUG: Final answer set from chain end: {len(final_answer)} chars")
-
-            elif kind == "on_chain_start":
-                chain_name = event["name"]
-                print(f"⛓️ DEBUG: Chain START - {chain_name}")
+            elif kind == "error":
+                out.flush()
+                cprint(f"\n❌ An error occurred: {payload['content']}", color="red")
 
-        print(f"✅ DEBUG: Processing complete. Total events: {iteration_count}")
+        out.flush()
+        print(f"✅ DEBUG: Processing complete. Total events: {payload_count}")
 
     except Exception as e:
         cprint(f"\n❌ An error occurred: {e}", color="red")
@@ -154,6 +230,14 @@ async def run_command(prompt_list: List[str]) -> None:
 async def chat_command() -> None:
     """Handles the 'chat' command logic (REPL)."""
     cprint("Entering chat mode. Type 'exit' or 'quit' to end.", color="yellow")
+    global _session_id
+    _session_id = f"cli-{os.getpid()}"
+    # Warm up while the user types the first prompt: start the daemon, or
+    # build the agent here
+    if use_daemon():
+        threading.Thread(target=warm_daemon, daemon=True).start()
+    else:
+        threading.Thread(target=get_agent_executor, daemon=True).start()
     while True:
         prompt_text = f"\n\n{COLORS['green']}> {COLORS['end']}"
         try:
@@ -168,6 +252,36 @@ async def chat_command() -> None:
             cprint("\nExiting chat.", color="yellow")
             break
 
+def daemon_command(args: List[str]) -> None:
+    """Handles 'daemon start|stop|status' (default: status)."""
+    import daemon
+    if not daemon.DAEMON_SUPPORTED:
+        cprint("The daemon needs Unix domain sockets; queries run in-process here.", color="yellow")
+        return
+
+    action = args[0] if args else "status"
+    if action == "start":
+        if daemon.ensure_daemon() is None:
+            cprint(f"❌ Daemon did not start, see {os.path.dirname(DAEMON_SOCKET)}/daemon.log", color="red")
+            return
+        action = "status"
+    sock = daemon.connect()
+    if sock is None:
+        cprint("Daemon is not running.", color="yellow")
+    elif action == "status":
+        for reply in daemon.request(sock, {"op": "ping"}):
+            if reply["type"] != "pong":
+                cprint(f"❌ {reply.get('content')}", color="red")
+                continue
+            cprint(f"Daemon {reply.get('pid')} on {DAEMON_SOCKET}: up {reply.get('uptime_s')}s, "
+                   f"{reply.get('requests')} request(s)", color="green")
+    elif action == "stop":
+        list(daemon.request(sock, {"op": "stop"}))
+        cprint("Daemon stopped.", color="green")
+    else:
+        sock.close()
+        cprint(f"Error: Unknown daemon command '{action}'", color="red")
+
 
 async def main():
     """Main async function to parse args and dispatch commands."""
@@ -177,6 +291,7 @@ async def main():
         print("\nUsage:")
         print("  python main.py run <prompt...>")
         print("  python main.py chat")
+        print("  python main.py daemon [start|stop|status]")
         return
 
     command = args[0]
@@ -184,6 +299,8 @@ async def main():
         await run_command(args[1:])
     elif command == "chat":
         await chat_command()
+    elif command == "daemon":
+        daemon_command(args[1:])
     else:
         cprint(f"Error: Unknown command '{command}'", color="red")
 
@@ -0,0 +1,301 @@
+# File: memory.py
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from admission import PRIORITY_BACKGROUND, QueueFull, get_admission_controller
+from cache import SQLiteBackend, CacheSweeper
+from config import (
+    MEMORY_RECENT_TURNS,
+    MEMORY_MAX_TOKENS,
+    MEMORY_SUMMARY_TOKENS,
+    MEMORY_MAX_SESSIONS,
+    MEMORY_SPILL,
+    MEMORY_SESSION_TTL,
+    SEARCH_CACHE_SWEEP_INTERVAL,
+)
+from summarizer import CHARS_PER_TOKEN, complete, estimate_tokens
+
+logger = logging.getLogger("memory")
+
+MEMORY_DIR = Path.home() / ".cache" / "cluj-ai" / "memory"
+
+# Admission client for rolling-summary generations
+SUMMARY_CLIENT_ID = "memory-summarizer"
+
+SUMMARY_UPDATE_PROMPT = """Here is a running summary of a conversation between a user and an assistant:
+
+{summary}
+
+Here are the next exchanges:
+
+{turns}
+
+Write an updated summary that keeps the facts, names, preferences and open
+questions needed to continue the conversation, in at most {words} words.
+Reply with the summary only."""
+
+
+def _clip(text: str, max_tokens: int) -> str:
+    limit = max_tokens * CHARS_PER_TOKEN
+    return text if len(text) <= limit else text[:limit].rstrip() + " …"
+
+
+class Conversation:
+    """One session: a rolling summary plus the turns it does not cover yet."""
+
+    def __init__(self, summary: str = "", turns: list | None = None):
+        self.summary = summary
+        self.turns = turns or []   # [user, assistant] pairs, oldest first
+        self.updated_at = time.time()
+
+    def to_json(self) -> str:
+        return json.dumps({"summary": self.summary, "turns": self.turns})
+
+    @classmethod
+    def from_json(cls, data: str) -> "Conversation":
+        fields = json.loads(data)
+        return cls(fields["summary"], fields["turns"])
+
+
+class ConversationStore:
+    """Session-keyed conversation memory with a bounded prompt footprint.
+
+    The last `recent_turns` turns are replayed verbatim; older turns are
+    folded into a rolling summary by a background task, so the history
+    sent with each request stays under `max_tokens` however long the
+    session runs. Sessions live in an LRU in memory; with a spill backend,
+    every change is also written through to SQLite (batched, off the event
+    loop), so sessions evicted from the LRU or from before a restart are
+    read back on their next turn.
+    """
+
+    def __init__(self, recent_turns: int, max_tokens: int, summary_tokens: int,
+                 max_sessions: int, spill: SQLiteBackend | None = None, ttl: float = 0):
+        self.recent_turns = recent_turns
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.max_sessions = max_sessions
+        self.spill = spill
+        self.ttl = ttl
+
+        self._sessions: OrderedDict[str, Conversation] = OrderedDict()
+        self._summarizing: dict[str, asyncio.Task] = {}
+        self._dirty: dict[str, Conversation] = {}    # changed since the last spill write
+        self._writing: dict[str, Conversation] = {}  # being written by the flush task
+        self._flush_task = None
+        self._sweeper = CacheSweeper(spill, SEARCH_CACHE_SWEEP_INTERVAL) if spill else None
+
+        self.spilled = 0
+        self.restored = 0
+        self.summaries = 0
+        self.summary_errors = 0
+
+    def _get(self, session_id: str) -> Conversation:
+        conversation = self._sessions.get(session_id)
+        if conversation is not None:
+            self._sessions.move_to_end(session_id)
+            return conversation
+
+        # An evicted session may not have reached SQLite yet
+        conversation = self._dirty.get(session_id) or self._writing.get(session_id)
+        if conversation is None and self.spill is not None:
+            # Only when the session was evicted again since load(): a rare,
+            # single-row read
+            row = self.spill.get(session_id)
+            if row is not None:
+                conversation = Conversation.from_json(row[0])
+                self.restored += 1
+        return self._insert(session_id, conversation or Conversation())
+
+    def _insert(self, session_id: str, conversation: Conversation) -> Conversation:
+        self._sessions[session_id] = conversation
+        while len(self._sessions) > self.max_sessions:
+            evicted_id, evicted = self._sessions.popitem(last=False)
+            self._save(evicted_id, evicted)
+            self.spilled += 1
+        return conversation
+
+    async def _load(self, session_id: str) -> None:
+        """Read a session that is not in memory back from the spill store, off the event loop."""
+        if (self.spill is None or session_id in self._sessions
+                or session_id in self._dirty or session_id in self._writing):
+            return
+        row = await asyncio.to_thread(self.spill.get, session_id)
+        if row is not None and session_id not in self._sessions:
+            self._insert(session_id, Conversation.from_json(row[0]))
+            self.restored += 1
+
+    def _save(self, session_id: str, conversation: Conversation) -> None:
+        """Queue a session for the spill store; one background task writes the queue in batches."""
+        if self.spill is None:
+            return
+        self._dirty[session_id] = conversation
+        self._sweeper.start()
+        if self._flush_task is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(self._take_dirty())  # no event loop (sync caller): write now
+            return
+        self._flush_task = loop.create_task(self._flush())
+
+    def _take_dirty(self) -> list:
+        """Serialize queued sessions (on the loop, while nothing mutates them) and clear the queue."""
+        self._writing, self._dirty = self._dirty, {}
+        return [(session_id, conversation.to_json(), conversation.updated_at)
+                for session_id, conversation in self._writing.items()]
+
+    def _write(self, rows: list) -> None:
+        for session_id, data, updated_at in rows:
+            self.spill.put(session_id, data, updated_at, updated_at + self.ttl)
+
+    async def _flush(self) -> None:
+        try:
+            while self._dirty:
+                await asyncio.to_thread(self._write, self._take_dirty())
+        except Exception as e:
+            logger.warning(f"Conversation spill write failed: {e}")
+        finally:
+            self._writing = {}
+            self._flush_task = None
+
+    async def history(self, session_id: str | None) -> list:
+        """Chat messages for the next request, within the token budget."""
+        if session_id is None:
+            return []
+        await self._load(session_id)
+        conversation = self._get(session_id)
+
+        budget = self.max_tokens
+        prefix = []
+        if conversation.summary:
+            summary = _clip(conversation.summary, self.summary_tokens)
+            # A user/assistant pair rather than a mid-conversation system
+            # message, which some chat templates reject
+            prefix = [
+                HumanMessage(content=f"(Summary of our conversation so far: {summary})"),
+                AIMessage(content="Understood."),
+            ]
+            budget -= estimate_tokens(summary) + 10
+
+        # Newest turns first, until the budget runs out; a single oversized
+        # turn is clipped rather than dropped
+        recent = []
+        for user, assistant in reversed(conversation.turns[-self.recent_turns:]):
+            cost = estimate_tokens(user) + estimate_tokens(assistant)
+            if cost > budget:
+                if recent or budget < 50:
+                    break
+                user, assistant = _clip(user, budget // 3), _clip(assistant, budget // 2)
+                cost = budget
+            recent[:0] = [HumanMessage(content=user), AIMessage(content=assistant)]
+            budget -= cost
+        return prefix + recent
+
+    def add_turn(self, session_id: str | None, user: str, assistant: str) -> None:
+        """Record a finished turn; older turns are summarized in the background."""
+        if session_id is None or not assistant:
+            return
+        conversation = self._get(session_id)
+        conversation.turns.append([user, assistant])
+        conversation.updated_at = time.time()
+        self._save(session_id, conversation)
+
+        if len(conversation.turns) > self.recent_turns and session_id not in self._summarizing:
+            try:
+                task = asyncio.get_running_loop().create_task(self._summarize(session_id, conversation))
+            except RuntimeError:
+                return  # no event loop (sync caller): summarize on a later turn
+            self._summarizing[session_id] = task
+            task.add_done_callback(lambda _: self._summarizing.pop(session_id, None))
+
+    async def _summarize(self, session_id: str, conversation: Conversation) -> None:
+        """Fold turns that left the verbatim window into the rolling summary."""
+        while len(conversation.turns) > self.recent_turns:
+            overflow = conversation.turns[:len(conversation.turns) - self.recent_turns]
+            turns = "\n\n".join(f"User: {user}\nAssistant: {assistant}" for user, assistant in overflow)
+            prompt = SUMMARY_UPDATE_PROMPT.format(
+                summary=conversation.summary or "(nothing yet)",
+                turns=_clip(turns, self.max_tokens * 2),
+                words=self.summary_tokens * 3 // 4,
+            )
+            # A background generation: it queues behind every request for a
+            # slot rather than oversubscribing the backends admission protects
+            try:
+                ticket = get_admission_controller().enqueue(SUMMARY_CLIENT_ID, PRIORITY_BACKGROUND)
+            except QueueFull:
+                logger.debug(f"Server busy, summary of {session_id} left for a later turn")
+                return
+            try:
+                async for _ in ticket.wait():
+                    pass
+                summary = await complete(prompt)
+            except QueueFull:
+                logger.debug(f"Server busy, summary of {session_id} left for a later turn")
+                return
+            except Exception as e:
+                self.summary_errors += 1
+                logger.warning(f"Conversation summary failed for {session_id}: {e}")
+                return
+            finally:
+                ticket.release()
+
+            conversation.summary = summary
+            del conversation.turns[:len(overflow)]
+            self._save(session_id, conversation)
+            self.summaries += 1
+            logger.debug(f"🧾 Folded {len(overflow)} turn(s) of {session_id} into its summary")
+
+    def close(self) -> None:
+        """Write every in-memory and queued session to the spill store, synchronously."""
+        if self.spill is None:
+            return
+        self._dirty.update(self._sessions)
+        self._write(self._take_dirty())
+        self._writing = {}
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "summarizing": len(self._summarizing),
+            "summaries": self.summaries,
+            "summary_errors": self.summary_errors,
+            "pending_writes": len(self._dirty) + len(self._writing),
+            "spilled": self.spilled,
+            "restored": self.restored,
+            "recent_turns": self.recent_turns,
+            "max_tokens": self.max_tokens,
+        }
+
+
+_cached_store = None
+
+def get_conversation_store() -> ConversationStore:
+    """Get the process-wide conversation store, creating it if needed."""
+    global _cached_store
+
+    if _cached_store is None:
+        spill = None
+        if MEMORY_SPILL:
+            MEMORY_DIR.mkdir(parents=True, exist_ok=True)
+            spill = SQLiteBackend(MEMORY_DIR / "sessions.db", MEMORY_MAX_SESSIONS * 20, 256 * 1024 * 1024)
+        _cached_store = ConversationStore(
+            recent_turns=MEMORY_RECENT_TURNS,
+            max_tokens=MEMORY_MAX_TOKENS,
+            summary_tokens=MEMORY_SUMMARY_TOKENS,
+            max_sessions=MEMORY_MAX_SESSIONS,
+            spill=spill,
+            ttl=MEMORY_SESSION_TTL,
+        )
+
+    return _cached_store
+
+__all__ = ['Conversation', 'ConversationStore', 'get_conversation_store']
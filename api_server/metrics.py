@@ -0,0 +1,293 @@
+# File: metrics.py
+
+import asyncio
+import bisect
+import math
+import time
+from functools import wraps
+
+# Latency buckets in seconds: sub-ms cache hits up to minute-long generations
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 40, 60, 80, 120, 200)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 7, 10)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        if not self.labelnames:
+            self.labels()  # unlabelled metrics are exported from the start, at zero
+
+    def labels(self, *values):
+        """Child for one label combination; keep a reference to it on hot paths."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def render(self, name: str, labelnames: tuple, values: tuple) -> list:
+        return [f"{name}{_label_text(labelnames, values)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    """Monotonic count. Updates are plain attribute adds: cheap, and exact on the event loop."""
+
+    kind = "counter"
+    _new_child = _Value
+
+    def inc(self, amount: float = 1) -> None:
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down (in-flight streams, queue depth)."""
+
+    kind = "gauge"
+    _new_child = _Value
+
+    def inc(self, amount: float = 1) -> None:
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._default().dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labelnames: tuple, values: tuple) -> list:
+        lines, cumulative = [], 0
+        for bound, count in zip(self.bounds + (math.inf,), self.counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_label_text(labelnames, values, le)} {cumulative}")
+        labels = _label_text(labelnames, values)
+        lines.append(f"{name}_sum{labels} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{labels} {self.count}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Distribution over fixed buckets; observe() is one bisect and three adds."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+
+class Registry:
+    """Metrics owned by this process plus collectors that read existing stats at scrape time.
+
+    A collector is a callable returning (name, kind, help, [(labels, value), ...])
+    tuples; it runs only when /metrics is scraped, so counters the
+    subsystems already keep cost nothing extra on the request path.
+    """
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        self._metrics = []
+        self._collectors = []
+
+    def _register(self, metric):
+        metric.name = self.prefix + metric.name
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def add_collector(self, collector) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Text exposition format 0.0.4."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                lines.append(f"# collector {getattr(collector, '__name__', collector)} failed: {_escape(e)}")
+                continue
+            for name, kind, help, samples in families:
+                name = self.prefix + name
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    names, values = tuple(labels), tuple(labels.values())
+                    lines.append(f"{name}{_label_text(names, values)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry(prefix="cluj_")
+
+# --- Request path ---
+REQUEST_DURATION = REGISTRY.histogram(
+    "request_duration_seconds", "Time from request to the end of its stream", ("endpoint",))
+TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    "time_to_first_token_seconds", "Time from request to the first streamed token", ("endpoint",))
+STREAMS_IN_FLIGHT = REGISTRY.gauge(
+    "streams_in_flight", "SSE streams currently open", ("endpoint",))
+ULTRA_FAST_RESPONSES = REGISTRY.counter(
+    "ultra_fast_responses_total", "/agent-chat queries answered from the canned table", ("result",))
+ROUTER_DECISIONS = REGISTRY.counter(
+    "router_decisions_total", "route_to_tool_directly outcomes", ("tool",))
+AGENT_ITERATIONS = REGISTRY.histogram(
+    "agent_iterations", "LLM generations per /agent-chat request", buckets=COUNT_BUCKETS)
+AGENT_TOOL_CALLS = REGISTRY.histogram(
+    "agent_tool_calls", "Tool calls per /agent-chat request", buckets=COUNT_BUCKETS)
+
+# --- Tools ---
+TOOL_DURATION = REGISTRY.histogram("tool_duration_seconds", "Tool run time", ("tool",))
+TOOL_ERRORS = REGISTRY.counter("tool_errors_total", "Tool runs that raised or returned an error", ("tool",))
+
+# --- LLM (from llama.cpp timings) ---
+LLM_PREFILL_SECONDS = REGISTRY.histogram(
+    "llm_prefill_seconds", "Server-side prompt processing time per generation")
+LLM_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "llm_tokens_per_second", "Generation speed per completion", buckets=RATE_BUCKETS)
+LLM_PROMPT_TOKENS = REGISTRY.histogram(
+    "llm_prompt_tokens", "Prompt tokens prefilled per generation (not reused from KV cache)",
+    buckets=TOKEN_BUCKETS)
+LLM_TOKENS = REGISTRY.counter(
+    "llm_tokens_total", "Tokens by kind: prefilled, reused from KV cache, generated", ("kind",))
+
+
+def timed_tool(name: str, is_error=lambda output: False):
+    """Decorator for a tool's func/coroutine: run time and errors, labelled by tool."""
+    duration = TOOL_DURATION.labels(name)
+    errors = TOOL_ERRORS.labels(name)
+
+    def decorate(fn):
+        if fn is None:
+            return None
+        if asyncio.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def timed_async(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    output = await fn(*args, **kwargs)
+                except Exception:
+                    errors.inc()
+                    raise
+                finally:
+                    duration.observe(time.perf_counter() - started)
+                if is_error(output):
+                    errors.inc()
+                return output
+            return timed_async
+
+        @wraps(fn)
+        def timed_sync(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                output = fn(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                duration.observe(time.perf_counter() - started)
+            if is_error(output):
+                errors.inc()
+            return output
+        return timed_sync
+
+    return decorate
+
+def observe_timings(timings: dict) -> None:
+    """Fold one llama.cpp `timings` block into the LLM metrics."""
+    prompt_n = int(timings.get("prompt_n", 0))
+    predicted_n = int(timings.get("predicted_n", 0))
+    predicted_ms = float(timings.get("predicted_ms", 0.0))
+    LLM_PREFILL_SECONDS.observe(float(timings.get("prompt_ms", 0.0)) / 1000)
+    LLM_PROMPT_TOKENS.observe(prompt_n)
+    LLM_TOKENS.labels("prefilled").inc(prompt_n)
+    LLM_TOKENS.labels("cached").inc(int(timings.get("cache_n", 0)))
+    LLM_TOKENS.labels("generated").inc(predicted_n)
+    if predicted_n > 1 and predicted_ms > 0:
+        LLM_TOKENS_PER_SECOND.observe(predicted_n * 1000 / predicted_ms)
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+__all__ = ['Counter', 'Gauge', 'Histogram', 'Registry', 'REGISTRY', 'timed_tool', 'observe_timings',
+           'render_metrics']
@@ -0,0 +1,122 @@
+# File: prefetch.py
+
+import asyncio
+import contextvars
+import time
+from functools import wraps
+
+# Speculative tool calls started for the current request, by tool name
+_current = contextvars.ContextVar("tool_prefetches", default=None)
+
+# tool name -> (coroutine the prefetch runs, argument key function)
+_prefetchable = {}
+
+
+class PrefetchStats:
+    """Speculative tool calls: how often the model asked for what was prefetched."""
+
+    def __init__(self):
+        self.started = 0
+        self.hits = 0
+        self.misses = 0        # the model called the tool with different arguments
+        self.unused = 0        # the model never called the tool
+        self.errors = 0        # prefetch raised; the real call ran instead
+        self.hidden_s = 0.0    # tool time that overlapped the model's generation
+
+    def as_dict(self) -> dict:
+        decided = self.hits + self.misses + self.unused + self.errors
+        return {
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "unused": self.unused,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / decided, 3) if decided else 0.0,
+            "hidden_ms": round(self.hidden_s * 1000, 1),
+        }
+
+
+_stats = PrefetchStats()
+
+
+class _Prefetch:
+    __slots__ = ("key", "task", "started_at", "finished_at")
+
+    def __init__(self, key, task: asyncio.Task):
+        self.key = key
+        self.task = task
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        task.add_done_callback(self._done)
+
+    def _done(self, task: asyncio.Task) -> None:
+        self.finished_at = time.perf_counter()
+        if not task.cancelled():
+            task.exception()  # retrieved, so a discarded failure is not logged as unhandled
+
+    def overlap(self, called_at: float) -> float:
+        """Seconds of tool run time that passed before the model asked for it."""
+        return min(called_at, self.finished_at or called_at) - self.started_at
+
+
+def prefetchable(name: str, key):
+    """Decorator for a tool coroutine: serve an equivalent prefetched call instead of running it.
+
+    `key(*args, **kwargs)` reduces the tool's arguments to what makes two calls
+    equivalent. The undecorated coroutine is what prefetches run.
+    """
+    def decorate(fn):
+        _prefetchable[name] = (fn, key)
+
+        @wraps(fn)
+        async def serve_prefetched(*args, **kwargs):
+            pending = _current.get()
+            prefetch = pending.pop(name, None) if pending is not None else None
+            if prefetch is None:
+                return await fn(*args, **kwargs)
+            if prefetch.key != key(*args, **kwargs):
+                _stats.misses += 1
+                prefetch.task.cancel()
+                return await fn(*args, **kwargs)
+
+            called_at = time.perf_counter()
+            try:
+                output = await prefetch.task
+            except Exception:
+                _stats.errors += 1
+                return await fn(*args, **kwargs)
+            _stats.hits += 1
+            _stats.hidden_s += prefetch.overlap(called_at)
+            return output
+        return serve_prefetched
+    return decorate
+
+def start_request() -> None:
+    """Begin a request with no speculative calls in flight."""
+    _current.set({})
+
+def speculate(name: str, kwargs: dict) -> bool:
+    """Start name(**kwargs) in the background for the current request; False if not prefetchable."""
+    pending = _current.get()
+    if pending is None or name not in _prefetchable or name in pending:
+        return False
+    fn, key = _prefetchable[name]
+    pending[name] = _Prefetch(key(**kwargs), asyncio.ensure_future(fn(**kwargs)))
+    _stats.started += 1
+    return True
+
+def finish_request() -> None:
+    """Discard prefetches the model never asked for."""
+    pending = _current.get()
+    if not pending:
+        return
+    for prefetch in pending.values():
+        _stats.unused += 1
+        prefetch.task.cancel()
+    pending.clear()
+
+def get_prefetch_stats() -> dict:
+    return _stats.as_dict()
+
+__all__ = ['PrefetchStats', 'prefetchable', 'start_request', 'speculate', 'finish_request',
+           'get_prefetch_stats']
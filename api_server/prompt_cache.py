@@ -0,0 +1,114 @@
+# File: prompt_cache.py
+
+import contextvars
+import hashlib
+import json
+import logging
+
+import httpx
+
+from config import LLM_SLOTS
+from metrics import observe_timings
+
+logger = logging.getLogger("prompt_cache")
+
+# Conversation the current request belongs to (drives llama.cpp slot affinity)
+_current_session = contextvars.ContextVar("llm_session", default=None)
+# Prefill accounting for the current request
+_current_timings = contextvars.ContextVar("llm_timings", default=None)
+
+
+class PrefillTimings:
+    """Totals of llama.cpp `timings` blocks for one request (or the whole process)."""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0      # tokens actually prefilled (prompt_n)
+        self.cached_tokens = 0      # tokens reused from the slot's KV cache (cache_n)
+        self.prompt_ms = 0.0
+        self.predicted_tokens = 0
+        self.predicted_ms = 0.0
+
+    def add(self, timings: dict) -> None:
+        self.calls += 1
+        self.prompt_tokens += int(timings.get("prompt_n", 0))
+        self.cached_tokens += int(timings.get("cache_n", 0))
+        self.prompt_ms += float(timings.get("prompt_ms", 0.0))
+        self.predicted_tokens += int(timings.get("predicted_n", 0))
+        self.predicted_ms += float(timings.get("predicted_ms", 0.0))
+
+    def as_dict(self) -> dict:
+        total = self.prompt_tokens + self.cached_tokens
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cache_ratio": round(self.cached_tokens / total, 3) if total else 0.0,
+            "prompt_ms": round(self.prompt_ms, 1),
+            "predicted_tokens": self.predicted_tokens,
+            "predicted_ms": round(self.predicted_ms, 1),
+        }
+
+
+_totals = PrefillTimings()
+
+
+def set_session(session_id: str | None) -> None:
+    """Pin LLM calls made from the current context to the session's slot."""
+    _current_session.set(session_id)
+
+def current_session() -> str | None:
+    return _current_session.get()
+
+def start_request() -> PrefillTimings:
+    """Begin prefill accounting for the current request and return its totals."""
+    timings = PrefillTimings()
+    _current_timings.set(timings)
+    return timings
+
+def slot_for(session_id: str | None) -> int | None:
+    """Stable llama.cpp slot for a session, or None to let the server choose."""
+    if session_id is None or LLM_SLOTS <= 1:
+        return None
+    digest = hashlib.blake2b(session_id.encode(), digest_size=4).digest()
+    return int.from_bytes(digest, "big") % LLM_SLOTS
+
+def is_completion_request(request: httpx.Request) -> bool:
+    return request.method == "POST" and request.url.path.endswith("/chat/completions")
+
+def pin_slot(request: httpx.Request) -> httpx.Request:
+    """Request hook: add id_slot to chat completions for the current session."""
+    if not is_completion_request(request):
+        return request
+    slot = slot_for(_current_session.get())
+    if slot is None:
+        return request
+
+    body = json.loads(request.content)
+    body["id_slot"] = slot
+    headers = {k: v for k, v in request.headers.items() if k.lower() != "content-length"}
+    return httpx.Request(
+        request.method, request.url, headers=headers,
+        content=json.dumps(body).encode(), extensions=request.extensions,
+    )
+
+def record_timings(request: httpx.Request, event: dict) -> None:
+    """SSE hook: fold the server's `timings` block into request and process totals."""
+    timings = event.get("timings")
+    if not timings or not is_completion_request(request):
+        return
+    _totals.add(timings)
+    observe_timings(timings)
+    current = _current_timings.get()
+    if current is not None:
+        current.add(timings)
+    logger.debug(
+        f"Prefill: {timings.get('prompt_n', 0)} tokens computed, "
+        f"{timings.get('cache_n', 0)} reused from KV cache"
+    )
+
+def get_prompt_cache_stats() -> dict:
+    return {"slots": LLM_SLOTS, **_totals.as_dict()}
+
+__all__ = ['PrefillTimings', 'set_session', 'current_session', 'start_request', 'slot_for',
+           'pin_slot', 'record_timings', 'get_prompt_cache_stats']
@@ -0,0 +1,129 @@
+# File: router.py
+
+import re
+from collections import deque
+from functools import lru_cache
+from typing import NamedTuple
+
+
+class RoutingRule(NamedTuple):
+    """One routing rule.
+
+    pattern is authoritative. keywords are literal substrings that any match
+    of pattern must contain; they let the router skip rules that cannot
+    match without running their regex. A rule with no keywords is checked
+    on every query.
+    """
+    name: str
+    pattern: str
+    tool: str
+    priority: int = 0
+    keywords: tuple = ()
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton: finds every keyword in a single pass over the text."""
+
+    def __init__(self, keywords: dict[str, set]):
+        # keywords maps literal -> ids of the rules it triggers
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [set()]
+
+        for word, ids in keywords.items():
+            state = 0
+            for ch in word:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(set())
+                state = nxt
+            self._out[state] |= ids
+
+        # Breadth-first failure links; outputs inherit along them
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] |= self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> set:
+        """Ids of every rule with at least one keyword in text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+
+class ToolRouter:
+    """Pre-compiled tool router.
+
+    A keyword automaton narrows the rules to candidates in one pass, the
+    candidates' regexes confirm the match, and the winner is the highest
+    priority, then the most specific (longest match), then the earliest
+    declared rule. Recent decisions are kept in a small LRU.
+    """
+
+    def __init__(self, rules: list, cache_size: int = 512):
+        self.rules = list(rules)
+        self._regexes = [re.compile(rule.pattern) for rule in self.rules]
+        self._always = [i for i, rule in enumerate(self.rules) if not rule.keywords]
+
+        keywords = {}
+        for i, rule in enumerate(self.rules):
+            for word in rule.keywords:
+                keywords.setdefault(word.lower(), set()).add(i)
+        self._automaton = KeywordAutomaton(keywords)
+
+        self._cached_match = lru_cache(maxsize=cache_size)(self._match)
+
+    def _match(self, query_lower: str) -> int | None:
+        candidates = self._automaton.find(query_lower)
+        candidates.update(self._always)
+
+        best = None
+        best_key = None
+        for i in candidates:
+            found = self._regexes[i].search(query_lower)
+            if found is None:
+                continue
+            rule = self.rules[i]
+            key = (rule.priority, len(found.group(0)), -i)
+            if best_key is None or key > best_key:
+                best, best_key = i, key
+        return best
+
+    def match(self, query: str) -> RoutingRule | None:
+        """The winning rule for a query, or None."""
+        index = self._cached_match(query.lower().strip())
+        return None if index is None else self.rules[index]
+
+    def route(self, query: str) -> str | None:
+        """The tool name for a query, or None."""
+        rule = self.match(query)
+        return rule.tool if rule else None
+
+    def stats(self) -> dict:
+        info = self._cached_match.cache_info()
+        return {
+            "rules": len(self.rules),
+            "cache_hits": info.hits,
+            "cache_misses": info.misses,
+            "cache_size": info.currsize,
+        }
+
+__all__ = ['RoutingRule', 'KeywordAutomaton', 'ToolRouter']
@@ -0,0 +1,167 @@
+# File: semantic_cache.py
+
+import logging
+import threading
+import time
+
+import numpy as np
+
+from config import (
+    EMBEDDING_BASE_URL,
+    MODEL_NAME,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL,
+)
+from http_client import get_async_client
+
+logger = logging.getLogger("semantic_cache")
+
+# After a failed embedding call, skip the cache for this long instead of
+# paying a failing round trip on every request
+EMBEDDING_RETRY_AFTER = 300.0
+
+
+class SemanticCache:
+    """Nearest-neighbour cache of final answers keyed on input embeddings.
+
+    Vectors are L2-normalised and kept in one preallocated matrix, so a lookup
+    is a single matrix-vector product. Each entry carries a tag (the caller's
+    exact-match key, e.g. routed tool and numbers in the query); a lookup only
+    considers entries with the same tag. Entries expire after ttl seconds;
+    when full, the least recently used slot is overwritten.
+    """
+
+    def __init__(self, max_entries: int, threshold: float, ttl: float):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+
+        self._vectors = None          # (max_entries, dim) float32, allocated on first store
+        self._expires = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries)
+        self._tags = np.full(max_entries, -1)  # tag ids, see _tag_id
+        self._tag_ids = {}
+        self._next_tag_id = 0
+        self._answers = [None] * max_entries
+        self._queries = [None] * max_entries
+        self._lock = threading.Lock()
+        self._disabled_until = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.embed_errors = 0
+
+    @property
+    def available(self) -> bool:
+        return time.time() >= self._disabled_until
+
+    async def embed(self, text: str) -> np.ndarray | None:
+        """Embed text with the local llama.cpp server; None if it is unavailable."""
+        if not self.available:
+            return None
+        try:
+            response = await get_async_client().post(
+                f"{EMBEDDING_BASE_URL}/v1/embeddings",
+                json={"input": text, "model": MODEL_NAME},
+                timeout=5,
+            )
+            response.raise_for_status()
+            vector = np.asarray(response.json()["data"][0]["embedding"], dtype=np.float32)
+        except Exception as e:
+            self.embed_errors += 1
+            self._disabled_until = time.time() + EMBEDDING_RETRY_AFTER
+            logger.warning(f"Semantic cache disabled for {EMBEDDING_RETRY_AFTER:.0f}s - embedding failed: {e}")
+            return None
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _tag_id(self, tag) -> int:
+        tag_id = self._tag_ids.get(tag)
+        if tag_id is None:
+            if len(self._tag_ids) >= 4 * self.max_entries:
+                # Forget tags no entry carries any more
+                live = set(self._tags.tolist())
+                self._tag_ids = {t: i for t, i in self._tag_ids.items() if i in live}
+            tag_id = self._tag_ids[tag] = self._next_tag_id
+            self._next_tag_id += 1
+        return tag_id
+
+    def lookup(self, vector: np.ndarray, tag=None) -> tuple[str, float, str] | None:
+        """Return (answer, similarity, cached_query) for the nearest live entry with this tag above threshold."""
+        with self._lock:
+            if self._vectors is None or vector.shape[0] != self._vectors.shape[1]:
+                self.misses += 1
+                return None
+
+            now = time.time()
+            similarities = self._vectors @ vector
+            similarities[self._expires <= now] = -1.0
+            similarities[self._tags != self._tag_ids.get(tag, -2)] = -1.0
+            index = int(np.argmax(similarities))
+            similarity = float(similarities[index])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+
+            self._last_used[index] = now
+            self.hits += 1
+            return self._answers[index], similarity, self._queries[index]
+
+    def store(self, vector: np.ndarray, query: str, answer: str, tag=None) -> None:
+        with self._lock:
+            if self._vectors is None or vector.shape[0] != self._vectors.shape[1]:
+                # First entry (or the embedding model changed): size the matrix
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._expires[:] = 0
+
+            now = time.time()
+            free = np.flatnonzero(self._expires <= now)
+            if free.size:
+                index = int(free[0])
+            else:
+                index = int(np.argmin(self._last_used))
+                self.evictions += 1
+
+            self._vectors[index] = vector
+            self._expires[index] = now + self.ttl
+            self._last_used[index] = now
+            self._tags[index] = self._tag_id(tag)
+            self._answers[index] = answer
+            self._queries[index] = query
+            self.stores += 1
+
+    def stats(self) -> dict:
+        live = int((self._expires > time.time()).sum())
+        return {
+            "available": self.available,
+            "entries": live,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "embed_errors": self.embed_errors,
+        }
+
+
+_cached_semantic_cache = None
+
+def get_semantic_cache() -> SemanticCache:
+    """Get the process-wide semantic answer cache, creating it if needed."""
+    global _cached_semantic_cache
+
+    if _cached_semantic_cache is None:
+        _cached_semantic_cache = SemanticCache(
+            max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+            threshold=SEMANTIC_CACHE_THRESHOLD,
+            ttl=SEMANTIC_CACHE_TTL,
+        )
+
+    return _cached_semantic_cache
+
+__all__ = ['SemanticCache', 'get_semantic_cache']
@@ -0,0 +1,153 @@
+# File: singleflight.py
+
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable
+
+
+class _SharedStream:
+    """Buffered fan-out of one async iterator to any number of subscribers."""
+
+    def __init__(self, source: AsyncIterator):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._wake()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._wake()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self) -> AsyncIterator:
+        # Late joiners replay what has already been produced, then follow live
+        index = 0
+        while True:
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                break
+            await self._changed.wait()
+        if self.error is not None:
+            raise self.error
+
+
+class Subscription:
+    """One caller's view of a shared stream: iterate it, then leave().
+
+    Joining happens when the subscription is created, so leave() (safe to
+    call more than once, e.g. from a disconnect handler) balances it even
+    if the caller never started iterating.
+    """
+
+    def __init__(self, flight: "SingleFlight", key: str, shared: _SharedStream, leader: bool):
+        self._flight = flight
+        self._key = key
+        self._shared = shared
+        self.leader = leader      # this caller started the upstream work
+        self.left = False
+        shared.subscribers += 1
+
+    @property
+    def task(self) -> asyncio.Task:
+        """The task producing the shared stream."""
+        return self._shared.task
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._shared.subscribe():
+                yield chunk
+        finally:
+            self.leave()
+
+    def leave(self) -> None:
+        if not self.left:
+            self.left = True
+            self._flight._leave(self._key, self._shared)
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one upstream call.
+
+    The upstream call runs in its own task, so a caller that disconnects
+    does not cancel the work the other callers are waiting on. A shared
+    stream is cancelled once its last subscriber has left.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[str, asyncio.Future] = {}
+        self._streams: dict[str, _SharedStream] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        """Await fn() once per key; concurrent callers share its result or exception."""
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finish(self._calls, key, t))
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: str) -> bool:
+        """Whether a stream for key is running, so stream(key, ...) would join it."""
+        return key in self._streams
+
+    def stream(self, key: str, fn: Callable[[], AsyncIterator]) -> Subscription:
+        """Iterate fn() once per key; concurrent callers all receive every item."""
+        shared = self._streams.get(key)
+        leader = shared is None
+        if leader:
+            self.leaders += 1
+            shared = _SharedStream(fn())
+            self._streams[key] = shared
+            shared.task.add_done_callback(lambda t: self._finish(self._streams, key, shared))
+        else:
+            self.coalesced += 1
+        return Subscription(self, key, shared, leader)
+
+    def _leave(self, key: str, shared: _SharedStream) -> None:
+        shared.subscribers -= 1
+        if shared.subscribers or shared.done:
+            return
+        # Nobody is listening any more: stop the upstream work, and make sure
+        # a new caller starts afresh instead of joining a cancelled stream
+        if self._streams.get(key) is shared:
+            del self._streams[key]
+        shared.task.cancel()
+        self.abandoned += 1
+
+    @staticmethod
+    def _finish(calls: dict, key: str, entry):
+        if calls.get(key) is entry:
+            del calls[key]
+        # Mark the exception retrieved even if every caller went away
+        if isinstance(entry, asyncio.Future) and not entry.cancelled():
+            entry.exception()
+
+    def stats(self) -> dict:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+            "in_flight": len(self._calls) + len(self._streams),
+        }
+
+__all__ = ['SingleFlight', 'Subscription']
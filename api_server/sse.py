@@ -0,0 +1,140 @@
+# File: sse.py
+
+import asyncio
+import time
+from typing import AsyncIterator
+
+try:
+    import orjson
+except ImportError:  # optional speed-up; the stdlib encoder is the fallback
+    orjson = None
+    import json
+
+
+if orjson is not None:
+    def dumps(payload) -> str:
+        """Serialize an SSE payload (orjson, ~5-10x faster than json.dumps)."""
+        return orjson.dumps(payload, default=str).decode()
+else:
+    def dumps(payload) -> str:
+        """Serialize an SSE payload."""
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def message(payload: dict) -> dict:
+    """One EventSourceResponse item carrying payload as a "message" event."""
+    return {"event": "message", "data": dumps(payload)}
+
+
+class StreamStats:
+    """Per-process counters for the /agent-chat hot path."""
+
+    def __init__(self):
+        self.streams = 0
+        self.events = 0        # events received from astream_events
+        self.frames = 0        # SSE frames sent to clients
+        self.tokens = 0
+        self.frames_saved = 0  # token frames merged away by coalescing
+        self.handler_seconds = 0.0  # time spent turning events into frames
+
+    def record(self, started: float, tokens: int = 0) -> None:
+        self.events += 1
+        self.tokens += tokens
+        self.handler_seconds += time.perf_counter() - started
+
+    def as_dict(self) -> dict:
+        return {
+            "encoder": "orjson" if orjson is not None else "json",
+            "streams": self.streams,
+            "events": self.events,
+            "frames": self.frames,
+            "tokens": self.tokens,
+            "frames_saved": self.frames_saved,
+            "handler_ms_total": round(self.handler_seconds * 1000, 1),
+            "handler_us_per_event": round(self.handler_seconds * 1e6 / self.events, 1) if self.events else 0.0,
+        }
+
+
+async def coalesce_tokens(payloads: AsyncIterator[dict], window: float, max_bytes: int,
+                          stats: StreamStats | None = None) -> AsyncIterator[dict]:
+    """Merge runs of {"type": "token"} payloads into fewer, larger ones.
+
+    The first token after anything else (stream start, a tool call) goes
+    out at once so time-to-first-token is unchanged. Later tokens are held
+    until `window` seconds have passed or `max_bytes` are buffered. Any
+    other payload flushes the buffer and is passed through in order.
+
+    The source is drained by one pump task, so context variables it sets
+    (e.g. the prompt-cache session) stay visible to all of its steps.
+    """
+    queue = asyncio.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for payload in payloads:
+                await queue.put(payload)
+        except Exception as e:
+            await queue.put(e)
+        await queue.put(done)
+
+    pump_task = asyncio.ensure_future(pump())
+    loop = asyncio.get_running_loop()
+    buffer, size, merged = [], 0, 0
+    deadline = None
+    send_next = True
+
+    def flush():
+        nonlocal buffer, size, merged, deadline
+        payload = {"type": "token", "content": "".join(buffer)}
+        if stats is not None:
+            stats.frames_saved += merged
+        buffer, size, merged, deadline = [], 0, 0, None
+        return payload
+
+    try:
+        while True:
+            try:
+                if deadline is None:
+                    item = await queue.get()
+                else:
+                    item = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                yield flush()
+                continue
+
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                # Tokens already generated reach the client before the error
+                if buffer:
+                    yield flush()
+                raise item
+
+            if item.get("type") != "token":
+                if buffer:
+                    yield flush()
+                send_next = True
+                yield item
+                continue
+
+            if send_next:
+                send_next = False
+                yield item
+                continue
+
+            if buffer:
+                merged += 1
+            else:
+                deadline = loop.time() + window
+            buffer.append(item["content"])
+            size += len(item["content"].encode())
+            if size >= max_bytes:
+                yield flush()
+
+        if buffer:
+            yield flush()
+    finally:
+        pump_task.cancel()
+
+__all__ = ['dumps', 'message', 'StreamStats', 'coalesce_tokens']
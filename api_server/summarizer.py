@@ -0,0 +1,198 @@
+# File: summarizer.py
+
+import asyncio
+import logging
+import re
+import zlib
+
+from config import LLM_POOL_HOST, SUMMARY_CHUNK_TOKENS, SUMMARY_MAP_CONCURRENCY
+from http_client import get_async_client
+
+logger = logging.getLogger("summarizer")
+
+# Rough ratio used when the server's tokenizer is unreachable
+CHARS_PER_TOKEN = 4
+# Once a chunk is half full it may end after any unit whose hash is 0 mod
+# this, so boundaries depend on local content only and an edit early in a
+# page does not shift every later chunk (keeps per-chunk cache entries valid)
+CHUNK_ANCHOR_EVERY = 4
+
+SUMMARY_PROMPT = """Summarize the following webpage in a clear, structured format.
+
+Title: {title}
+URL: {url}
+
+Content:
+{content}
+
+Format your summary like this:
+
+📌 Overview:
+[One sentence description]
+
+🔑 Key Points:
+• [Main point 1]
+• [Main point 2]
+• [Main point 3]
+
+💡 Takeaway:
+[Brief conclusion]
+
+Keep it concise and scannable and in ENGLISH"""
+
+CHUNK_PROMPT = """Below is part {part} of {total} of the webpage "{title}".
+
+{content}
+
+List the key facts, claims and figures from this part as short bullet points.
+Do not add an introduction or conclusion. Write in ENGLISH."""
+
+COMBINE_PROMPT = """Below are notes taken from consecutive parts of the webpage "{title}".
+
+{content}
+
+Merge them into one list of short bullet points, keeping every distinct key
+fact and dropping repetition. Write in ENGLISH."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for budgeting (no tokenizer round trip)."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+async def count_tokens(text: str) -> int:
+    """Token count from the model's own tokenizer (llama.cpp /tokenize), or an estimate."""
+    try:
+        response = await get_async_client().post(
+            f"http://{LLM_POOL_HOST}/tokenize", json={"content": text}, timeout=10,
+        )
+        response.raise_for_status()
+        return len(response.json()["tokens"])
+    except Exception as e:
+        logger.debug(f"Tokenizer unavailable ({e}); estimating token count")
+        return estimate_tokens(text)
+
+def _split_units(text: str) -> list[str]:
+    """Paragraphs, with over-long paragraphs broken at sentence ends."""
+    units = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if paragraph:
+            units.extend(s for s in re.split(r"(?<=[.!?])\s+", paragraph) if s)
+            units[-1] += "\n\n"
+    return units
+
+def split_chunks(text: str, chars_per_token: float, max_tokens: int) -> list[str]:
+    """Pack paragraphs/sentences into chunks of at most max_tokens, cutting at content-defined anchors."""
+    budget = max(int(max_tokens * chars_per_token), 1)
+    chunks, current = [], ""
+    for unit in _split_units(text):
+        while len(unit) > budget:
+            # A single run-on "sentence" (tables, minified text): hard split
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(unit[:budget])
+            unit = unit[budget:]
+        if current and len(current) + len(unit) > budget:
+            chunks.append(current)
+            current = ""
+        current += unit if current.endswith("\n\n") or not current else " " + unit
+        if len(current) >= budget // 2 and zlib.crc32(unit.encode()) % CHUNK_ANCHOR_EVERY == 0:
+            chunks.append(current)
+            current = ""
+    if current.strip():
+        chunks.append(current)
+    return [chunk.strip() for chunk in chunks]
+
+async def stream_completion(prompt: str):
+    """Stream the raw token text of one generation."""
+    from agent import get_llm
+
+    async for chunk in get_llm().astream(prompt):
+        if chunk.content:
+            yield chunk.content
+
+async def complete(prompt: str) -> str:
+    from agent import get_llm
+
+    return (await get_llm().ainvoke(prompt)).content.strip()
+
+async def summarize_chunk(chunk: str, index: int, total: int, title: str) -> str:
+    """Map step: bullet-point notes for one chunk."""
+    return await complete(CHUNK_PROMPT.format(part=index + 1, total=total, title=title, content=chunk))
+
+async def _reduce(notes: list[str], title: str, chars_per_token: float, semaphore) -> list[str]:
+    """Combine notes level by level until they fit into one final prompt."""
+    budget = SUMMARY_CHUNK_TOKENS * chars_per_token
+    size = sum(len(n) for n in notes)
+    while len(notes) > 1 and size > budget:
+        # Pack notes up to the budget, but always at least two per group so
+        # every level shrinks the count even when single notes are large
+        groups, current = [], []
+        for note in notes:
+            if len(current) >= 2 and sum(len(n) for n in current) + len(note) > budget:
+                groups.append(current)
+                current = []
+            current.append(note)
+        groups.append(current)
+
+        async def combine(group):
+            if len(group) == 1:
+                return group[0]
+            async with semaphore:
+                return await complete(COMBINE_PROMPT.format(title=title, content="\n\n".join(group)))
+
+        notes = await asyncio.gather(*(combine(group) for group in groups))
+        previous, size = size, sum(len(n) for n in notes)
+        logger.info(f"🔁 Reduced to {len(notes)} note block(s)")
+        if size >= previous:
+            break  # the model is not condensing any further
+    return notes
+
+async def summarize_events(content: str, url: str, title: str, map_chunk=summarize_chunk):
+    """Summarize a page of any length, yielding SSE payloads.
+
+    Pages that fit in one chunk get a single streamed generation. Longer
+    pages are split on paragraph/sentence boundaries into chunks of about
+    SUMMARY_CHUNK_TOKENS tokens, each chunk is summarized in parallel
+    (yielding a "chunk_summary" payload as each finishes), the notes are
+    combined hierarchically, and the final summary is streamed as "token"
+    payloads.
+    """
+    from agent import get_llm
+
+    get_llm()  # registers the LLM pool host used by count_tokens
+    total_tokens = await count_tokens(content)
+    if total_tokens <= SUMMARY_CHUNK_TOKENS:
+        async for token in stream_completion(SUMMARY_PROMPT.format(title=title, url=url, content=content)):
+            yield {"type": "token", "content": token}
+        return
+
+    chars_per_token = max(len(content) / max(total_tokens, 1), 1.0)
+    chunks = split_chunks(content, chars_per_token, SUMMARY_CHUNK_TOKENS)
+    logger.info(f"✂️ {total_tokens} tokens -> {len(chunks)} chunks")
+
+    semaphore = asyncio.Semaphore(SUMMARY_MAP_CONCURRENCY)
+
+    async def map_one(index, chunk):
+        async with semaphore:
+            return index, await map_chunk(chunk, index, len(chunks), title)
+
+    notes = [None] * len(chunks)
+    tasks = [asyncio.ensure_future(map_one(i, chunk)) for i, chunk in enumerate(chunks)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            index, note = await finished
+            notes[index] = note
+            yield {"type": "chunk_summary", "index": index, "total": len(chunks), "content": note}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    notes = await _reduce(notes, title, chars_per_token, semaphore)
+    prompt = SUMMARY_PROMPT.format(title=title, url=url, content="\n\n".join(notes))
+    async for token in stream_completion(prompt):
+        yield {"type": "token", "content": token}
+
+__all__ = ['SUMMARY_PROMPT', 'estimate_tokens', 'count_tokens', 'split_chunks', 'stream_completion',
+           'summarize_chunk', 'summarize_events']
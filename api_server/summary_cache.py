@@ -0,0 +1,141 @@
+# File: summary_cache.py
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+import unicodedata
+from pathlib import Path
+
+from cache import SQLiteBackend, CacheSweeper
+from config import (
+    MODEL_NAME,
+    SUMMARY_CACHE_TTL,
+    SUMMARY_CACHE_MAX_ENTRIES,
+    SUMMARY_CACHE_MAX_BYTES,
+    SUMMARY_CACHE_SWEEP_INTERVAL,
+)
+from summarizer import summarize_chunk, summarize_events
+
+logger = logging.getLogger("summary_cache")
+
+SUMMARY_CACHE_DIR = Path.home() / ".cache" / "cluj-ai" / "summaries"
+
+
+def normalize_content(text: str) -> str:
+    """Canonical form for hashing: NFC, whitespace runs collapsed, trimmed."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+def page_key(content: str, url: str, title: str) -> str:
+    """Content address of a whole page summary."""
+    return "page:" + _digest(MODEL_NAME, url, title, normalize_content(content))
+
+def chunk_key(chunk: str, title: str) -> str:
+    """Content address of one chunk's notes (independent of where the chunk sits)."""
+    return "chunk:" + _digest(MODEL_NAME, title, normalize_content(chunk))
+
+
+class SummaryCache:
+    """Persistent cache of page summaries and of the per-chunk notes behind them.
+
+    A reload of an unchanged page replays the stored summary; a page that
+    changed only in places reuses the notes of its unchanged chunks and
+    only sends the changed chunks to the LLM. SQLite reads and writes run
+    in a worker thread, off the event loop.
+    """
+
+    def __init__(self, backend: SQLiteBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self._sweeper = CacheSweeper(backend, SUMMARY_CACHE_SWEEP_INTERVAL)
+
+        self.page_hits = 0
+        self.page_misses = 0
+        self.chunk_hits = 0
+        self.chunk_misses = 0
+
+    @staticmethod
+    def _fresh(row) -> str | None:
+        if row is None:
+            return None
+        value, _, expires_at = row
+        return value if expires_at > time.time() else None
+
+    async def _get(self, key: str) -> str | None:
+        return self._fresh(await asyncio.to_thread(self.backend.get, key))
+
+    async def _put(self, key: str, value: str, label: str) -> None:
+        now = time.time()
+        await asyncio.to_thread(self.backend.put, key, value, now, now + self.ttl, label)
+        self._sweeper.start()
+
+    async def get_summary(self, key: str) -> str | None:
+        summary = await self._get(key)
+        if summary is None:
+            self.page_misses += 1
+        else:
+            self.page_hits += 1
+        return summary
+
+    async def get_summaries(self, keys: list[str]) -> dict[str, str | None]:
+        """get_summary for many pages with one batched query."""
+        rows = await asyncio.to_thread(self.backend.get_many, list(keys))
+        summaries = {key: self._fresh(rows.get(key)) for key in keys}
+        hits = sum(summary is not None for summary in summaries.values())
+        self.page_hits += hits
+        self.page_misses += len(summaries) - hits
+        return summaries
+
+    async def map_chunk(self, chunk: str, index: int, total: int, title: str) -> str:
+        """summarize_chunk, served from the cache when this chunk was seen before."""
+        key = chunk_key(chunk, title)
+        notes = await self._get(key)
+        if notes is not None:
+            self.chunk_hits += 1
+            return notes
+        self.chunk_misses += 1
+        notes = await summarize_chunk(chunk, index, total, title)
+        await self._put(key, notes, title)
+        return notes
+
+    async def summarize(self, key: str, content: str, url: str, title: str):
+        """summarize_events with chunk reuse; the finished summary is stored under key."""
+        tokens = []
+        async for payload in summarize_events(content, url, title, map_chunk=self.map_chunk):
+            if payload["type"] == "token":
+                tokens.append(payload["content"])
+            yield payload
+        if tokens:
+            await self._put(key, "".join(tokens), url)
+
+    def stats(self) -> dict:
+        return {
+            "page_hits": self.page_hits,
+            "page_misses": self.page_misses,
+            "chunk_hits": self.chunk_hits,
+            "chunk_misses": self.chunk_misses,
+            **self.backend.stats(),
+        }
+
+
+_cached_summary_cache = None
+
+def get_summary_cache() -> SummaryCache:
+    """Get the process-wide summary cache, creating it if needed."""
+    global _cached_summary_cache
+
+    if _cached_summary_cache is None:
+        SUMMARY_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        backend = SQLiteBackend(
+            SUMMARY_CACHE_DIR / "summaries.db", SUMMARY_CACHE_MAX_ENTRIES, SUMMARY_CACHE_MAX_BYTES
+        )
+        _cached_summary_cache = SummaryCache(backend, SUMMARY_CACHE_TTL)
+
+    return _cached_summary_cache
+
+__all__ = ['normalize_content', 'page_key', 'chunk_key', 'SummaryCache', 'get_summary_cache']
@@ -0,0 +1,6 @@
+# The server modules import each other as top-level modules (`from config
+# import ...`), the way uvicorn runs them from api_server/
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from admission import PRIORITY_CHAT, PRIORITY_SUMMARIZE, AdmissionController, QueueFull
+
+
+def test_admits_up_to_max_concurrent_then_queues():
+    controller = AdmissionController(max_concurrent=2, per_client=10, max_queue=10)
+    first = controller.enqueue("a")
+    second = controller.enqueue("b")
+    third = controller.enqueue("c")
+
+    assert first.granted and second.granted
+    assert not third.granted
+    assert controller.position(third) == 1
+
+    first.release()
+    assert third.granted
+
+
+def test_per_client_cap_lets_other_clients_overtake():
+    controller = AdmissionController(max_concurrent=2, per_client=1, max_queue=10)
+    controller.enqueue("a")
+    blocked = controller.enqueue("a")
+    other = controller.enqueue("b")
+
+    assert not blocked.granted
+    assert other.granted
+
+
+def test_better_priority_is_admitted_first():
+    controller = AdmissionController(max_concurrent=1, per_client=10, max_queue=10)
+    running = controller.enqueue("a")
+    summary = controller.enqueue("b", PRIORITY_SUMMARIZE)
+    chat = controller.enqueue("c", PRIORITY_CHAT)
+
+    running.release()
+    assert chat.granted
+    assert not summary.granted
+
+
+def test_full_queue_rejects_an_arrival_that_ranks_worst():
+    controller = AdmissionController(max_concurrent=1, per_client=10, max_queue=1)
+    controller.enqueue("a")
+    waiting = controller.enqueue("b", PRIORITY_CHAT)
+
+    with pytest.raises(QueueFull) as excinfo:
+        controller.enqueue("c", PRIORITY_SUMMARIZE)
+    assert excinfo.value.retry_after >= 1
+    assert waiting.displaced is None
+    assert controller.stats()["shed"] == 1
+
+
+def test_full_queue_displaces_the_worst_waiter_for_a_better_arrival():
+    controller = AdmissionController(max_concurrent=1, per_client=10, max_queue=1)
+    running = controller.enqueue("a")
+    summary = controller.enqueue("b", PRIORITY_SUMMARIZE)
+    chat = controller.enqueue("c", PRIORITY_CHAT)
+
+    assert isinstance(summary.displaced, QueueFull)
+    assert controller.stats()["waiting"] == 1
+
+    async def wait(ticket):
+        return [position async for position in ticket.wait()]
+
+    with pytest.raises(QueueFull):
+        asyncio.run(wait(summary))
+    summary.release()  # already out of the queue: a no-op
+
+    running.release()
+    assert chat.granted
+    assert controller.stats()["running"] == 1
+
+
+def test_releasing_a_queued_ticket_counts_as_abandoned():
+    controller = AdmissionController(max_concurrent=1, per_client=10, max_queue=10)
+    running = controller.enqueue("a")
+    queued = controller.enqueue("b")
+
+    queued.release()
+    running.release()
+    stats = controller.stats()
+    assert stats["abandoned"] == 1
+    assert stats["running"] == 0 and stats["waiting"] == 0
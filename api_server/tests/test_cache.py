@@ -0,0 +1,78 @@
+import json
+import time
+from datetime import datetime
+
+import pytest
+
+from cache import CacheBackend, SQLiteBackend, migrate_json_cache
+
+
+def write_entry(directory, key, **fields):
+    path = directory / f"{key}.json"
+    path.write_text(json.dumps(fields))
+    return path
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SQLiteBackend(tmp_path / "search.db", max_entries=100, max_bytes=1024 * 1024)
+    yield backend
+    backend.close()
+
+
+def test_migration_imports_fresh_entries_and_removes_their_files(tmp_path, backend):
+    now = datetime.now().isoformat()
+    path = write_entry(tmp_path, "fresh", timestamp=now, query="q", result="answer")
+
+    assert migrate_json_cache(tmp_path, backend, default_ttl=3600) == 1
+    value, _, expires_at = backend.get("fresh")
+    assert value == "answer"
+    assert expires_at > time.time()
+    assert not path.exists()
+
+
+def test_migration_drops_expired_entries(tmp_path, backend):
+    stored = datetime.fromtimestamp(time.time() - 7200).isoformat()
+    path = write_entry(tmp_path, "old", timestamp=stored, query="q", result="answer")
+
+    assert migrate_json_cache(tmp_path, backend, default_ttl=3600) == 0
+    assert backend.get("old") is None
+    assert not path.exists()
+
+
+def test_migration_skips_malformed_files_and_keeps_them(tmp_path, backend):
+    now = datetime.now().isoformat()
+    no_result = write_entry(tmp_path, "no-result", timestamp=now, query="q")
+    no_timestamp = write_entry(tmp_path, "no-timestamp", result="answer")
+    garbage = tmp_path / "garbage.json"
+    garbage.write_text("{not json")
+    not_a_dict = tmp_path / "list.json"
+    not_a_dict.write_text("[1, 2]")
+    write_entry(tmp_path, "good", timestamp=now, query="q", result="answer")
+
+    assert migrate_json_cache(tmp_path, backend, default_ttl=3600) == 1
+    assert backend.get("good")[0] == "answer"
+    for path in (no_result, no_timestamp, garbage, not_a_dict):
+        assert path.exists()
+
+
+def test_get_many_returns_only_readable_entries(backend):
+    now = time.time()
+    backend.put("a", "1", now, now + 60)
+    backend.put("b", "2", now, now + 60)
+    backend.put("expired", "3", now - 120, now - 60)
+
+    found = backend.get_many(["a", "b", "expired", "missing"])
+    assert {key: row[0] for key, row in found.items()} == {"a": "1", "b": "2"}
+
+
+def test_incomplete_backend_fails_at_construction():
+    class NoSweep(CacheBackend):
+        def get(self, key):
+            return None
+
+        def put(self, key, value, stored_at, expires_at, query=""):
+            pass
+
+    with pytest.raises(TypeError):
+        NoSweep()
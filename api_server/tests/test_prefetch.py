@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+import prefetch
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats(monkeypatch):
+    monkeypatch.setattr(prefetch, "_stats", prefetch.PrefetchStats())
+
+
+calls = []
+
+@prefetch.prefetchable("lookup_test", lambda query: query.strip().lower())
+async def lookup(query):
+    calls.append(query)
+    await asyncio.sleep(0)
+    if query == "fail":
+        raise RuntimeError("upstream down")
+    return f"result for {query}"
+
+
+def run_request(speculated, called):
+    """Speculate `speculated`, then make the model's call `called` (or none)."""
+    async def request():
+        calls.clear()
+        prefetch.start_request()
+        prefetch.speculate("lookup_test", {"query": speculated})
+        await asyncio.sleep(0.01)
+        try:
+            return await lookup(called) if called is not None else None
+        finally:
+            prefetch.finish_request()
+    return asyncio.run(request())
+
+
+def test_matching_call_is_served_from_the_prefetch():
+    assert run_request("Paris", " paris ") == "result for Paris"
+    assert calls == ["Paris"]
+    stats = prefetch.get_prefetch_stats()
+    assert (stats["started"], stats["hits"], stats["misses"], stats["unused"]) == (1, 1, 0, 0)
+    assert stats["hit_rate"] == 1.0
+
+
+def test_different_arguments_are_a_miss_and_run_the_real_call():
+    assert run_request("Paris", "Rome") == "result for Rome"
+    stats = prefetch.get_prefetch_stats()
+    assert (stats["hits"], stats["misses"]) == (0, 1)
+
+
+def test_prefetch_the_model_never_uses_is_unused():
+    run_request("Paris", None)
+    stats = prefetch.get_prefetch_stats()
+    assert (stats["hits"], stats["unused"]) == (0, 1)
+    assert stats["hit_rate"] == 0.0
+
+
+def test_failed_prefetch_is_an_error_not_a_hit():
+    with pytest.raises(RuntimeError):
+        run_request("fail", "fail")  # the real call runs again and fails too
+    assert calls == ["fail", "fail"]
+    stats = prefetch.get_prefetch_stats()
+    assert (stats["hits"], stats["errors"]) == (0, 1)
+    assert stats["hit_rate"] == 0.0
+
+
+def test_speculation_needs_a_request_and_a_prefetchable_tool():
+    async def outside_request():
+        prefetch._current.set(None)
+        return prefetch.speculate("lookup_test", {"query": "x"})
+
+    assert asyncio.run(outside_request()) is False
+
+    async def unknown_tool():
+        prefetch.start_request()
+        return prefetch.speculate("no_such_tool", {})
+
+    assert asyncio.run(unknown_tool()) is False
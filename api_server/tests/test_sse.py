@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from sse import StreamStats, coalesce_tokens
+
+
+def token(text):
+    return {"type": "token", "content": text}
+
+
+async def source(*items, delay=0.0):
+    for item in items:
+        if isinstance(item, Exception):
+            raise item
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+async def collect(payloads, **kwargs):
+    out = []
+    async for payload in coalesce_tokens(payloads, **kwargs):
+        out.append(payload)
+    return out
+
+
+def test_first_token_is_sent_alone_and_the_rest_merged():
+    stats = StreamStats()
+    out = asyncio.run(collect(source(token("a"), token("b"), token("c"), token("d")),
+                              window=10, max_bytes=1000, stats=stats))
+    assert out == [token("a"), token("bcd")]
+    assert stats.frames_saved == 2
+
+
+def test_other_payloads_flush_and_keep_order():
+    tool = {"type": "tool_start", "name": "search_tool"}
+    out = asyncio.run(collect(source(token("a"), token("b"), token("c"), tool, token("d"), token("e")),
+                              window=10, max_bytes=1000))
+    # The first token after a tool event goes out at once again
+    assert out == [token("a"), token("bc"), tool, token("d"), token("e")]
+
+
+def test_max_bytes_flushes_early():
+    out = asyncio.run(collect(source(token("a"), token("bb"), token("cc"), token("d")),
+                              window=10, max_bytes=4))
+    assert out == [token("a"), token("bbcc"), token("d")]
+
+
+def test_window_flushes_a_quiet_buffer():
+    out = asyncio.run(collect(source(token("a"), token("b"), token("c"), delay=0.05),
+                              window=0.01, max_bytes=1000))
+    assert "".join(payload["content"] for payload in out) == "abc"
+    assert len(out) == 3
+
+
+def test_buffered_tokens_reach_the_client_before_an_error():
+    async def run():
+        out = []
+        with pytest.raises(RuntimeError):
+            async for payload in coalesce_tokens(source(token("a"), token("b"), RuntimeError("boom")),
+                                                 window=10, max_bytes=1000):
+                out.append(payload)
+        return out
+
+    assert asyncio.run(run()) == [token("a"), token("b")]
@@ -6,12 +6,42 @@ from functools import lru_cache
 import hashlib
 from pathlib import Path
 # import yt_dlp # Use the yt-dlp library directly for robust searching
-from langchain.agents import tool
-from langchain_community.utilities import GoogleSerperAPIWrapper
 import asyncio 
+import contextvars
+import threading
+import time
 
 from config import MPV_PATH # Only mpv path is needed now
-import requests
+from config import SEARCH_MEMORY_CACHE_ENTRIES, SEARCH_MEMORY_CACHE_BYTES
+from config import (
+    SEARCH_CACHE_BACKEND,
+    SEARCH_CACHE_MAX_ENTRIES,
+    SEARCH_CACHE_MAX_BYTES,
+    SEARCH_CACHE_SWEEP_INTERVAL,
+    SEARCH_STALE_GRACE,
+    SEARCH_NEWS_TTL,
+    SEARCH_NEGATIVE_TTL,
+    SEARCH_FANOUT,
+    SEARCH_FANOUT_DEADLINE,
+    SEARCH_FANOUT_RESULTS,
+    SEARCH_SNIPPET_CHARS,
+    SEARXNG_URL,
+)
+from cache import (
+    MemoryCache,
+    CacheBackend,
+    JsonFileBackend,
+    SQLiteBackend,
+    migrate_json_cache,
+    CacheSweeper,
+)
+import httpx
+import random
+from http_client import get_async_client, get_sync_client
+from singleflight import SingleFlight
+from router import RoutingRule, ToolRouter
+from metrics import timed_tool
+from prefetch import prefetchable
 
 import json
 import hashlib
@@ -23,10 +53,57 @@ from typing import Dict, Callable
 
 # Cache configuration - add this at the top of your tools.py
 CACHE_DIR = Path.home() / ".cache" / "cluj-ai" / "search"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
 CACHE_DURATION = timedelta(hours=1)
 debug = True  # Make sure debug is defined
 
+# Hot tier in front of the disk cache - hits never touch the filesystem
+_memory_cache = MemoryCache(
+    max_entries=SEARCH_MEMORY_CACHE_ENTRIES,
+    max_bytes=SEARCH_MEMORY_CACHE_BYTES,
+    stale_grace=SEARCH_STALE_GRACE,
+)
+_disk_hits = 0
+_disk_misses = 0
+
+def _build_disk_cache() -> CacheBackend:
+    """Open the configured persistent backend, importing legacy .json entries once."""
+    ttl = CACHE_DURATION.total_seconds()
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    if SEARCH_CACHE_BACKEND == "json":
+        return JsonFileBackend(CACHE_DIR, ttl, SEARCH_CACHE_MAX_ENTRIES, SEARCH_STALE_GRACE)
+
+    backend = SQLiteBackend(
+        CACHE_DIR / "search.db", SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_MAX_BYTES, SEARCH_STALE_GRACE
+    )
+    migrated = migrate_json_cache(CACHE_DIR, backend, ttl)
+    if migrated and debug:
+        print(f"🔍 Migrated {migrated} cached searches into {backend.path}")
+    return backend
+
+# Opened on first lookup, so importing the tools costs no disk I/O
+_disk_cache = None
+_cache_sweeper = None
+_disk_cache_lock = threading.Lock()
+
+def get_disk_cache() -> CacheBackend:
+    """The persistent search cache tier, opened on first use."""
+    global _disk_cache, _cache_sweeper
+
+    if _disk_cache is None:
+        with _disk_cache_lock:
+            if _disk_cache is None:
+                backend = _build_disk_cache()
+                _cache_sweeper = CacheSweeper(backend, SEARCH_CACHE_SWEEP_INTERVAL)
+                _disk_cache = backend
+    return _disk_cache
+
+_search_flight = SingleFlight("search")
+_background_refreshes = set()  # strong refs so refresh tasks are not GC'd mid-flight
+_refreshing_keys = set()  # queries being refreshed by sync-path threads
+_stale_served = 0
+_negative_stored = 0
+_fanout_stats = {"searches": 0, "variants": 0, "timed_out": 0, "failed": 0, "merged_duplicates": 0}
+
 def normalize_query(query: str) -> str:
     """Normalize query for better cache matching."""
     query = query.lower().strip()
@@ -43,50 +120,99 @@ def get_cache_file(query: str) -> Path:
     cache_key = get_cache_key(query)
     return CACHE_DIR / f"{cache_key}.json"
 
+def lookup_cached_result(query: str) -> tuple[str, bool] | None:
+    """Return (result, is_stale) from memory or disk, or None on a miss.
+
+    Entries past their TTL are still returned (flagged stale) for
+    SEARCH_STALE_GRACE seconds so callers can serve them while refreshing.
+    """
+    global _disk_hits, _disk_misses
+
+    cache_key = get_cache_key(query)
+    entry = _memory_cache.get(cache_key)
+    if entry is not None:
+        result, expires_at = entry
+        return result, time.time() >= expires_at
+
+    try:
+        entry = get_disk_cache().get(cache_key)
+    except Exception as e:
+        if debug:
+            print(f"🔍 Cache read error: {e}")
+        entry = None
+
+    if entry is None:
+        _disk_misses += 1
+        return None
+
+    result, stored_at, expires_at = entry
+    if debug:
+        print(f"🔍 Cache HIT for: '{query}'")
+    _disk_hits += 1
+    # Backfill the hot tier, keeping the entry's original expiry
+    _memory_cache.put(cache_key, result, expires_at)
+    return result, time.time() >= expires_at
+
 def get_cached_result(query: str) -> str | None:
-    """Get cached result if available and valid."""
-    cache_file = get_cache_file(query)
-    if cache_file.exists():
-        try:
-            cache_data = json.loads(cache_file.read_text())
-            cached_time = datetime.fromisoformat(cache_data['timestamp'])
-            if datetime.now() - cached_time < CACHE_DURATION:
-                if debug:
-                    print(f"🔍 Cache HIT for: '{query}'")
-                return cache_data['result']
-        except Exception as e:
-            if debug:
-                print(f"🔍 Cache read error: {e}")
-    return None
-
-# Pre-defined tool routing - bypasses agent decision making
-TOOL_ROUTING_RULES = {
+    """Get cached result if available and still fresh."""
+    entry = lookup_cached_result(query)
+    if entry is None or entry[1]:
+        return None
+    return entry[0]
+
+def get_search_cache_stats() -> dict:
+    """Hit/miss/eviction counters for both search cache tiers."""
+    return {
+        "memory": _memory_cache.stats(),
+        "disk": {"hits": _disk_hits, "misses": _disk_misses, **get_disk_cache().stats()},
+        "singleflight": _search_flight.stats(),
+        "stale_served": _stale_served,
+        "negative_stored": _negative_stored,
+        "refreshing": len(_background_refreshes) + len(_refreshing_keys),
+        "fanout": dict(_fanout_stats, enabled=SEARCH_FANOUT),
+    }
+
+# Time-sensitive queries - routed to search and cached for a shorter time
+NEWS_QUERY_PATTERN = r'(news|current|latest|recent|update|happened)'
+
+# Pre-defined tool routing - bypasses agent decision making.
+# Higher priority wins; specific tools outrank the generic search rules so
+# "what is the weather in paris?" goes to weather_tool, not search_tool.
+TOOL_ROUTING_RULES = [
     # Search patterns
-    r'(who|what|when|where|why|how).*\?': 'search_tool',
-    r'(news|current|latest|recent|update|happened)': 'search_tool',
-    r'(president|prime minister|ceo|leader)': 'search_tool',
-    r'(capital|population|weather|temperature)': 'search_tool',
-    r'search for|look up|find.*about': 'search_tool',
-    
+    RoutingRule("question", r'(who|what|when|where|why|how).*\?', 'search_tool', 10,
+                ("who", "what", "when", "where", "why", "how")),
+    RoutingRule("news", NEWS_QUERY_PATTERN, 'search_tool', 10,
+                ("news", "current", "latest", "recent", "update", "happened")),
+    RoutingRule("office", r'(president|prime minister|ceo|leader)', 'search_tool', 10,
+                ("president", "prime minister", "ceo", "leader")),
+    RoutingRule("facts", r'(capital|population)', 'search_tool', 10,
+                ("capital", "population")),
+    RoutingRule("lookup", r'search for|look up|find.*about', 'search_tool', 10,
+                ("search for", "look up", "find")),
+
     # Weather patterns
-    r'weather|temperature|forecast|raining|snowing': 'weather_tool',
-    
-    # Joke patterns  
-    r'joke|funny|humor|dad joke': 'dad_joke_tool',
-    
+    RoutingRule("weather", r'weather|temperature|forecast|raining|snowing', 'weather_tool', 20,
+                ("weather", "temperature", "forecast", "raining", "snowing")),
+
+    # Joke patterns
+    RoutingRule("joke", r'joke|funny|humor|dad joke', 'dad_joke_tool', 20,
+                ("joke", "funny", "humor")),
+
     # Command patterns
-    r'run |execute |command |terminal |shell ': 'terminal_tool',
-}
+    RoutingRule("command", r'run |execute |command |terminal |shell ', 'terminal_tool', 5,
+                ("run ", "execute ", "command ", "terminal ", "shell ")),
+]
+
+_router = ToolRouter(TOOL_ROUTING_RULES)
 
 def route_to_tool_directly(query: str) -> str | None:
     """Fast tool routing without agent decision making."""
-    query_lower = query.lower().strip()
-    
-    for pattern, tool_name in TOOL_ROUTING_RULES.items():
-        if re.search(pattern, query_lower):
-            return tool_name
-    
-    return None
+    return _router.route(query)
+
+def get_router_stats() -> dict:
+    return _router.stats()
+
 def clean_search_query(raw_query: str) -> str:
     """Clean up repetitive model output for search queries."""
     if not raw_query:
@@ -110,56 +236,216 @@ def clean_search_query(raw_query: str) -> str:
     
     return ' '.join(words).strip()
 
-@tool
-def summarize_webpage_tool(content: str) -> str:
+def _summarize_webpage(content: str) -> str:
     """Summarize webpage content. Input should be the full text content of a webpage."""
     # This tool receives the content from the extension
     # The LLM will automatically summarize it based on the system prompt
     return f"Content to summarize (length: {len(content)} chars): {content[:2000]}..."
 
-@tool
-def search_tool(query: str) -> str:
+
+def format_result_list(results: list, limit: int = 3, snippet_chars: int = 100) -> str:
+    """Format SearXNG result dicts into the compact text block the agent reads."""
+    if not results:
+        return "No results found."
+
+    output = ["--- SEARCH RESULTS ---"]
+    for i, result in enumerate(results[:limit]):
+        title = result.get('title', 'No Title')
+        url = result.get('url', '#')
+        content = result.get('content', '')[:snippet_chars]
+        output.append(f"{i+1}. {title}\n   URL: {url}\n   Snippet: {content}")
+    return "\n".join(output) + "\n--- END ---"
+
+def format_search_results(data: dict) -> str:
+    """Format a SearXNG JSON response into the compact text block the agent reads."""
+    return format_result_list(data.get("results", []))
+
+# Words that only dilute a keyword query
+QUERY_STOPWORDS = frozenset("""
+a an and are about at be can could did do does for from give how i in is it me my of on or
+please search find look up show tell the this to was what when where which who why will with
+you your
+""".split())
+
+def keyword_query(query: str) -> str:
+    """Keyword-only form of a query: question words and filler dropped."""
+    words = re.findall(r"[\w'.+#-]+", query.lower())
+    keywords = [word for word in words if word not in QUERY_STOPWORDS]
+    return " ".join(keywords)
+
+def search_variants(query: str) -> list[str]:
+    """Distinct query variants to fan out: original, cleaned, keyword-only."""
+    cleaned = clean_search_query(query)
+    # Search results fed back as a query are only usable in cleaned form
+    original = "" if "--- SEARCH RESULTS ---" in query or "URL: http" in query else re.sub(r'\s+', ' ', query).strip()
+    variants = []
+    for variant in (original, cleaned, keyword_query(cleaned)):
+        if variant and normalize_query(variant) not in map(normalize_query, variants):
+            variants.append(variant)
+    return variants
+
+def result_identity(url: str) -> str:
+    """URL key for dedup: scheme, "www.", fragment and trailing slash ignored."""
+    url = url.split("#", 1)[0].rstrip("/").lower()
+    return re.sub(r"^https?://(www\.)?", "", url)
+
+def fuse_results(result_lists: list[list], k: int = 60) -> list:
+    """Merge ranked result lists by reciprocal-rank fusion, one entry per URL.
+
+    A page's score is the sum of 1 / (k + rank) over the lists it appears
+    in, so results several variants agree on rise to the top. Each merged
+    entry keeps the longest snippet any variant returned.
+    """
+    scores, merged = {}, {}
+    for results in result_lists:
+        for rank, result in enumerate(results):
+            key = result_identity(result.get("url", ""))
+            if not key:
+                continue
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            if key not in merged:
+                merged[key] = result
+            else:
+                _fanout_stats["merged_duplicates"] += 1
+                if len(result.get("content", "")) > len(merged[key].get("content", "")):
+                    merged[key] = {**merged[key], "content": result["content"]}
+    return [merged[key] for key in sorted(merged, key=scores.get, reverse=True)]
+
+async def _searxng_results(query: str) -> list:
+    response = await get_async_client().get(
+        SEARXNG_URL,
+        params={'q': query, 'format': 'json', 'language': 'en'},
+        timeout=SEARCH_FANOUT_DEADLINE
+    )
+    return response.json().get("results", [])
+
+async def _fetch_fanout(query: str, cache_query: str) -> str:
+    """Search all variants of query concurrently and cache the merged block under cache_query.
+
+    Variants share one deadline; whatever has arrived by then is merged,
+    so a slow or failing variant costs nothing but its results.
+    """
+    variants = search_variants(query)
+    _fanout_stats["searches"] += 1
+    _fanout_stats["variants"] += len(variants)
+
+    tasks = [asyncio.ensure_future(_searxng_results(variant)) for variant in variants]
+    done, pending = await asyncio.wait(tasks, timeout=SEARCH_FANOUT_DEADLINE)
+    for task in pending:
+        task.cancel()
+    _fanout_stats["timed_out"] += len(pending)
+
+    result_lists, errors = [], []
+    for task in tasks:  # variant order, so ties favour the original query
+        if task not in done:
+            continue
+        if task.exception() is not None:
+            errors.append(task.exception())
+            continue
+        result_lists.append(task.result())
+    _fanout_stats["failed"] += len(errors)
+
+    if result_lists:
+        result_text = format_result_list(fuse_results(result_lists), SEARCH_FANOUT_RESULTS, SEARCH_SNIPPET_CHARS)
+    elif errors:
+        result_text = f"Search error: {errors[0]}"
+    else:
+        result_text = f"Search error: no response within {SEARCH_FANOUT_DEADLINE:g}s"
+
+    store_search_result(cache_query, result_text)
+    return result_text
+
+def _refresh_search(query: str) -> str:
+    """Hit SearXNG synchronously and cache the formatted result."""
+    try:
+        response = get_sync_client().get(
+            SEARXNG_URL,
+            params={'q': query, 'format': 'json', 'language': 'en'},
+            timeout=8
+        )
+        result_text = format_search_results(response.json())
+    except Exception as e:
+        result_text = f"Search error: {e}"
+
+    store_search_result(query, result_text)
+    return result_text
+
+def _search(query: str) -> str:
     """Search the web with caching. FAST VERSION."""
+    global _stale_served
+
     # CLEAN THE QUERY FIRST - prevent search result feedback loops
     query = clean_search_query(query)
-    
+
     # Ultra-fast cache check
-    cache_file = get_cache_file(query)
-    if cache_file.exists():
-        try:
-            cache_data = json.loads(cache_file.read_text())
-            cached_time = datetime.fromisoformat(cache_data['timestamp'])
-            if datetime.now() - cached_time < CACHE_DURATION:
-                return cache_data['result']
-        except:
-            pass
+    entry = lookup_cached_result(query)
+    if entry is not None:
+        result, stale = entry
+        if not stale:
+            return result
+        if not is_negative_result(result):
+            # Serve stale now, revalidate in the background
+            _stale_served += 1
+            key = normalize_query(query)
+            if key not in _refreshing_keys:
+                _refreshing_keys.add(key)
+                def refresh():
+                    try:
+                        _refresh_search(query)
+                    finally:
+                        _refreshing_keys.discard(key)
+                threading.Thread(target=refresh, daemon=True).start()
+            return result
+
+    return _refresh_search(query)
 
+async def _fetch_search(query: str) -> str:
+    """Hit SearXNG and cache the formatted result."""
     try:
-        response = requests.get(
-            "http://localhost:3000/search",
+        response = await get_async_client().get(
+            SEARXNG_URL,
             params={'q': query, 'format': 'json', 'language': 'en'},
             timeout=8
         )
-        data = response.json()
-        results = data.get("results", [])
-        
-        if not results:
-            result_text = "No results found."
-        else:
-            output = ["--- SEARCH RESULTS ---"]
-            for i, result in enumerate(results[:3]):
-                title = result.get('title', 'No Title')
-                url = result.get('url', '#')
-                content = result.get('content', '')[:100]
-                output.append(f"{i+1}. {title}\n   URL: {url}\n   Snippet: {content}")
-            result_text = "\n".join(output) + "\n--- END ---"
-        
-        # Cache the result
-        save_to_cache_fast(query, result_text)
-        return result_text
-        
+        result_text = format_search_results(response.json())
     except Exception as e:
-        return f"Search error: {e}"
+        result_text = f"Search error: {e}"
+
+    store_search_result(query, result_text)
+    return result_text
+
+async def _asearch(query: str) -> str:
+    """Async twin of _search - waits on SearXNG without blocking the event loop.
+
+    With SEARCH_FANOUT, misses search several variants of the query at once
+    (see _fetch_fanout); results are cached under the cleaned query either way.
+    """
+    global _stale_served
+
+    raw_query = query
+    query = clean_search_query(query)
+    key = normalize_query(query)
+    if SEARCH_FANOUT:
+        fetch = lambda: _fetch_fanout(raw_query, query)
+    else:
+        fetch = lambda: _fetch_search(query)
+
+    entry = lookup_cached_result(query)
+    if entry is not None:
+        result, stale = entry
+        if not stale:
+            return result
+        if not is_negative_result(result):
+            # Serve stale now; single-flight keeps it to one refresh per query
+            _stale_served += 1
+            task = asyncio.ensure_future(_search_flight.do(key, fetch))
+            _background_refreshes.add(task)
+            task.add_done_callback(_background_refreshes.discard)
+            return result
+
+    # Identical concurrent misses share a single SearXNG request
+    return await _search_flight.do(key, fetch)
+
 
 def clean_search_query(raw_query: str) -> str:
     """Clean search queries to prevent feedback loops."""
@@ -179,30 +465,72 @@ def clean_search_query(raw_query: str) -> str:
     words = query.split()[:8]  # Limit to 8 words max
     return ' '.join(words)
 
-def save_to_cache_fast(query: str, result: str):
-    """Fast cache saving without pretty printing."""
-    cache_file = get_cache_file(query)
-    cache_data = {
-        'timestamp': datetime.now().isoformat(),
-        'query': query,
-        'result': result
-    }
-    cache_file.write_text(json.dumps(cache_data))  # No indent for speed
+def is_negative_result(result: str) -> bool:
+    """Errors and empty result sets - cached only briefly."""
+    return result.startswith("Search error:") or result == "No results found."
 
+_news_query_re = re.compile(NEWS_QUERY_PATTERN)
 
-@tool
-def terminal_tool(command: str) -> str:
-    """Execute shell command. Safe input and confirmation required."""
+def search_ttl(query: str, result: str) -> float:
+    """Per-entry TTL in seconds, by result kind and query class."""
+    if is_negative_result(result):
+        return SEARCH_NEGATIVE_TTL
+    if _news_query_re.search(normalize_query(query)):
+        return SEARCH_NEWS_TTL
+    return CACHE_DURATION.total_seconds()
+
+def store_search_result(query: str, result: str):
+    """Cache a fresh SearXNG answer, without letting a failure clobber a usable stale entry."""
+    global _negative_stored
+
+    if is_negative_result(result):
+        entry = lookup_cached_result(query)
+        if entry is not None and not is_negative_result(entry[0]):
+            return
+        _negative_stored += 1
+    save_to_cache_fast(query, result, search_ttl(query, result))
+
+def save_to_cache_fast(query: str, result: str, ttl: float | None = None):
+    """Write-through save to both cache tiers."""
+    cache_key = get_cache_key(query)
+    now = datetime.now().timestamp()
+    expires_at = now + (ttl if ttl is not None else CACHE_DURATION.total_seconds())
+    _memory_cache.put(cache_key, result, expires_at)
+    try:
+        get_disk_cache().put(cache_key, result, now, expires_at, query)
+    except Exception as e:
+        if debug:
+            print(f"🔍 Cache write error: {e}")
+    # Expired entries are removed in bulk off the request path
+    if _cache_sweeper is not None:
+        _cache_sweeper.start()
+
+
+def _resolve_command(command: str) -> tuple[list[str], str]:
+    """Split the command and swap a bare mpv for the configured binary."""
     cleaned_command = command.strip()
     parts = cleaned_command.split()
     if parts and parts[0] == "mpv":
         cmd = f"{MPV_PATH} {' '.join(parts[1:])}"
     else:
         cmd = cleaned_command
+    return parts, cmd
+
+# Set per client by the CLI daemon: how to ask for confirmation (an async
+# callable taking the command) and the directory to run commands in
+confirm_command_callback = contextvars.ContextVar("confirm_command_callback", default=None)
+command_cwd = contextvars.ContextVar("command_cwd", default=None)
 
+def _confirm_command(cmd: str) -> bool:
     print(f"\033[93mProposed command: `\033[1m{cmd}\033[0m\033[93m`\033[0m")
     confirmation = input("Execute? [y/N]: ").strip().lower()
-    if confirmation not in ['y', 'yes']:
+    return confirmation in ['y', 'yes']
+
+def _terminal(command: str) -> str:
+    """Execute shell command. Safe input and confirmation required."""
+    parts, cmd = _resolve_command(command)
+
+    if not _confirm_command(cmd):
         return "Command cancelled by user."
 
     if not shutil.which(parts[0] if parts else ""):
@@ -218,71 +546,129 @@ def terminal_tool(command: str) -> str:
     except Exception as e:
         return f"❌ Error: {e}"
 
+async def _aterminal(command: str) -> str:
+    """Async twin of _terminal - the prompt and the child process never block the loop."""
+    parts, cmd = _resolve_command(command)
+
+    confirm = confirm_command_callback.get()
+    confirmed = await confirm(cmd) if confirm is not None else await asyncio.to_thread(_confirm_command, cmd)
+    if not confirmed:
+        return "Command cancelled by user."
+    cwd = command_cwd.get()
+
+    if not shutil.which(parts[0] if parts else ""):
+        return f"Error: Command '{parts[0]}' not found in PATH."
 
-@tool
-def weather_tool(location: str) -> str:
-    """Get weather information using wttr.in."""
-    if (debug):
-        print(f"🌤️ DEBUG: Weather tool called with location: '{location}'")
-    
     try:
-        location = location.strip()
-        if not location:
-            return "Error: No location provided."
-            
-        if (debug):
-            print(f"🌤️ DEBUG: Making weather request for: {location}")
-        
-        # Use requests instead of curl
-        url = f"http://wttr.in/{location}"
-        params = {
-            'format': '%l: %c %t %w %h',  # Location: Condition Temperature Wind Humidity
-        }
-        
-        if (debug):
-            print(f"🌤️ DEBUG: Request URL: {url}")
-        
-        response = requests.get(url, params=params, timeout=10)
+        if parts[0] in ['mpv', 'xdg-open']:
+            await asyncio.create_subprocess_shell(
+                cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL, cwd=cwd
+            )
+            return f"Started '{parts[0]}' in background."
+
+        process = await asyncio.create_subprocess_shell(
+            cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, cwd=cwd
+        )
+        stdout, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+        return f"✅ Output:\n{stdout.decode(errors='replace')}\n❌ Errors:\n{stderr.decode(errors='replace')}"
+    except Exception as e:
+        return f"❌ Error: {e}"
+
+
+
+WEATHER_URL = "http://wttr.in/{location}"
+WEATHER_PARAMS = {
+    'format': '%l: %c %t %w %h',  # Location: Condition Temperature Wind Humidity
+}
+
+def _weather_text(location: str, response: httpx.Response) -> str:
+    """Turn a wttr.in response into the tool result."""
+    if (debug):
+        print(f"🌤️ DEBUG: Response status: {response.status_code}")
+
+    if response.status_code == 200:
+        weather_data = response.text.strip()
         if (debug):
-            print(f"🌤️ DEBUG: Response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            weather_data = response.text.strip()
-            if (debug):
-                print(f"🌤️ DEBUG: Raw weather data: '{weather_data}'")
-            
-            if weather_data and "unknown location" not in weather_data.lower():
-                return weather_data
-            else:
-                return f"Could not find weather for: {location}"
+            print(f"🌤️ DEBUG: Raw weather data: '{weather_data}'")
+
+        if weather_data and "unknown location" not in weather_data.lower():
+            return weather_data
         else:
-            return f"Weather service error: HTTP {response.status_code}"
-            
-    except requests.exceptions.Timeout:
+            return f"Could not find weather for: {location}"
+    else:
+        return f"Weather service error: HTTP {response.status_code}"
+
+def _weather_error(e: Exception) -> str:
+    if isinstance(e, httpx.TimeoutException):
         if (debug):
             print("🌤️ DEBUG: Weather request timed out")
         return "Error: Weather service timed out."
-    except requests.exceptions.ConnectionError:
+    if isinstance(e, httpx.ConnectError):
         if (debug):
             print("🌤️ DEBUG: Cannot connect to weather service")
         return "Error: Cannot connect to weather service. Check network connectivity."
+    if (debug):
+        print(f"🌤️ DEBUG: Weather tool exception: {e}")
+    return f"Error fetching weather: {e}"
+
+def _weather(location: str) -> str:
+    """Get weather information using wttr.in."""
+    if (debug):
+        print(f"🌤️ DEBUG: Weather tool called with location: '{location}'")
+
+    try:
+        location = location.strip()
+        if not location:
+            return "Error: No location provided."
+
+        url = WEATHER_URL.format(location=location)
+        if (debug):
+            print(f"🌤️ DEBUG: Request URL: {url}")
+
+        response = get_sync_client().get(url, params=WEATHER_PARAMS, timeout=10)
+        return _weather_text(location, response)
     except Exception as e:
+        return _weather_error(e)
+
+async def _aweather(location: str) -> str:
+    """Async twin of _weather."""
+    if (debug):
+        print(f"🌤️ DEBUG: Weather tool called with location: '{location}'")
+
+    try:
+        location = location.strip()
+        if not location:
+            return "Error: No location provided."
+
+        url = WEATHER_URL.format(location=location)
         if (debug):
-            print(f"🌤️ DEBUG: Weather tool exception: {e}")
-        return f"Error fetching weather: {e}"
+            print(f"🌤️ DEBUG: Request URL: {url}")
+
+        response = await get_async_client().get(url, params=WEATHER_PARAMS, timeout=10)
+        return _weather_text(location, response)
+    except Exception as e:
+        return _weather_error(e)
+
+
+
+DAD_JOKE_URL = "https://icanhazdadjoke.com/"
+DAD_JOKE_HEADERS = {"Accept": "text/plain", "User-Agent": "Cluj-AI Assistant"}
 
-@tool
-def dad_joke_tool(query: str = "") -> str:
+def _dad_joke_params() -> dict:
+    # Random param defeats any intermediate caching so every call gets a new joke
+    return {f"_{random.randint(1, 100000)}": ""}
+
+def _dad_joke(query: str = "") -> str:
     """Get a random dad joke."""
     print("😄 Fetching dad joke...")
     try:
-        import random
-        random_param = random.randint(1, 100000)
-        cmd = f'curl -s -H "Accept: text/plain" -H "User-Agent: Cluj-AI Assistant" "https://icanhazdadjoke.com/?_{random_param}"'
-        result = subprocess.run(
-            cmd, shell=True, check=True, capture_output=True, text=True, timeout=10
+        response = get_sync_client().get(
+            DAD_JOKE_URL, params=_dad_joke_params(), headers=DAD_JOKE_HEADERS, timeout=10
         )
-        joke_text = result.stdout.strip()
+        response.raise_for_status()
+        joke_text = response.text.strip()
         if not joke_text:
             return "Could not fetch a joke at this time."
         # Return ONLY the joke - no formatting
@@ -290,9 +676,24 @@ def dad_joke_tool(query: str = "") -> str:
     except Exception as e:
         return f"Error fetching joke: {e}"
 
+async def _adad_joke(query: str = "") -> str:
+    """Async twin of _dad_joke."""
+    print("😄 Fetching dad joke...")
+    try:
+        response = await get_async_client().get(
+            DAD_JOKE_URL, params=_dad_joke_params(), headers=DAD_JOKE_HEADERS, timeout=10
+        )
+        response.raise_for_status()
+        joke_text = response.text.strip()
+        if not joke_text:
+            return "Could not fetch a joke at this time."
+        return joke_text
+    except Exception as e:
+        return f"Error fetching joke: {e}"
+
+
 
-@tool
-def ascii_art_tool(art_name: str) -> str:
+def _ascii_art(art_name: str) -> str:
     """Fetch ASCII art from reliable sources."""
     art_name = art_name.strip().lower()
     
@@ -313,12 +714,67 @@ def ascii_art_tool(art_name: str) -> str:
         return get_static_ascii_art(art_name)
 
 
-# --- All available tools for the agent ---
-ALL_TOOLS = [
-    search_tool,
-    terminal_tool,
-    weather_tool,
-    dad_joke_tool,
-]
+# Error strings the tools return instead of raising
+TOOL_ERROR_PREFIXES = ("Error", "❌ Error", "Search error:", "Weather service error")
+
+def is_error_output(output) -> bool:
+    return isinstance(output, str) and output.startswith(TOOL_ERROR_PREFIXES)
+
+
+# --- LangChain tool objects, built on first access ---
+# `import tools` stays free of LangChain: routing, the search cache and the
+# plain functions above are usable on their own, and `from tools import
+# search_tool` (or ALL_TOOLS) builds every tool once, when the agent needs them.
+_LAZY_TOOLS = {"search_tool", "terminal_tool", "weather_tool", "dad_joke_tool",
+               "summarize_webpage_tool", "ascii_art_tool", "ALL_TOOLS"}
+_tools_lock = threading.Lock()
+
+def _build_tools() -> dict:
+    from langchain_core.tools import StructuredTool
+
+    search_tool = StructuredTool.from_function(func=_search, coroutine=_asearch, name="search_tool")
+    terminal_tool = StructuredTool.from_function(func=_terminal, coroutine=_aterminal, name="terminal_tool")
+    weather_tool = StructuredTool.from_function(func=_weather, coroutine=_aweather, name="weather_tool")
+    dad_joke_tool = StructuredTool.from_function(func=_dad_joke, coroutine=_adad_joke, name="dad_joke_tool")
 
+    # --- All available tools for the agent ---
+    all_tools = [
+        search_tool,
+        terminal_tool,
+        weather_tool,
+        dad_joke_tool,
+    ]
+
+    # Per-tool latency and error metrics, for both the sync and async entry points
+    for _tool in all_tools:
+        _tool.func = timed_tool(_tool.name, is_error_output)(_tool.func)
+        _tool.coroutine = timed_tool(_tool.name, is_error_output)(_tool.coroutine)
+
+    # Speculative calls (prefetch.speculate) are served to the model's own call
+    # when the arguments match: same search keywords, same weather location
+    search_tool.coroutine = prefetchable(
+        "search_tool", lambda query: frozenset(keyword_query(clean_search_query(query)).split())
+    )(search_tool.coroutine)
+    weather_tool.coroutine = prefetchable(
+        "weather_tool", lambda location: location.strip().lower()
+    )(weather_tool.coroutine)
+
+    return {
+        "search_tool": search_tool,
+        "terminal_tool": terminal_tool,
+        "weather_tool": weather_tool,
+        "dad_joke_tool": dad_joke_tool,
+        "summarize_webpage_tool": StructuredTool.from_function(
+            func=_summarize_webpage, name="summarize_webpage_tool"
+        ),
+        "ascii_art_tool": StructuredTool.from_function(func=_ascii_art, name="ascii_art_tool"),
+        "ALL_TOOLS": all_tools,
+    }
 
+def __getattr__(name: str):
+    if name not in _LAZY_TOOLS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _tools_lock:  # the CLI may build the agent from a warm-up thread
+        if "ALL_TOOLS" not in globals():
+            globals().update(_build_tools())
+    return globals()[name]
@@ -18,6 +18,15 @@ check_port() {
     netstat -tuln 2>/dev/null | grep ":$1 " > /dev/null
 }
 
+# Number of llama-server instances to run (ports 8080, 8081, ...); the API
+# server balances requests across all of them
+LLAMA_INSTANCES="${LLAMA_INSTANCES:-1}"
+LLM_BACKENDS=""
+for i in $(seq 0 $((LLAMA_INSTANCES - 1))); do
+    LLM_BACKENDS="$LLM_BACKENDS${LLM_BACKENDS:+,}http://localhost:$((8080 + i))"
+done
+export LLM_BACKENDS
+
 # Simple PID tracking
 PIDS=""
 PID_FILE="$SCRIPT_DIR/.service_pids"
@@ -57,13 +66,15 @@ if [ -f "llama.cpp/build/bin/llama-server" ]; then
     if [ -n "$MODEL_FILE" ]; then
         echo "Using model: $MODEL_FILE"
         
-        # Start llama server with absolute path to model
+        # Start llama server(s) with absolute path to model
         cd "$SCRIPT_DIR/llama.cpp/build/bin"
-        ./llama-server --model "$MODEL_FILE" -ngl 99 --host 0.0.0.0 -c 16000 --port 8080 --jinja &
-        LLAMA_PID=$!
-        PIDS="$PIDS $LLAMA_PID"
+        for i in $(seq 0 $((LLAMA_INSTANCES - 1))); do
+            ./llama-server --model "$MODEL_FILE" -ngl 99 --host 0.0.0.0 -c 16000 --port $((8080 + i)) --jinja &
+            LLAMA_PID=$!
+            PIDS="$PIDS $LLAMA_PID"
+            echo "✅ Llama Server started on port $((8080 + i)) (PID: $LLAMA_PID)"
+        done
         cd "$SCRIPT_DIR"
-        echo "✅ Llama Server started (PID: $LLAMA_PID)"
         
         # Wait a bit for llama server to initialize
         echo "⏳ Waiting for Llama Server to load model..."